@@ -0,0 +1,81 @@
+"""
+Compares the in-process cast utilities against spawning the `cast` binary.
+
+Usage:
+    python benchmarks/bench_cast_native.py [--iterations N] [--output results.json]
+
+For each invocation the script reports the mean latency of the native path
+with a cold memo, with a warm memo, and of `subprocess.run(["cast", ...])`
+when `cast` is on PATH. It also checks that both paths print the same bytes.
+"""
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+import time
+
+from eth_wh_mcp.cast_native import _offline, run_offline
+
+INVOCATIONS = [
+    ["keccak", "transfer(address,uint256)"],
+    ["keccak", "0xdeadbeef"],
+    ["sig", "transfer(address,uint256)"],
+    ["sig-event", "Transfer(address indexed,address indexed,uint256)"],
+    ["to-wei", "1.5", "ether"],
+    ["from-wei", "1500000000000000000"],
+    ["to-hex", "123456789"],
+    ["abi-encode", "f(uint256,address,string)", "42", "0x5aAeb6053F3E94C9b9A09f33669435E7Ef1BeAed", "hello"],
+    ["calldata", "transfer(address,uint256)", "0x5aAeb6053F3E94C9b9A09f33669435E7Ef1BeAed", "1000"],
+    ["compute-address", "0x6ac7ea33f8831ea9dcc53393aaa88b25a785dbf0", "--nonce", "7"],
+]
+
+
+def _mean_ms(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--output", help="Write results as JSON to this file instead of stdout.")
+    args = parser.parse_args()
+
+    cast = shutil.which("cast")
+    results = []
+    for invocation in INVOCATIONS:
+        def cold(invocation=invocation):
+            _offline.cache_clear()
+            run_offline(invocation)
+
+        def warm(invocation=invocation):
+            return run_offline(invocation)
+
+        def run(invocation=invocation):
+            return subprocess.run([cast, *invocation], capture_output=True, text=True, check=False)
+
+        entry = {
+            "command": " ".join(invocation),
+            "native_cold_ms": round(_mean_ms(cold, args.iterations), 4),
+            "native_warm_ms": round(_mean_ms(warm, args.iterations), 4),
+        }
+        if cast:
+            entry["subprocess_ms"] = round(_mean_ms(run, args.iterations), 4)
+            entry["identical_output"] = run().stdout == run_offline(invocation)
+        results.append(entry)
+
+    report = json.dumps({"cast": cast, "iterations": args.iterations, "results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+    if cast and not all(entry["identical_output"] for entry in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Measures the fork-state cache against a local stand-in for an upstream RPC endpoint.
+
+Usage:
+    python benchmarks/bench_fork_cache.py [--reads N] [--concurrency C] [--latency-ms L] [--output FILE]
+
+The stand-in upstream answers eth_chainId, eth_blockNumber, eth_getStorageAt, eth_getCode,
+eth_getBalance, eth_getTransactionCount and eth_getBlockByNumber with deterministic values after
+sleeping --latency-ms, and counts the requests it receives. The benchmark then replays the reads a
+forked test makes -- N distinct state reads pinned to one block, C at a time -- four ways:
+
+    direct       Straight to the upstream.
+    cold         Through a fresh proxy with an empty response store.
+    warm         Through a second proxy over the same store, as a later run would be.
+    shared       C identical reads at once through a fresh proxy, which should reach the upstream once.
+
+Every proxied response is checked against the direct one, and `latest` reads are checked to be
+forwarded rather than cached. Results (wall time and upstream requests per mode) are printed and
+written as JSON to --output when given.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BLOCK = hex(19_000_000)
+
+
+def _word(*parts) -> str:
+    return "0x" + hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+
+class Upstream:
+    """A threaded stand-in JSON-RPC endpoint on 127.0.0.1 with a fixed per-request latency."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                time.sleep(upstream.latency)
+                reply = [upstream.answer(item) for item in body] if isinstance(body, list) else upstream.answer(body)
+                data = json.dumps(reply).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v3/secret-key"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def answer(self, request: dict) -> dict:
+        with self._lock:
+            self.requests += 1
+        method, params = request["method"], request.get("params", [])
+        if method == "eth_chainId":
+            result = "0x1"
+        elif method == "eth_blockNumber":
+            result = BLOCK
+        elif method in ("eth_getStorageAt", "eth_getCode", "eth_getBalance", "eth_getTransactionCount"):
+            result = _word(method, params)
+        elif method == "eth_getBlockByNumber":
+            result = {"number": params[0], "hash": _word("block", params[0]), "transactions": []}
+        else:
+            return {"jsonrpc": "2.0", "id": request.get("id"), "error": {"code": -32601, "message": "not found"}}
+        return {"jsonrpc": "2.0", "id": request.get("id"), "result": result}
+
+
+def workload(reads: int) -> list[tuple[str, list]]:
+    calls = [("eth_getBlockByNumber", [BLOCK, False])]
+    for i in range(reads):
+        address = "0x" + f"{i % 97:040x}"
+        kind = i % 4
+        if kind == 0:
+            calls.append(("eth_getStorageAt", [address, hex(i), BLOCK]))
+        elif kind == 1:
+            calls.append(("eth_getCode", [address, BLOCK]))
+        elif kind == 2:
+            calls.append(("eth_getBalance", [address, BLOCK]))
+        else:
+            calls.append(("eth_getTransactionCount", [address, BLOCK]))
+    return list(dict.fromkeys((method, json.dumps(params)) for method, params in calls))
+
+
+async def replay(client, url: str, calls: list, concurrency: int) -> tuple[float, list]:
+    """Sends each call as its own HTTP request, `concurrency` at a time; returns wall time and the results."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int, method: str, params: str):
+        async with semaphore:
+            payload = {"jsonrpc": "2.0", "id": i, "method": method, "params": json.loads(params)}
+            response = await client.post(url, json=payload, timeout=60)
+            return response.json()["result"]
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one(i, method, params) for i, (method, params) in enumerate(calls)))
+    return time.perf_counter() - start, results
+
+
+async def run(args) -> dict:
+    import httpx
+
+    from eth_wh_mcp.forkcache import ForkProxy, ResponseStore
+
+    upstream = Upstream(args.latency_ms / 1000)
+    calls = workload(args.reads)
+    store = ResponseStore(os.path.join(os.environ["FOUNDRY_MCP_CACHE_DIR"], "bench.sqlite3"), 256 * 1024 * 1024)
+    report = {}
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections=args.concurrency)) as client:
+        async def measure(name: str, url: str, mode_calls: list) -> list:
+            before = upstream.requests
+            seconds, results = await replay(client, url, mode_calls, args.concurrency)
+            report[name] = {"seconds": round(seconds, 4), "requests": len(mode_calls),
+                            "upstream_requests": upstream.requests - before}
+            print(f"  {name}: {seconds * 1000:.1f} ms, {report[name]['upstream_requests']} upstream requests")
+            return results
+
+        print(f"{len(calls)} reads, concurrency {args.concurrency}, upstream latency {args.latency_ms} ms")
+        expected = await measure("direct", upstream.url, calls)
+        for name in ("cold", "warm"):
+            proxy = ForkProxy(upstream.url, store)
+            await proxy.start()
+            if await measure(name, proxy.url, calls) != expected:
+                sys.exit(f"{name}: proxied results differ from the upstream's")
+            report[name]["stats"] = proxy.stats
+            await proxy.stop()
+
+        proxy = ForkProxy(upstream.url, store)
+        await proxy.start()
+        same = [("eth_getStorageAt", json.dumps(["0x" + "ab" * 20, "0x1", "latest"]))] * args.concurrency
+        await measure("shared", proxy.url, same)
+        report["shared"]["stats"] = proxy.stats
+        before = upstream.requests
+        await replay(client, proxy.url, same[:1], 1)
+        await replay(client, proxy.url, same[:1], 1)
+        if upstream.requests - before != 2:
+            sys.exit("latest reads were served from the cache")
+        await proxy.stop()
+    upstream.server.shutdown()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["FOUNDRY_MCP_CACHE_DIR"] = directory  # Before eth_wh_mcp is imported.
+        report = asyncio.run(run(args))
+    report["settings"] = vars(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
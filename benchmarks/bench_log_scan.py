@@ -0,0 +1,209 @@
+"""
+Measures chunked log scans against a local stand-in for a rate-limited RPC provider.
+
+Usage:
+    python benchmarks/bench_log_scan.py [--blocks N] [--jobs J] [--latency-ms L] [--max-range R] [--max-results M]
+                                        [--output FILE]
+
+The stand-in provider holds N blocks of ERC-20 `Transfer` logs -- sparse, with a dense stretch in the middle --
+and refuses `eth_getLogs` requests the way hosted providers do: ranges wider than --max-range blocks, and responses
+of more than --max-results logs (naming a block range that would work). Every request sleeps --latency-ms. The
+benchmark then scans all N blocks three ways:
+
+    single       One `eth_getLogs` over the whole range, as `cast logs` sends it.
+    scan         `logscan.scan` with J concurrent requests, adapting its chunk size.
+    resumed      The same scan cancelled after a third of its chunks, then continued from its cursor.
+
+Both scans are checked to return exactly the provider's logs, decoded, with none missing or repeated. Results
+(wall time, requests, refused chunks and final chunk size per mode) are printed and written as JSON to --output
+when given.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TOKEN = "0x" + "c0" * 20
+TRANSFER = "Transfer(address indexed from, address indexed to, uint256 value)"
+
+
+class Provider:
+    """A threaded stand-in JSON-RPC endpoint on 127.0.0.1 serving deterministic logs under provider limits."""
+
+    def __init__(self, blocks: int, latency: float, max_range: int, max_results: int):
+        from eth_wh_mcp.keccak import keccak256
+
+        self.blocks = blocks
+        self.latency = latency
+        self.max_range = max_range
+        self.max_results = max_results
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._topic0 = "0x" + keccak256(b"Transfer(address,address,uint256)").hex()
+        provider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                time.sleep(provider.latency)
+                reply = [provider.answer(item) for item in body] if isinstance(body, list) else provider.answer(body)
+                data = json.dumps(reply).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.handle_error = lambda request, address: None  # Requests cancelled by the interrupted scan.
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v2/secret-key"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def logs_in(self, block: int) -> int:
+        if self.blocks * 2 // 5 <= block < self.blocks * 2 // 5 + self.blocks // 100:
+            return 25  # A busy stretch, e.g. a token launch.
+        digest = hashlib.sha256(block.to_bytes(8, "big")).digest()
+        return 1 + digest[1] % 3 if digest[0] < 32 else 0
+
+    def logs(self, low: int, high: int) -> list[dict]:
+        logs = []
+        for block in range(low, high + 1):
+            for index in range(self.logs_in(block)):
+                logs.append({
+                    "address": TOKEN,
+                    "topics": [self._topic0, "0x" + f"{block % 97 + 1:064x}", "0x" + f"{index + 1:064x}"],
+                    "data": "0x" + f"{block * 1000 + index:064x}",
+                    "blockNumber": hex(block),
+                    "logIndex": hex(index),
+                    "transactionHash": "0x" + hashlib.sha256(f"{block}:{index}".encode()).hexdigest(),
+                })
+        return logs
+
+    def answer(self, request: dict) -> dict:
+        with self._lock:
+            self.requests += 1
+        method, params = request["method"], request.get("params", [])
+        reply = {"jsonrpc": "2.0", "id": request.get("id")}
+        if method == "eth_blockNumber":
+            return {**reply, "result": hex(self.blocks - 1)}
+        if method != "eth_getLogs":
+            return {**reply, "error": {"code": -32601, "message": "not found"}}
+        low, high = int(params[0]["fromBlock"], 16), min(int(params[0]["toBlock"], 16), self.blocks - 1)
+        if high - low + 1 > self.max_range:
+            message = f"eth_getLogs is limited to a {self.max_range} block range"
+            return {**reply, "error": {"code": -32600, "message": message}}
+        logs = self.logs(low, high)
+        if len(logs) > self.max_results:
+            end, count = low, self.logs_in(low)
+            while end < high and count + self.logs_in(end + 1) <= self.max_results:
+                end += 1
+                count += self.logs_in(end)
+            message = (f"Log response size exceeded. You can make eth_getLogs requests with up to a "
+                       f"{self.max_range} block range and a cap of {self.max_results} logs in the response. "
+                       f"Based on your parameters, this block range should work: [{hex(low)}, {hex(end)}]")
+            return {**reply, "error": {"code": -32602, "message": message}}
+        return {**reply, "result": logs}
+
+
+def check(events: list[dict], provider: Provider, name: str) -> None:
+    keys = [(event["block"], event["log_index"]) for event in events]
+    expected = [(block, index) for block in range(provider.blocks) for index in range(provider.logs_in(block))]
+    if sorted(keys) != expected:
+        sys.exit(f"{name}: {len(keys)} events ({len(set(keys))} distinct), expected {len(expected)}")
+    sample = events[len(events) // 2]
+    if sample.get("args", {}).get("value") != str(sample["block"] * 1000 + sample["log_index"]):
+        sys.exit(f"{name}: event not decoded: {sample}")
+
+
+async def run(args) -> dict:
+    from eth_wh_mcp import rpc
+    from eth_wh_mcp.logscan import Cursor, new_cursor, scan
+
+    provider = Provider(args.blocks, args.latency_ms / 1000, args.max_range, args.max_results)
+    report = {}
+    print(f"{args.blocks} blocks, {args.jobs} jobs, latency {args.latency_ms} ms, "
+          f"provider limits {args.max_range} blocks / {args.max_results} logs")
+
+    start = time.perf_counter()
+    try:
+        await rpc.call(provider.url, "eth_getLogs", [{"fromBlock": "0x0", "toBlock": hex(args.blocks - 1)}], batch=False)
+        outcome = "ok"
+    except rpc.JsonRpcError as exc:
+        outcome = str(exc)
+    report["single"] = {"seconds": round(time.perf_counter() - start, 4), "outcome": outcome}
+    print(f"  single: {outcome}")
+
+    async def measure(name: str, cursor, on_chunk=None) -> dict:
+        before = provider.requests
+        started = time.perf_counter()
+        result = await scan(cursor, on_chunk, max_events=0, jobs=args.jobs)
+        seconds = time.perf_counter() - started
+        report[name] = {"seconds": round(seconds, 4), "upstream_requests": provider.requests - before,
+                        "refused": result["refused"], "retries": result["retries"], "chunk_size": result["chunk_size"],
+                        "events": len(result["events"])}
+        print(f"  {name}: {seconds * 1000:.1f} ms, {report[name]['upstream_requests']} requests, "
+              f"{result['refused']} refused, {len(result['events'])} events, final chunk {result['chunk_size']}")
+        return result
+
+    result = await measure("scan", await new_cursor(TRANSFER, TOKEN, "0", "latest", "", provider.url))
+    if not result["done"]:
+        sys.exit(f"scan stopped early: {result['error']}")
+    check(result["events"], provider, "scan")
+
+    cursor = await new_cursor(TRANSFER, TOKEN, "0", "latest", "", provider.url)
+    streamed, chunks = [], 0
+    stop = report["scan"]["upstream_requests"] // 3
+
+    async def interrupt(low: int, high: int, events: list) -> None:
+        nonlocal chunks
+        streamed.extend(events)
+        chunks += 1
+        if chunks >= stop:
+            raise asyncio.CancelledError
+
+    try:
+        await scan(cursor, interrupt, max_events=0, jobs=args.jobs)
+        sys.exit("the interrupted scan was not interrupted")
+    except asyncio.CancelledError:
+        pass
+    result = await measure("resumed", Cursor.load(cursor.cursor_id))
+    report["resumed"]["streamed_before_interruption"] = len(streamed)
+    check(streamed + result["events"], provider, "resumed")
+    provider.server.shutdown()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocks", type=int, default=200_000)
+    parser.add_argument("--jobs", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--max-range", type=int, default=10_000)
+    parser.add_argument("--max-results", type=int, default=10_000)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["FOUNDRY_MCP_CACHE_DIR"] = directory  # Before eth_wh_mcp is imported.
+        report = asyncio.run(run(args))
+    report["settings"] = vars(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
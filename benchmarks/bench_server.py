@@ -0,0 +1,467 @@
+"""
+Measures the server's own overhead and throughput against stub Foundry binaries.
+
+Usage:
+    python benchmarks/bench_server.py [--iterations N] [--concurrency 1,8,32] [--delay-ms D]
+                                      [--memory-mb 100,300] [--cold-starts N]
+                                      [--only overhead,throughput,memory,cold_start] [--output FILE]
+
+Fake `forge`, `cast`, `anvil` and `chisel` executables (benchmarks/stubs/foundry_stub.py)
+are put on PATH, and the server is driven through an in-memory MCP client session. The
+numbers therefore cover request dispatch, scheduling, process spawn and output handling,
+but not Foundry itself. Sections:
+
+    overhead     Mean/p50/p95 latency of every tool in main.py, next to the latency of
+                 spawning the same stub command directly; the difference is the per-call
+                 overhead of the server.
+    throughput   Calls per second of a light (cast) and a heavy (forge) tool at each
+                 concurrency level, with every stub call sleeping --delay-ms.
+    memory       Peak RSS of a fresh server process while a tool streams --memory-mb of output.
+    cold_start   Time from launching `python -m eth_wh_mcp.main` until it answers
+                 `initialize` and the first `tools/list`.
+
+Results are written as JSON, together with the git revision, Python version and settings,
+to --output, so that runs can be compared over time.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import re
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+STUB = os.path.join(BENCH_DIR, "stubs", "foundry_stub.py")
+STUB_TOOLS = ("forge", "cast", "anvil", "chisel")
+MIB = 1024 * 1024
+
+
+def install_stubs(directory: str) -> str:
+    """
+    Writes one wrapper per Foundry binary into `directory`/bin and returns that directory.
+
+    The stub only needs the standard library, so it runs with `-S`: skipping site-packages keeps its start-up
+    cost, which is part of every baseline, small next to the overhead being measured.
+    """
+    bin_dir = os.path.join(directory, "bin")
+    os.makedirs(bin_dir, exist_ok=True)
+    for tool in STUB_TOOLS:
+        path = os.path.join(bin_dir, tool)
+        with open(path, "w") as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" -S "{STUB}" {tool} "$@"\n')
+        os.chmod(path, 0o755)
+    return bin_dir
+
+
+def stub_settings(delay: float = 0.0, output_bytes: int = 200) -> None:
+    """Sets the stub behaviour for every child spawned from now on."""
+    os.environ["BENCH_STUB_DELAY"] = str(delay)
+    os.environ["BENCH_STUB_BYTES"] = str(output_bytes)
+
+
+def prepare_environment(directory: str) -> None:
+    """
+    Puts the stubs first on PATH, keeps every server cache inside `directory`, and moves into a minimal project.
+
+    Must run before `eth_wh_mcp.main` is imported, since the server reads its settings at import time.
+    """
+    os.environ["PATH"] = install_stubs(directory) + os.pathsep + os.environ.get("PATH", "")
+    os.environ["FOUNDRY_MCP_CACHE_DIR"] = os.path.join(directory, "cache")
+    project = os.path.join(directory, "project")
+    for sub in ("src", "test", "script"):
+        os.makedirs(os.path.join(project, sub), exist_ok=True)
+    with open(os.path.join(project, "foundry.toml"), "w") as f:
+        f.write('[profile.default]\nsrc = "src"\nout = "out"\nlibs = ["lib"]\n')
+    with open(os.path.join(project, "src", "Counter.sol"), "w") as f:
+        f.write("// SPDX-License-Identifier: MIT\npragma solidity ^0.8.13;\n\n"
+                "contract Counter {\n    uint256 public number;\n}\n")
+    os.chdir(project)
+    stub_settings()
+
+
+def latency_summary(seconds: list[float]) -> dict:
+    ms = sorted(value * 1000 for value in seconds)
+    return {
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "p50_ms": round(statistics.median(ms), 3),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+        "max_ms": round(ms[-1], 3),
+    }
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / MIB if sys.platform == "darwin" else peak / 1024, 1)  # bytes on macOS, KiB elsewhere
+
+
+@asynccontextmanager
+async def client_session():
+    """An MCP client session connected in-memory to the server."""
+    import anyio
+    from mcp.shared.memory import create_connected_server_and_client_session
+
+    from eth_wh_mcp.main import mcp
+
+    async with (
+        create_connected_server_and_client_session(mcp._mcp_server) as session,
+        anyio.create_task_group() as tg,
+    ):
+        async def drain():
+            async for _ in session.incoming_messages:
+                pass
+
+        tg.start_soon(drain)
+        try:
+            yield session
+        finally:
+            await stop_pools()
+            tg.cancel_scope.cancel()
+
+
+async def stop_pools() -> None:
+    """Stops the warm Anvil and Chisel pools while the event loop that owns their processes is still running."""
+    from eth_wh_mcp.anvil import manager as anvil_manager
+    from eth_wh_mcp.chisel import manager as chisel_manager
+
+    for manager in (anvil_manager, chisel_manager):
+        manager.pool_size = 0
+        if manager._refill is not None:
+            manager._refill.cancel()
+            await asyncio.gather(manager._refill, return_exceptions=True)
+        while manager._pool:
+            await manager._terminate(manager._pool.pop())
+
+
+async def call(session, tool: str, arguments: dict) -> tuple[float, str]:
+    """Calls a tool and returns its latency and text; a tool error aborts the benchmark."""
+    start = time.perf_counter()
+    result = await session.call_tool(tool, arguments)
+    elapsed = time.perf_counter() - start
+    text = result.content[0].text if result.content else ""
+    if result.isError:
+        raise RuntimeError(f"{tool}({arguments}) failed: {text}")
+    return elapsed, text
+
+
+async def spawn(args: list[str]) -> float:
+    """Runs a command directly, as the baseline a tool call is compared with."""
+    start = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(
+        *args, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    await proc.communicate()
+    return time.perf_counter() - start
+
+
+@dataclass
+class Case:
+    """One tool call to time. `before` returns extra arguments and `after` cleans up; neither is timed."""
+
+    label: str
+    tool: str
+    arguments: dict = field(default_factory=dict)
+    baseline: list[str] | None = None  # The stub command the tool runs, spawned directly for comparison.
+    before: Callable[[object], Awaitable[dict]] | None = None
+    after: Callable[[object, str], Awaitable[None]] | None = None
+
+
+def _id_from(text: str, kind: str) -> str:
+    match = re.search(rf"{kind} (\S+) is ready", text)
+    if match is None:
+        raise RuntimeError(f"Unexpected reply: {text}")
+    return match.group(1)
+
+
+def overhead_cases(fixtures: dict) -> list[Case]:
+    async def new_node(session) -> dict:
+        _, text = await call(session, "start_anvil_with_options", {"options": "--accounts 1"})
+        return {"node_id": _id_from(text, "node")}
+
+    async def stop_node(session, text: str) -> None:
+        await call(session, "stop_anvil", {"node_id": _id_from(text, "node"), "recycle": False})
+
+    async def new_chisel(session) -> dict:
+        _, text = await call(session, "start_chisel_with_options", {})
+        return {"session_id": _id_from(text, "session")}
+
+    async def stop_chisel(session, text: str) -> None:
+        await call(session, "stop_chisel", {"session_id": _id_from(text, "session")})
+
+    async def fixture_node(session) -> dict:
+        return {"node_id": fixtures["node_id"]}
+
+    async def fixture_session(session) -> dict:
+        return {"session_id": fixtures["session_id"]}
+
+    address = "0x6B175474E89094C44Da98b954EedeAC495271d0F"
+    script = "script/Counter.s.sol"
+    return [
+        Case("create_project", "create_project", {"project_name": "bench"}, ["forge", "init", "bench"]),
+        Case("build_project (fresh)", "build_project", {"use_cache": False, "raw": True}, ["forge", "build"]),
+        Case("build_project (session)", "build_project"),
+        Case("test_project (fresh)", "test_project", {"use_cache": False}, ["forge", "test", "--json"]),
+        Case("test_project (cached)", "test_project"),
+        Case("test_project (2 shards)", "test_project", {"use_cache": False, "shards": 2}),
+        Case("snapshot_project", "snapshot_project", {"use_cache": False}, ["forge", "snapshot"]),
+        Case("coverage_project", "coverage_project", {"use_cache": False}, ["forge", "coverage"]),
+        Case("clone_contract", "clone_contract", {"contract_address": address}, ["forge", "clone", address]),
+        Case("run_script", "run_script", {"script_name": script}, ["forge", "script", script]),
+        Case("run_script_with_options", "run_script_with_options", {"path": script}, ["forge", "script", script]),
+        Case("inspect_contract", "inspect_contract", {"contract_name": "Counter", "field": "abi"},
+             ["forge", "inspect", "Counter", "abi"]),
+        Case("run_cast_command_with_options (binary)", "run_cast_command_with_options",
+             {"command": "4byte", "options": "0xa9059cbb"}, ["cast", "4byte", "0xa9059cbb"]),
+        Case("run_cast_command_with_options (native)", "run_cast_command_with_options",
+             {"command": "keccak", "options": "hello"}, ["cast", "keccak", "hello"]),
+        Case("start_anvil_with_options (spawn)", "start_anvil_with_options", {"options": "--accounts 1"},
+             after=stop_node),
+        Case("stop_anvil", "stop_anvil", {"recycle": False}, before=new_node),
+        Case("list_anvil_nodes", "list_anvil_nodes"),
+        Case("get_anvil_logs", "get_anvil_logs", before=fixture_node),
+        Case("snapshot_anvil", "snapshot_anvil", before=fixture_node),
+        Case("revert_anvil (reset)", "revert_anvil", before=fixture_node),
+        Case("start_chisel_with_options (pool)", "start_chisel_with_options", after=stop_chisel),
+        Case("start_chisel_with_options (list)", "start_chisel_with_options", {"options": "list"},
+             ["chisel", "list"]),
+        Case("evaluate_solidity (stateless)", "evaluate_solidity", {"code": "uint256(1)"}),
+        Case("evaluate_solidity (session)", "evaluate_solidity", {"code": "uint256(1)"}, before=fixture_session),
+        Case("stop_chisel", "stop_chisel", before=new_chisel),
+        Case("list_chisel_sessions", "list_chisel_sessions"),
+        Case("list_build_sessions", "list_build_sessions"),
+        Case("stop_build_sessions", "stop_build_sessions"),
+        Case("fork_cache_stats", "fork_cache_stats"),
+    ]
+
+
+async def bench_overhead(session, iterations: int) -> dict:
+    stub_settings()
+    _, text = await call(session, "start_anvil_with_options", {})
+    _, chisel_text = await call(session, "start_chisel_with_options", {})
+    fixtures = {"node_id": _id_from(text, "node"), "session_id": _id_from(chisel_text, "session")}
+
+    cases = overhead_cases(fixtures)
+    results = []
+    for case in cases:
+        timings = []
+        for _ in range(iterations + 1):  # The first call warms caches, pools and sessions and is not counted.
+            extra = await case.before(session) if case.before else {}
+            elapsed, text = await call(session, case.tool, {**case.arguments, **extra})
+            if case.after:
+                await case.after(session, text)
+            timings.append(elapsed)
+        entry = {"case": case.label, "tool": case.tool, **latency_summary(timings[1:])}
+        if case.baseline:
+            direct = [await spawn(case.baseline) for _ in range(iterations)]
+            entry["direct_mean_ms"] = round(statistics.fmean(direct) * 1000, 3)
+            entry["overhead_ms"] = round(entry["mean_ms"] - entry["direct_mean_ms"], 3)
+        results.append(entry)
+        print(f"  {case.label}: {entry['mean_ms']:.2f} ms", file=sys.stderr)
+
+    await call(session, "stop_anvil", {"node_id": fixtures["node_id"], "recycle": False})
+    await call(session, "stop_chisel", {"session_id": fixtures["session_id"]})
+
+    tools = {tool.name for tool in (await session.list_tools()).tools}
+    return {"results": results, "uncovered_tools": sorted(tools - {case.tool for case in cases})}
+
+
+async def bench_throughput(session, levels: list[int], delay: float, rounds: int) -> list[dict]:
+    from eth_wh_mcp.runner import HEAVY, LIGHT, scheduler
+
+    stub_settings(delay=delay)
+    workloads = [
+        (LIGHT, "run_cast_command_with_options", {"command": "4byte", "options": "0xa9059cbb"}),
+        (HEAVY, "run_script", {"script_name": "script/Counter.s.sol"}),
+    ]
+    results = []
+    for tool_class, tool, arguments in workloads:
+        for level in levels:
+            gate = asyncio.Semaphore(level)
+
+            async def one(gate=gate, tool=tool, arguments=arguments) -> float:
+                async with gate:
+                    elapsed, _ = await call(session, tool, arguments)
+                    return elapsed
+
+            total = level * rounds
+            start = time.perf_counter()
+            latencies = await asyncio.gather(*(one() for _ in range(total)))
+            wall = time.perf_counter() - start
+            limit = scheduler.limits[tool_class]
+            results.append({
+                "tool": tool,
+                "class": tool_class,
+                "concurrency": level,
+                "calls": total,
+                "seconds": round(wall, 3),
+                "calls_per_second": round(total / wall, 2),
+                # What a zero-overhead server would reach: the class limit (or the concurrency) in parallel.
+                "ideal_calls_per_second": round(min(level, limit) / delay, 2) if delay else None,
+                **latency_summary(latencies),
+            })
+            print(f"  {tool} x{level}: {total / wall:.1f} calls/s", file=sys.stderr)
+    stub_settings()
+    return results
+
+
+def memory_child(megabytes: int) -> None:
+    """Runs in a fresh process: streams `megabytes` of output through a tool and prints the peak RSS as JSON."""
+    with tempfile.TemporaryDirectory(prefix="eth-wh-mcp-bench-") as directory:
+        prepare_environment(directory)
+
+        async def run() -> dict:
+            async with client_session() as session:
+                await call(session, "list_build_sessions", {})
+                before = peak_rss_mb()
+                stub_settings(output_bytes=megabytes * MIB)
+                elapsed, _ = await call(session, "run_script_with_options", {"path": "script/Counter.s.sol"})
+                return {
+                    "output_mb": megabytes,
+                    "seconds": round(elapsed, 3),
+                    "output_mb_per_second": round(megabytes / elapsed, 1),
+                    "rss_before_mb": before,
+                    "peak_rss_mb": peak_rss_mb(),
+                    "growth_mb": round(peak_rss_mb() - before, 1),
+                }
+
+        print(json.dumps(asyncio.run(run())))
+
+
+def bench_memory(sizes: list[int]) -> list[dict]:
+    results = []
+    for megabytes in sizes:
+        child = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--memory-child", str(megabytes)],
+            capture_output=True, text=True, check=True,
+        )
+        results.append(json.loads(child.stdout.strip().splitlines()[-1]))
+        print(f"  {megabytes} MB of output: peak RSS {results[-1]['peak_rss_mb']} MB", file=sys.stderr)
+    return results
+
+
+def _rpc(proc, message: dict) -> None:
+    proc.stdin.write((json.dumps(message) + "\n").encode())
+    proc.stdin.flush()
+
+
+def _read_reply(proc) -> dict:
+    line = proc.stdout.readline()
+    if not line:
+        raise RuntimeError("The server exited before answering")
+    return json.loads(line)
+
+
+def bench_cold_start(runs: int) -> dict:
+    from mcp.types import LATEST_PROTOCOL_VERSION
+
+    interpreter = []
+    initialize, first_list = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        interpreter.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "eth_wh_mcp.main"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        )
+        try:
+            _rpc(proc, {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {
+                "protocolVersion": LATEST_PROTOCOL_VERSION,
+                "capabilities": {},
+                "clientInfo": {"name": "bench_server", "version": "0"},
+            }})
+            _read_reply(proc)
+            initialize.append(time.perf_counter() - start)
+            _rpc(proc, {"jsonrpc": "2.0", "method": "notifications/initialized"})
+            _rpc(proc, {"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
+            _read_reply(proc)
+            first_list.append(time.perf_counter() - start)
+        finally:
+            proc.kill()
+            proc.wait()
+    return {
+        "runs": runs,
+        "interpreter": latency_summary(interpreter),
+        "initialize": latency_summary(initialize),
+        "first_tools_list": latency_summary(first_list),
+    }
+
+
+def git_revision() -> str | None:
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=BENCH_DIR, check=False,
+        ).stdout.strip()
+    except OSError:
+        return None
+    return revision or None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20, help="Timed calls per tool in the overhead section.")
+    parser.add_argument("--concurrency", default="1,8,32", help="Concurrency levels for the throughput section.")
+    parser.add_argument("--rounds", type=int, default=4, help="Calls per concurrency slot in the throughput section.")
+    parser.add_argument("--delay-ms", type=float, default=50, help="Stub run time in the throughput section.")
+    parser.add_argument("--memory-mb", default="100,300", help="Output sizes for the memory section.")
+    parser.add_argument("--cold-starts", type=int, default=5, help="Server launches in the cold-start section.")
+    parser.add_argument("--only", default="overhead,throughput,memory,cold_start", help="Sections to run.")
+    parser.add_argument("--output", default="bench_server.json", help="Where to write the JSON results.")
+    parser.add_argument("--memory-child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.memory_child is not None:
+        memory_child(args.memory_child)
+        return
+
+    output = os.path.abspath(args.output)
+    sections = set(args.only.split(","))
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "memory_child")},
+    }
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="eth-wh-mcp-bench-") as directory:
+        prepare_environment(directory)
+
+        async def in_server() -> None:
+            async with client_session() as session:
+                if "overhead" in sections:
+                    print("overhead", file=sys.stderr)
+                    report["overhead"] = await bench_overhead(session, args.iterations)
+                if "throughput" in sections:
+                    print("throughput", file=sys.stderr)
+                    levels = [int(level) for level in args.concurrency.split(",")]
+                    report["throughput"] = await bench_throughput(session, levels, args.delay_ms / 1000, args.rounds)
+
+        if sections & {"overhead", "throughput"}:
+            asyncio.run(in_server())
+        if "memory" in sections:
+            print("memory", file=sys.stderr)
+            report["memory"] = bench_memory([int(size) for size in args.memory_mb.split(",")])
+        if "cold_start" in sections:
+            print("cold_start", file=sys.stderr)
+            report["cold_start"] = bench_cold_start(args.cold_starts)
+        os.chdir(cwd)
+
+    with open(output, "w") as f:
+        f.write(json.dumps(report, indent=2) + "\n")
+    print(f"Results written to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
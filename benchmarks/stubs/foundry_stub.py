@@ -0,0 +1,202 @@
+"""
+A stand-in for the forge, cast, anvil and chisel binaries, used by the benchmarks.
+
+Usage:
+    python foundry_stub.py {forge|cast|anvil|chisel} [args...]
+
+`bench_server.py` puts one wrapper per tool on PATH that runs this script
+with the tool name as its first argument. Behaviour is controlled through the
+environment, so the harness can change it between runs without rewriting the
+wrappers:
+
+    BENCH_STUB_DELAY     Seconds to sleep before producing output, or per chisel evaluation (default 0).
+    BENCH_STUB_BYTES     Bytes of filler output for text-mode commands (default 200).
+    BENCH_STUB_WIDTH     Width of each filler line (default 100).
+    BENCH_STUB_STREAM    "stdout" or "stderr" for the filler (default stdout).
+    BENCH_STUB_EXIT      Exit code of text-mode commands (default 0).
+    BENCH_STUB_SUITES    Test contracts reported by `forge test --json` (default 4).
+    BENCH_STUB_TESTS     Tests per contract (default 5).
+
+`<tool> --version` prints a fixed version, `forge build --json` and `forge test [--list] --json` print documents shaped
+like forge's own, `anvil` serves the JSON-RPC methods the server uses, and
+`chisel` runs a REPL that echoes string literals the way Chisel does, prints nothing for statements and definitions,
+and evaluates any other input line as a uint256 (its own value for an integer literal, 1 otherwise).
+"""
+import json
+import os
+import re
+import sys
+import time
+
+_CHUNK = 1024 * 1024
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ[name])
+    except (KeyError, ValueError):
+        return default
+
+
+def _option(args: list[str], flag: str, default: str | None = None) -> str | None:
+    for i, arg in enumerate(args):
+        if arg == flag and i + 1 < len(args):
+            return args[i + 1]
+        if arg.startswith(flag + "="):
+            return arg.split("=", 1)[1]
+    return default
+
+
+def write_filler(total: int, width: int, stream) -> None:
+    """Writes `total` bytes of `width`-wide filler lines, in large chunks."""
+    line = (b"x" * max(1, width - 1)) + b"\n"
+    per_chunk = max(1, _CHUNK // len(line))
+    chunk = line * per_chunk
+    written = 0
+    while written + len(chunk) <= total:
+        stream.write(chunk)
+        written += len(chunk)
+    remaining = total - written
+    stream.write(line * (remaining // len(line)) + b"x" * (remaining % len(line)))
+    stream.flush()
+
+
+def text_output() -> int:
+    stream = sys.stderr if os.environ.get("BENCH_STUB_STREAM") == "stderr" else sys.stdout
+    write_filler(int(_env_float("BENCH_STUB_BYTES", 200)), int(_env_float("BENCH_STUB_WIDTH", 100)), stream.buffer)
+    return int(_env_float("BENCH_STUB_EXIT", 0))
+
+
+def forge(args: list[str]) -> int:
+    command = args[0] if args else ""
+    if "--json" not in args and "-j" not in args:
+        return text_output()
+    if command == "build":
+        print(json.dumps({"errors": [], "sources": {}, "contracts": {"src/Counter.sol": {"Counter": []}}}))
+        return 0
+    if command != "test":
+        return text_output()
+
+    pattern = re.compile(_option(args, "--match-contract", ".*"))
+    suites = int(_env_float("BENCH_STUB_SUITES", 4))
+    tests = int(_env_float("BENCH_STUB_TESTS", 5))
+    contracts = [f"C{i}Test" for i in range(suites) if pattern.search(f"C{i}Test")]
+    if "--list" in args or "-l" in args:
+        print(json.dumps({
+            f"test/{name}.t.sol": {name: [f"test_{j}" for j in range(tests)]} for name in contracts
+        }))
+        return 0
+    results = {
+        f"test/{name}.t.sol:{name}": {
+            "duration": "10ms",
+            "test_results": {
+                f"test_{j}()": {
+                    "status": "Success",
+                    "reason": None,
+                    "counterexample": None,
+                    "decoded_logs": [],
+                    "kind": {"Unit": {"gas": 20000 + j}},
+                    "duration": {"secs": 0, "nanos": 1000000},
+                }
+                for j in range(tests)
+            },
+        }
+        for name in contracts
+    }
+    print(json.dumps(results))
+    return 0
+
+
+def cast(args: list[str]) -> int:
+    if args[:1] == ["4byte"]:
+        print("transfer(address,uint256)")
+        return 0
+    return text_output()
+
+
+def anvil(args: list[str]) -> int:
+    # Only anvil pays for the import.
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    port = int(_option(args, "--port", "8545"))
+    snapshots = [0]  # The last snapshot ID, then the IDs that can still be reverted to.
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args) -> None:
+            pass
+
+        def do_POST(self) -> None:
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            replies = [self.answer(request) for request in body] if isinstance(body, list) else self.answer(body)
+            data = json.dumps(replies).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def answer(self, request: dict) -> dict:
+            method = request.get("method")
+            if method == "evm_snapshot":
+                snapshots[0] += 1
+                snapshots.append(snapshots[0])
+                result = hex(snapshots[0])
+            elif method == "evm_revert":
+                # Like Anvil, reverting consumes the snapshot and every later one.
+                target = int(request["params"][0], 16)
+                result = target in snapshots[1:]
+                if result:
+                    del snapshots[snapshots.index(target, 1):]
+            elif method == "eth_chainId":
+                result = "0x7a69"
+            elif method in ("eth_blockNumber", "eth_getTransactionCount"):
+                result = "0x0"
+            elif method == "eth_getBalance":
+                result = hex(10 ** 22)
+            else:
+                return {"jsonrpc": "2.0", "id": request.get("id"),
+                        "error": {"code": -32601, "message": f"Method not found: {method}"}}
+            return {"jsonrpc": "2.0", "id": request.get("id"), "result": result}
+
+    print(f"Listening on 127.0.0.1:{port}", flush=True)
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+    return 0
+
+
+def chisel(args: list[str]) -> int:
+    if args[:1] in (["list"], ["view"], ["clear-cache"]):
+        return text_output()
+    print("Welcome to Chisel! Type `!help` to show available commands.", flush=True)
+    delay = _env_float("BENCH_STUB_DELAY", 0)
+    for line in sys.stdin:
+        line = line.strip()
+        if line.startswith('"'):
+            value = line.strip('"')
+            print(f"Type: string\n├ UTF-8: {value}\n├ Hex (Memory):\n└─ Contents ([0x40:..]): 0x00")
+        elif line == "!clear":
+            print("Cleared session!")
+        elif line.endswith((";", "}")):
+            time.sleep(delay)  # A statement or definition: Chisel compiles it and prints nothing.
+        elif line:
+            time.sleep(delay)
+            value = int(line) if line.isdigit() else 1
+            print(f"Type: uint256\n├ Hex: {hex(value)}\n└ Decimal: {value}")
+        sys.stdout.flush()
+    return 0
+
+
+def main() -> int:
+    tool, args = sys.argv[1], sys.argv[2:]
+    if args == ["--version"]:
+        print(f"{tool} Version: 1.0.0-stub")
+        return 0
+    if tool != "chisel":
+        time.sleep(_env_float("BENCH_STUB_DELAY", 0))
+    return {"forge": forge, "cast": cast, "anvil": anvil, "chisel": chisel}[tool](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
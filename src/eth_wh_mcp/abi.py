@@ -0,0 +1,413 @@
+"""
+Solidity ABI helpers: type and signature parsing, argument coercion, encoding
+and decoding.
+
+Arguments are given as strings the way `cast` accepts them on the command line:
+numbers in decimal or 0x-hex, addresses and bytes as 0x-hex, booleans as
+true/false, arrays as `[a,b]` and tuples as `(a,b)`.
+"""
+import functools
+import re
+from dataclasses import dataclass
+
+from eth_wh_mcp.keccak import keccak256
+
+_INT_TYPE = re.compile(r"^(u?int)(\d*)$")
+_BYTES_TYPE = re.compile(r"^bytes(\d+)$")
+_ARRAY_SUFFIX = re.compile(r"\[(\d*)\]$")
+
+
+class AbiError(ValueError):
+    """Raised for malformed types, signatures or argument values."""
+
+
+@dataclass(frozen=True)
+class AbiType:
+    """A parsed Solidity type."""
+
+    kind: str  # uint, int, address, bool, bytes, string, fixed_bytes, tuple or array
+    size: int = 0  # bit width for (u)int, byte length for fixed_bytes
+    components: tuple["AbiType", ...] = ()
+    item: "AbiType | None" = None
+    length: int | None = None  # fixed array length; None for dynamic arrays
+
+    @property
+    def dynamic(self) -> bool:
+        if self.kind in ("bytes", "string"):
+            return True
+        if self.kind == "array":
+            return self.length is None or self.item.dynamic
+        if self.kind == "tuple":
+            return any(component.dynamic for component in self.components)
+        return False
+
+    @property
+    def canonical(self) -> str:
+        match self.kind:
+            case "uint" | "int":
+                return f"{self.kind}{self.size}"
+            case "fixed_bytes":
+                return f"bytes{self.size}"
+            case "tuple":
+                return "(" + ",".join(component.canonical for component in self.components) + ")"
+            case "array":
+                return f"{self.item.canonical}[{'' if self.length is None else self.length}]"
+        return self.kind
+
+
+def split_top_level(text: str, separator: str = ",") -> list[str]:
+    """Splits on `separator` outside of brackets, parentheses and double quotes."""
+    parts, depth, quoted, start = [], 0, False, 0
+    for i, char in enumerate(text):
+        if char == '"':
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+            if depth < 0:
+                raise AbiError(f"Unbalanced brackets in {text!r}")
+        elif char == separator and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    if depth or quoted:
+        raise AbiError(f"Unbalanced brackets in {text!r}")
+    parts.append(text[start:])
+    return parts
+
+
+def parse_type(text: str) -> AbiType:
+    """Parses a type such as `uint`, `bytes32[]` or `(address,uint256)[2]`."""
+    text = text.strip()
+    if text.startswith("tuple("):
+        text = text[len("tuple"):]
+
+    match = _ARRAY_SUFFIX.search(text)
+    if match:
+        item = parse_type(text[:match.start()])
+        return AbiType("array", item=item, length=int(match.group(1)) if match.group(1) else None)
+
+    if text.startswith("(") and text.endswith(")"):
+        inner = text[1:-1]
+        components = tuple(parse_param(part)[0] for part in split_top_level(inner)) if inner.strip() else ()
+        return AbiType("tuple", components=components)
+
+    if match := _INT_TYPE.match(text):
+        size = int(match.group(2) or 256)
+        if size % 8 or not 8 <= size <= 256:
+            raise AbiError(f"Invalid integer type: {text}")
+        return AbiType(match.group(1), size=size)
+    if match := _BYTES_TYPE.match(text):
+        size = int(match.group(1))
+        if not 1 <= size <= 32:
+            raise AbiError(f"Invalid bytes type: {text}")
+        return AbiType("fixed_bytes", size=size)
+    if text in ("address", "bool", "bytes", "string"):
+        return AbiType(text)
+    raise AbiError(f"Unsupported type: {text!r}")
+
+
+def parse_param(text: str) -> tuple[AbiType, bool, str]:
+    """Parses one parameter declaration (`uint256 indexed amount`) into its type, indexed flag and name ("" if none)."""
+    text = text.strip()
+    # The type is everything up to the first space outside of parentheses.
+    depth = 0
+    for i, char in enumerate(text):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == " " and depth == 0:
+            type_text, rest = text[:i], text[i + 1:].split()
+            break
+    else:
+        type_text, rest = text, []
+    rest = [word for word in rest if word not in ("memory", "calldata", "storage")]
+    names = [word for word in rest if word != "indexed"]
+    return parse_type(type_text), "indexed" in rest, names[-1] if names else ""
+
+
+@dataclass(frozen=True)
+class Signature:
+    """A parsed function or event signature."""
+
+    name: str
+    inputs: tuple[AbiType, ...]
+    indexed: tuple[bool, ...]
+    outputs: tuple[AbiType, ...] = ()
+    names: tuple[str, ...] = ()
+
+    @property
+    def canonical(self) -> str:
+        return f"{self.name}(" + ",".join(param.canonical for param in self.inputs) + ")"
+
+    @functools.cached_property
+    def selector(self) -> bytes:
+        return self.topic[:4]
+
+    @functools.cached_property
+    def topic(self) -> bytes:
+        return keccak256(self.canonical.encode())
+
+
+def parse_signature(text: str) -> Signature:
+    """
+    Parses `transfer(address to, uint amount)`, `function f(uint256) returns (bool)`,
+    `event Transfer(address indexed, address indexed, uint256)` and similar forms.
+    """
+    text = text.strip()
+    for keyword in ("function ", "event ", "error "):
+        if text.startswith(keyword):
+            text = text[len(keyword):].strip()
+    open_paren = text.find("(")
+    if open_paren <= 0 or not re.match(r"^[A-Za-z_$][A-Za-z0-9_$]*$", text[:open_paren]):
+        raise AbiError(f"Invalid signature: {text!r}")
+
+    depth = 0
+    for close_paren in range(open_paren, len(text)):
+        depth += {"(": 1, ")": -1}.get(text[close_paren], 0)
+        if depth == 0:
+            break
+    else:
+        raise AbiError(f"Unbalanced parentheses in {text!r}")
+
+    inner = text[open_paren + 1:close_paren]
+    params = [parse_param(part) for part in split_top_level(inner)] if inner.strip() else []
+
+    rest = text[close_paren + 1:].strip()
+    for word in ("external", "public", "view", "pure", "payable", "anonymous"):
+        rest = re.sub(rf"\b{word}\b", "", rest).strip()
+    if rest.startswith("returns"):
+        rest = rest[len("returns"):].strip()
+    outputs = parse_type(rest).components if rest else ()
+
+    return Signature(
+        name=text[:open_paren],
+        inputs=tuple(param for param, _, _ in params),
+        indexed=tuple(indexed for _, indexed, _ in params),
+        outputs=outputs,
+        names=tuple(name for _, _, name in params),
+    )
+
+
+def _parse_int(value: str) -> int:
+    value = value.strip()
+    negative = value.startswith("-")
+    digits = value[1:] if negative else value
+    number = int(digits, 16) if digits.lower().startswith("0x") else int(digits, 10)
+    return -number if negative else number
+
+
+def _parse_hex(value: str) -> bytes:
+    value = value.strip()
+    if not value.startswith("0x"):
+        raise AbiError(f"Expected 0x-prefixed hex, got {value!r}")
+    digits = value[2:]
+    if len(digits) % 2:
+        raise AbiError(f"Odd-length hex: {value!r}")
+    return bytes.fromhex(digits)
+
+
+def coerce(abi_type: AbiType, value: str):
+    """Converts a command-line argument into the Python value `encode` expects for `abi_type`."""
+    value = value.strip()
+    match abi_type.kind:
+        case "uint" | "int":
+            number = _parse_int(value)
+            low, high = (0, 1 << abi_type.size) if abi_type.kind == "uint" else (
+                -(1 << (abi_type.size - 1)), 1 << (abi_type.size - 1))
+            if not low <= number < high:
+                raise AbiError(f"{value} is out of range for {abi_type.canonical}")
+            return number
+        case "address":
+            if not re.match(r"^0x[0-9a-fA-F]{40}$", value):
+                raise AbiError(f"Invalid address: {value!r}")
+            return bytes.fromhex(value[2:])
+        case "bool":
+            if value not in ("true", "false"):
+                raise AbiError(f"Invalid bool: {value!r}")
+            return value == "true"
+        case "fixed_bytes":
+            data = _parse_hex(value)
+            if len(data) > abi_type.size:
+                raise AbiError(f"{value} is longer than {abi_type.canonical}")
+            return data
+        case "bytes":
+            return _parse_hex(value)
+        case "string":
+            return value[1:-1] if len(value) >= 2 and value[0] == value[-1] == '"' else value
+        case "array":
+            if not (value.startswith("[") and value.endswith("]")):
+                raise AbiError(f"Expected an array, got {value!r}")
+            inner = value[1:-1]
+            items = [coerce(abi_type.item, part) for part in split_top_level(inner)] if inner.strip() else []
+            if abi_type.length is not None and len(items) != abi_type.length:
+                raise AbiError(f"Expected {abi_type.length} items for {abi_type.canonical}")
+            return items
+        case "tuple":
+            if not (value.startswith("(") and value.endswith(")")):
+                raise AbiError(f"Expected a tuple, got {value!r}")
+            parts = split_top_level(value[1:-1])
+            if len(parts) != len(abi_type.components):
+                raise AbiError(f"Expected {len(abi_type.components)} values for {abi_type.canonical}")
+            return [coerce(component, part) for component, part in zip(abi_type.components, parts)]
+    raise AbiError(f"Unsupported type: {abi_type.canonical}")
+
+
+def _pad_right(data: bytes) -> bytes:
+    return data + b"\x00" * (-len(data) % 32)
+
+
+def _encode_value(abi_type: AbiType, value) -> bytes:
+    match abi_type.kind:
+        case "uint":
+            return value.to_bytes(32, "big")
+        case "int":
+            return value.to_bytes(32, "big", signed=True)
+        case "address":
+            return value.rjust(32, b"\x00")
+        case "bool":
+            return (1 if value else 0).to_bytes(32, "big")
+        case "fixed_bytes":
+            return value.ljust(32, b"\x00")
+        case "bytes":
+            return len(value).to_bytes(32, "big") + _pad_right(value)
+        case "string":
+            data = value.encode()
+            return len(data).to_bytes(32, "big") + _pad_right(data)
+        case "array":
+            encoded = encode([abi_type.item] * len(value), value)
+            if abi_type.length is None:
+                return len(value).to_bytes(32, "big") + encoded
+            return encoded
+        case "tuple":
+            return encode(list(abi_type.components), value)
+    raise AbiError(f"Unsupported type: {abi_type.canonical}")
+
+
+def _head_size(abi_type: AbiType) -> int:
+    if abi_type.dynamic:
+        return 32
+    if abi_type.kind == "tuple":
+        return sum(_head_size(component) for component in abi_type.components)
+    if abi_type.kind == "array":
+        return abi_type.length * _head_size(abi_type.item)
+    return 32
+
+
+def encode(types: list[AbiType], values: list) -> bytes:
+    """ABI-encodes coerced `values` as a tuple of `types` (head/tail layout)."""
+    head_size = sum(_head_size(t) for t in types)
+    heads, tails = [], []
+    offset = head_size
+    for abi_type, value in zip(types, values):
+        encoded = _encode_value(abi_type, value)
+        if abi_type.dynamic:
+            heads.append(offset.to_bytes(32, "big"))
+            tails.append(encoded)
+            offset += len(encoded)
+        else:
+            heads.append(encoded)
+    return b"".join(heads) + b"".join(tails)
+
+
+def encode_arguments(signature: Signature, args: list[str]) -> bytes:
+    """Coerces command-line `args` against the signature's inputs and ABI-encodes them."""
+    if len(args) != len(signature.inputs):
+        raise AbiError(f"Expected {len(signature.inputs)} arguments for {signature.canonical}, got {len(args)}")
+    values = [coerce(abi_type, arg) for abi_type, arg in zip(signature.inputs, args)]
+    return encode(list(signature.inputs), values)
+
+
+@functools.lru_cache(maxsize=4096)
+def to_checksum_address(address: bytes) -> str:
+    """Formats a 20-byte address with EIP-55 mixed-case checksum."""
+    lower = address.hex()
+    digest = keccak256(lower.encode()).hex()
+    return "0x" + "".join(c.upper() if int(digest[i], 16) >= 8 else c for i, c in enumerate(lower))
+
+
+def _word(data: bytes, offset: int) -> int:
+    if offset < 0 or offset + 32 > len(data):
+        raise AbiError(f"Data too short: need 32 bytes at offset {offset}, have {len(data)}")
+    return int.from_bytes(data[offset:offset + 32], "big")
+
+
+def _decode_value(abi_type: AbiType, data: bytes, offset: int):
+    """Decodes the value whose encoding starts at `offset` (the tail, for dynamic types)."""
+    match abi_type.kind:
+        case "uint":
+            return _word(data, offset)
+        case "int":
+            value = _word(data, offset)
+            return value - (1 << 256) if value >> 255 else value
+        case "address":
+            _word(data, offset)
+            return to_checksum_address(data[offset + 12:offset + 32])
+        case "bool":
+            return _word(data, offset) != 0
+        case "fixed_bytes":
+            _word(data, offset)
+            return data[offset:offset + abi_type.size]
+        case "bytes" | "string":
+            length = _word(data, offset)
+            if offset + 32 + length > len(data):
+                raise AbiError(f"Data too short for {abi_type.canonical} of {length} bytes")
+            raw = data[offset + 32:offset + 32 + length]
+            return raw.decode(errors="replace") if abi_type.kind == "string" else raw
+        case "array":
+            if abi_type.length is not None:
+                return _decode_tuple([abi_type.item] * abi_type.length, data, offset)
+            count = _word(data, offset)
+            if count * 32 > len(data):
+                raise AbiError(f"Array length {count} exceeds the data")
+            return _decode_tuple([abi_type.item] * count, data, offset + 32)
+        case "tuple":
+            return _decode_tuple(list(abi_type.components), data, offset)
+    raise AbiError(f"Unsupported type: {abi_type.canonical}")
+
+
+def _decode_tuple(types: list[AbiType], data: bytes, start: int) -> list:
+    values, offset = [], start
+    for abi_type in types:
+        if abi_type.dynamic:
+            values.append(_decode_value(abi_type, data, start + _word(data, offset)))
+        else:
+            values.append(_decode_value(abi_type, data, offset))
+        offset += _head_size(abi_type)
+    return values
+
+
+def decode(types: list[AbiType], data: bytes) -> list:
+    """
+    Decodes ABI-encoded `data` as a tuple of `types`; the inverse of `encode`.
+
+    Integers come back as ints, addresses as checksummed strings, bytes as bytes,
+    arrays and tuples as lists.
+    """
+    return _decode_tuple(types, data, 0)
+
+
+def decode_event(signature: Signature, topics: list[bytes], data: bytes) -> list:
+    """
+    Decodes a log emitted by the event `signature`: indexed parameters from `topics[1:]`, the rest from `data`.
+
+    Indexed strings, bytes, arrays and tuples are only logged as the keccak hash of their value and come back as
+    that 32-byte hash.
+    """
+    indexed_count = sum(signature.indexed)
+    if len(topics) != indexed_count + 1:
+        raise AbiError(f"{signature.canonical} has {indexed_count} indexed parameters, the log {len(topics) - 1}")
+    unindexed = iter(decode([t for t, i in zip(signature.inputs, signature.indexed) if not i], data))
+    indexed = iter(topics[1:])
+    values = []
+    for abi_type, is_indexed in zip(signature.inputs, signature.indexed):
+        if not is_indexed:
+            values.append(next(unindexed))
+        elif abi_type.dynamic or abi_type.kind in ("tuple", "array"):
+            values.append(next(indexed))
+        else:
+            values.append(_decode_value(abi_type, next(indexed), 0))
+    return values
@@ -0,0 +1,280 @@
+"""
+Lifecycle management for local Anvil nodes.
+
+`AnvilManager` owns every node the server starts. It hands out free ports,
+waits until a node answers JSON-RPC before returning it, drains the node's
+output into a bounded buffer so the pipes never fill up, and stops nodes on
+request or at exit. Each node runs in its own process group and is recorded
+in the reaper's child registry until it is stopped.
+
+Nodes started without options are interchangeable, so the manager keeps a
+small warm pool of them. Each pooled node carries a base `evm_snapshot`;
+recycling a node reverts it to that snapshot, which takes milliseconds instead
+of a full Anvil restart.
+"""
+import asyncio
+import atexit
+import itertools
+import signal
+import socket
+import time
+
+import httpx
+
+from eth_wh_mcp import rpc
+from eth_wh_mcp.reaper import children
+from eth_wh_mcp.runner import (
+    OutputBuffer,
+    env_int,
+    option_value,
+    pump_lines,
+    signal_group,
+)
+
+DEFAULT_HOST = "127.0.0.1"
+
+
+class AnvilError(Exception):
+    """Raised when a node cannot be started or controlled."""
+
+
+class AnvilNode:
+    """A running Anvil process tracked by the manager."""
+
+    def __init__(self, node_id: str, host: str, port: int, options: list[str], process: asyncio.subprocess.Process):
+        self.node_id = node_id
+        self.host = host
+        self.port = port
+        self.options = options
+        self.process = process
+        self.started_at = time.time()
+        self.logs = OutputBuffer(16 * 1024, env_int("FOUNDRY_MCP_ANVIL_LOG_BYTES", 256 * 1024))
+        self.base_snapshot: str | None = None
+        self._drain: asyncio.Task | None = None
+
+    @property
+    def rpc_url(self) -> str:
+        host = DEFAULT_HOST if self.host in ("0.0.0.0", "::") else self.host
+        return f"http://{host}:{self.port}"
+
+    @property
+    def running(self) -> bool:
+        return self.process.returncode is None
+
+    @property
+    def poolable(self) -> bool:
+        return not self.options
+
+    def describe(self) -> dict:
+        return {
+            "id": self.node_id,
+            "rpc_url": self.rpc_url,
+            "pid": self.process.pid,
+            "options": " ".join(self.options),
+            "running": self.running,
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+        }
+
+
+def _port_is_free(host: str, port: int) -> bool:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        # Lingering TIME_WAIT connections do not stop a new listener from binding.
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind((host, port))
+        except OSError:
+            return False
+    return True
+
+
+class AnvilManager:
+    """Tracks live Anvil nodes and a warm pool of default nodes."""
+
+    def __init__(self, pool_size: int, ready_timeout: float):
+        self.pool_size = pool_size
+        self.ready_timeout = ready_timeout
+        self.nodes: dict[str, AnvilNode] = {}
+        self._pool: list[AnvilNode] = []
+        self._ids = itertools.count(1)
+        self._refill: asyncio.Task | None = None
+
+    def allocate_port(self, host: str = DEFAULT_HOST) -> int:
+        """Returns a port that is free on `host` and not claimed by a tracked node."""
+        taken = {node.port for node in self._all_nodes()}
+        while True:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                sock.bind((host, 0))
+                port = sock.getsockname()[1]
+            if port not in taken:
+                return port
+
+    def get(self, node_id: str) -> AnvilNode:
+        node = self.nodes.get(node_id)
+        if node is None:
+            raise AnvilError(f"Unknown Anvil node: {node_id}")
+        return node
+
+    async def start(self, options: list[str]) -> AnvilNode:
+        """Starts a node (or takes one from the warm pool) and waits until it serves JSON-RPC."""
+        node = None
+        if not options:
+            node = self._take_from_pool()
+            self._schedule_refill()
+        if node is None:
+            node = await self._spawn(options)
+        self.nodes[node.node_id] = node
+        return node
+
+    async def stop(self, node_id: str, recycle: bool = True) -> str:
+        """Stops a node, or resets it and returns it to the warm pool when there is room."""
+        node = self.nodes.pop(node_id, None)
+        if node is None:
+            raise AnvilError(f"Unknown Anvil node: {node_id}")
+
+        if recycle and node.poolable and node.running and len(self._pool) < self.pool_size:
+            try:
+                await self.reset(node)
+            except (AnvilError, httpx.HTTPError, rpc.JsonRpcError):
+                pass
+            else:
+                self._pool.append(node)
+                return "recycled"
+
+        await self._terminate(node)
+        return "stopped"
+
+    async def snapshot(self, node: AnvilNode) -> str:
+        return await rpc.call(node.rpc_url, "evm_snapshot")
+
+    async def revert(self, node: AnvilNode, snapshot_id: str) -> bool:
+        return bool(await rpc.call(node.rpc_url, "evm_revert", [snapshot_id]))
+
+    async def reset(self, node: AnvilNode) -> None:
+        """Reverts a node to its base snapshot and takes a fresh one (Anvil consumes snapshots on revert)."""
+        if node.base_snapshot is None:
+            raise AnvilError(f"Anvil node {node.node_id} has no base snapshot")
+        if not await self.revert(node, node.base_snapshot):
+            raise AnvilError(f"Anvil node {node.node_id} could not revert to its base snapshot")
+        node.base_snapshot = await self.snapshot(node)
+
+    async def reap_exited(self) -> int:
+        """Drops nodes whose process has exited and refills the warm pool; returns how many were dropped."""
+        exited = [node for node in self._all_nodes() if not node.running]
+        for node in exited:
+            self.nodes.pop(node.node_id, None)
+            if node in self._pool:
+                self._pool.remove(node)
+            await self._terminate(node)
+        if exited:
+            self._schedule_refill()
+        return len(exited)
+
+    def kill_all(self) -> None:
+        """Synchronously kills every node; registered to run at interpreter exit."""
+        for node in self._all_nodes():
+            if node.running:
+                signal_group(node.process, signal.SIGKILL)
+        children.clear()
+
+    def _all_nodes(self) -> list[AnvilNode]:
+        return list(self.nodes.values()) + self._pool
+
+    def _take_from_pool(self) -> AnvilNode | None:
+        while self._pool:
+            node = self._pool.pop()
+            if node.running:
+                return node
+        return None
+
+    def prewarm(self) -> None:
+        """Starts filling the warm pool in the background, so the first option-less start does not wait for it."""
+        self._schedule_refill()
+
+    def _schedule_refill(self) -> None:
+        if self.pool_size and (self._refill is None or self._refill.done()):
+            self._refill = asyncio.create_task(self._fill_pool())
+
+    async def _fill_pool(self) -> None:
+        while len(self._pool) < self.pool_size:
+            try:
+                node = await self._spawn([])
+            except (AnvilError, OSError):
+                return
+            if len(self._pool) >= self.pool_size:
+                # A recycled node filled the slot while this one was starting.
+                await self._terminate(node)
+                return
+            self._pool.append(node)
+
+    async def _spawn(self, options: list[str]) -> AnvilNode:
+        host = option_value(options, "--host") or DEFAULT_HOST
+        port_option = option_value(options, "--port", "-p")
+        args = ["anvil"] + options
+        if port_option is None:
+            port = self.allocate_port(DEFAULT_HOST if host in ("0.0.0.0", "::") else host)
+            args += ["--port", str(port)]
+        else:
+            try:
+                port = int(port_option)
+            except ValueError:
+                port = -1
+            if not 0 < port < 65536:
+                raise AnvilError(f"Invalid --port value: {port_option!r}")
+            if not _port_is_free(DEFAULT_HOST if host in ("0.0.0.0", "::") else host, port):
+                raise AnvilError(f"Port {port} is already in use")
+
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
+        )
+        children.add(process.pid, "anvil")
+        node = AnvilNode(f"anvil-{next(self._ids)}", host, port, options, process)
+        node._drain = asyncio.create_task(self._drain_logs(node))
+        try:
+            await self._wait_ready(node)
+            if node.poolable:
+                node.base_snapshot = await self.snapshot(node)
+        except BaseException:
+            await self._terminate(node)
+            raise
+        return node
+
+    async def _drain_logs(self, node: AnvilNode) -> None:
+        await asyncio.gather(
+            pump_lines(node.process.stdout, "stdout", node.logs),
+            pump_lines(node.process.stderr, "stderr", node.logs),
+        )
+
+    async def _wait_ready(self, node: AnvilNode) -> None:
+        deadline = time.monotonic() + self.ready_timeout
+        while time.monotonic() < deadline:
+            if not node.running:
+                raise AnvilError(f"Anvil exited with code {node.process.returncode}:\n{node.logs.text()}")
+            try:
+                await rpc.call(node.rpc_url, "eth_chainId", timeout=1.0)
+                return
+            except (httpx.HTTPError, rpc.JsonRpcError):
+                await asyncio.sleep(0.05)
+        raise AnvilError(f"Anvil did not become ready within {self.ready_timeout:g}s:\n{node.logs.text()}")
+
+    async def _terminate(self, node: AnvilNode) -> None:
+        if node.running:
+            signal_group(node.process, signal.SIGTERM)
+            try:
+                await asyncio.wait_for(node.process.wait(), 5)
+            except TimeoutError:
+                signal_group(node.process, signal.SIGKILL)
+                await node.process.wait()
+        children.discard(node.process.pid)
+        if node._drain is not None:
+            await node._drain
+
+
+manager = AnvilManager(
+    pool_size=env_int("FOUNDRY_MCP_ANVIL_POOL", 1, minimum=0),
+    ready_timeout=env_int("FOUNDRY_MCP_ANVIL_READY_TIMEOUT", 60),
+)
+atexit.register(manager.kill_all)
@@ -0,0 +1,313 @@
+"""
+Serves `forge inspect` fields straight from compiled artifacts.
+
+`ArtifactIndex` reads forge's `cache/solidity-files-cache.json` to map
+contract names and source paths to their artifact files, and checks that the
+source (and everything it imports) has not changed since it was compiled.
+Artifacts are opened through `mmap` and only walked as far as the requested
+top-level key; the byte offsets of the keys seen on the way are remembered
+per file (keyed by mtime and size), so later lookups decode just one slice.
+
+Anything the index cannot answer with certainty -- a stale or ambiguous
+artifact, a field that was not emitted -- returns None so the caller can fall
+back to `forge inspect`.
+"""
+import json
+import mmap
+import os
+import re
+import tomllib
+
+from eth_wh_mcp.abi import AbiError, parse_type
+from eth_wh_mcp.keccak import keccak256
+
+_WHITESPACE = re.compile(rb"[ \t\n\r]*")
+_STRING = re.compile(rb'"(?:[^"\\]+|\\.)*"')
+_SCALAR = re.compile(rb"-?[0-9][0-9eE.+-]*|true|false|null")
+_TOKEN = re.compile(rb'"(?:[^"\\]+|\\.)*"|[\[\]{}]')
+
+# forge inspect field aliases, mapped to (artifact key, path inside the value).
+_FIELD_ALIASES = [
+    (["abi"], ("abi", ())),
+    (["b", "bytes", "bytecode"], ("bytecode", ("object",))),
+    (["deployedBytecode", "deployed_bytecode", "deployed-bytecode", "deployedbytecode", "deployed"],
+     ("deployedBytecode", ("object",))),
+    (["methods", "methodidentifiers", "methodIdentifiers", "method_identifiers", "method-identifiers", "mi"],
+     ("methodIdentifiers", ())),
+    (["storageLayout", "storage_layout", "storage-layout", "storagelayout", "storage"], ("storageLayout", ())),
+    (["metadata", "meta"], ("metadata", ())),
+    (["devdoc", "dev-doc", "devDoc"], ("metadata", ("output", "devdoc"))),
+    (["userdoc", "userDoc", "user-doc"], ("metadata", ("output", "userdoc"))),
+    (["gasEstimates", "gas", "gas_estimates", "gas-estimates", "gasestimates"], ("gasEstimates", ())),
+    (["assembly", "asm"], ("assembly", ())),
+    (["ir"], ("ir", ())),
+    (["ir-optimized", "irOptimized", "iroptimized", "iro", "iropt"], ("irOptimized", ())),
+    (["ewasm", "e-wasm"], ("ewasm", ())),
+]
+_FIELDS = {alias: target for aliases, target in _FIELD_ALIASES for alias in aliases}
+
+# Files whose edits change how forge compiles the project.
+_CONFIG_FILES = ("foundry.toml", "remappings.txt")
+
+
+def _skip_value(buf, pos: int) -> int:
+    """Returns the offset just past the JSON value starting at `pos`, without decoding it."""
+    first = buf[pos:pos + 1]
+    if first == b'"':
+        match = _STRING.match(buf, pos)
+        if match is None:
+            raise ValueError(f"Unterminated JSON string at offset {pos}")
+        return match.end()
+    if first not in (b"{", b"["):
+        match = _SCALAR.match(buf, pos)
+        if match is None:
+            raise ValueError(f"Unexpected JSON at offset {pos}")
+        return match.end()
+
+    depth = 0
+    for token in _TOKEN.finditer(buf, pos):
+        char = token.group()
+        if char in (b"{", b"["):
+            depth += 1
+        elif char in (b"}", b"]"):
+            depth -= 1
+            if depth == 0:
+                return token.end()
+    raise ValueError("Unterminated JSON value")
+
+
+class ArtifactFile:
+    """Lazily indexed top-level keys of one artifact JSON file."""
+
+    def __init__(self, path: str, mtime_ns: int, size: int):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self._spans: dict[str, tuple[int, int]] = {}
+        self._resume: int | None = None  # Offset where the top-level walk stopped; None before the first walk.
+        self._complete = False
+
+    def get(self, key: str):
+        """
+        Decodes and returns one top-level value, or raises KeyError if the artifact lacks it.
+
+        Raises ValueError for an empty or malformed file, such as one forge is still writing.
+        """
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            if key not in self._spans and not self._complete:
+                self._walk_until(buf, key)
+            if key not in self._spans:
+                raise KeyError(key)
+            start, end = self._spans[key]
+            return json.loads(buf[start:end])
+
+    def _walk_until(self, buf, wanted: str) -> None:
+        pos = self._resume
+        if pos is None:
+            pos = _WHITESPACE.match(buf, 0).end()
+            if buf[pos:pos + 1] != b"{":
+                raise ValueError(f"{self.path} is not a JSON object")
+            pos += 1
+
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if buf[pos:pos + 1] == b"}":
+                self._complete = True
+                return
+            key_match = _STRING.match(buf, pos)
+            if key_match is None:
+                raise ValueError(f"Malformed key at offset {pos} in {self.path}")
+            key = json.loads(key_match.group())
+            pos = _WHITESPACE.match(buf, key_match.end()).end() + 1  # Skip the colon.
+            start = _WHITESPACE.match(buf, pos).end()
+            end = _skip_value(buf, start)
+            self._spans[key] = (start, end)
+
+            pos = _WHITESPACE.match(buf, end).end()
+            if buf[pos:pos + 1] == b",":
+                pos += 1
+            self._resume = pos
+            if key == wanted:
+                return
+
+
+def _abi_type(param: dict) -> str:
+    type_text = param["type"]
+    if type_text.startswith("tuple"):
+        inner = ",".join(_abi_type(component) for component in param.get("components", []))
+        type_text = f"({inner})" + type_text[len("tuple"):]
+    return parse_type(type_text).canonical
+
+
+def _abi_signatures(abi: list, kind: str) -> dict[str, bytes]:
+    signatures = {}
+    for item in abi:
+        if item.get("type") == kind:
+            signature = f"{item['name']}(" + ",".join(_abi_type(p) for p in item.get("inputs", [])) + ")"
+            signatures[signature] = keccak256(signature.encode())
+    return signatures
+
+
+class ArtifactIndex:
+    """Maps contracts to fresh artifacts for one project root."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._cache_stamp = None
+        self._entries: dict[str, dict] = {}
+        self._contracts: dict[str, list[tuple[str, str]]] = {}
+        self._artifacts_dir = os.path.join(root, "out")
+        self._files: dict[str, ArtifactFile] = {}
+
+    def inspect(self, contract: str, field: str) -> str | None:
+        """Returns `forge inspect <contract> <field> --json` output, or None if forge must answer it."""
+        if field in ("errors", "events"):
+            abi = self._value(contract, "abi", ())
+            if abi is None:
+                return None
+            try:
+                signatures = _abi_signatures(abi, field[:-1])
+            except (AbiError, KeyError):
+                return None
+            if field == "errors":
+                return json.dumps({sig: digest[:4].hex() for sig, digest in signatures.items()}, indent=2)
+            return json.dumps({sig: "0x" + digest.hex() for sig, digest in signatures.items()}, indent=2)
+
+        if field not in _FIELDS:
+            return None
+        key, path = _FIELDS[field]
+        value = self._value(contract, key, path)
+        if value is None:
+            return None
+        return value if isinstance(value, str) else json.dumps(value, indent=2)
+
+    def _value(self, contract: str, key: str, path: tuple[str, ...]):
+        artifact = self._artifact(contract)
+        if artifact is None:
+            return None
+        try:
+            value = artifact.get(key)
+            if key == "metadata" and isinstance(value, str):
+                value = json.loads(value)
+        except KeyError:
+            if key != "metadata":
+                return None
+            try:
+                value = json.loads(artifact.get("rawMetadata"))
+            except (KeyError, OSError, ValueError):
+                return None
+        except (OSError, ValueError):  # Removed, empty or malformed; forge inspect will tell.
+            return None
+        for part in path:
+            if not isinstance(value, dict) or part not in value:
+                return None
+            value = value[part]
+        return value
+
+    def _artifact(self, contract: str) -> ArtifactFile | None:
+        if not self._load_cache():
+            return None
+        source, _, name = contract.rpartition(":")
+        candidates = [
+            (src, artifact)
+            for src, artifact in self._contracts.get(name, [])
+            if not source or os.path.normpath(src) == os.path.normpath(source)
+        ]
+        if len(candidates) != 1:
+            return None
+        source_path, artifact_path = candidates[0]
+        if not self._is_fresh(source_path, set()):
+            return None
+
+        path = os.path.join(self._artifacts_dir, artifact_path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        cached = self._files.get(path)
+        if cached is None or (cached.mtime_ns, cached.size) != (stat.st_mtime_ns, stat.st_size):
+            cached = self._files[path] = ArtifactFile(path, stat.st_mtime_ns, stat.st_size)
+        return cached
+
+    def _is_fresh(self, source: str, seen: set[str]) -> bool:
+        if source in seen:
+            return True
+        seen.add(source)
+        entry = self._entries.get(source)
+        if entry is None:
+            return False
+        try:
+            modified_ms = os.stat(os.path.join(self.root, source)).st_mtime_ns // 1_000_000
+        except OSError:
+            return False
+        if modified_ms > entry.get("lastModificationDate", 0):
+            return False
+        return all(self._is_fresh(imported, seen) for imported in entry.get("imports", []))
+
+    def _load_cache(self) -> bool:
+        config = self._config()
+        cache_path = os.path.join(self.root, config.get("cache_path", "cache"), "solidity-files-cache.json")
+        try:
+            stat = os.stat(cache_path)
+        except OSError:
+            return False
+
+        # A config or remapping edited after the last compile means forge would rebuild with new settings.
+        for name in _CONFIG_FILES:
+            try:
+                if os.stat(os.path.join(self.root, name)).st_mtime_ns > stat.st_mtime_ns:
+                    return False
+            except OSError:
+                pass
+
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._cache_stamp:
+            return True
+        try:
+            with open(cache_path, "rb") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):  # Gone or being rewritten by forge.
+            return False
+
+        artifacts_dir = cache.get("paths", {}).get("artifacts") or config.get("out", "out")
+        self._artifacts_dir = os.path.join(self.root, artifacts_dir)
+        self._entries = cache.get("files", {})
+        self._contracts = {}
+        for source, entry in self._entries.items():
+            for name, versions in entry.get("artifacts", {}).items():
+                for artifact_path in _artifact_paths(versions):
+                    self._contracts.setdefault(name, []).append((source, artifact_path))
+        self._files.clear()
+        self._cache_stamp = stamp
+        return True
+
+    def _config(self) -> dict:
+        try:
+            with open(os.path.join(self.root, "foundry.toml"), "rb") as f:
+                config = tomllib.load(f)
+        except (OSError, tomllib.TOMLDecodeError):
+            return {}
+        return config.get("profile", {}).get(os.environ.get("FOUNDRY_PROFILE", "default"), {})
+
+
+def _artifact_paths(versions) -> list[str]:
+    """Collects artifact paths from both the flat and the per-profile cache layouts."""
+    if isinstance(versions, str):
+        return [versions]
+    if isinstance(versions, dict):
+        if isinstance(versions.get("path"), str):
+            return [versions["path"]]
+        return [path for value in versions.values() for path in _artifact_paths(value)]
+    return []
+
+
+_indexes: dict[str, ArtifactIndex] = {}
+
+
+def get_index(root: str | None = None) -> ArtifactIndex:
+    """Returns the artifact index for a project root (the working directory by default)."""
+    root = os.path.abspath(root or os.getcwd())
+    index = _indexes.get(root)
+    if index is None:
+        index = _indexes[root] = ArtifactIndex(root)
+    return index
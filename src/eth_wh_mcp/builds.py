@@ -0,0 +1,252 @@
+"""
+Long-lived build sessions.
+
+A `BuildSession` owns the build state of one project (and one set of build
+options). It polls the `src`, `test` and `script` trees and the config files
+with plain `stat` calls -- no file is read -- and backs its polling interval
+off while nothing changes. Once a change has settled for the debounce window,
+the incremental `TreeHasher` confirms the tree differs from the last build and
+the session compiles in the background with `forge build --json`. The last
+result -- parsed into a `BuildReport` -- stays in memory, so `build_project`
+answers immediately when the tree is unchanged, and otherwise waits only for
+the compile in flight. Library changes are not polled; each `build_project`
+call still digests the whole tree, `lib` included, before answering.
+
+Sessions stop watching and are dropped after a period without queries.
+"""
+import asyncio
+import os
+import time
+
+from eth_wh_mcp.cache import (
+    CONFIG_FILES,
+    SKIPPED_DIRS,
+    hasher,
+    project_config,
+    run_cached,
+)
+from eth_wh_mcp.results import BuildReport, parse_json_output
+from eth_wh_mcp.runner import CommandResult, env_int, option_value
+
+# forge's own watch-mode options; sessions replace them.
+_WATCH_FLAGS = {"--watch", "-w", "--no-restart", "--run-all"}
+_WATCH_VALUES = {"--delay"}
+
+
+def strip_watch_options(options: list[str]) -> list[str]:
+    """Removes --watch (and the paths following it) and the other watch-mode flags."""
+    kept = []
+    in_watch_paths = False
+    skip_value = False
+    for option in options:
+        if skip_value:
+            skip_value = False
+            continue
+        flag = option.split("=", 1)[0]
+        if flag in _WATCH_FLAGS:
+            in_watch_paths = flag in ("--watch", "-w") and flag == option
+            continue
+        if flag in _WATCH_VALUES:
+            skip_value = flag == option
+            in_watch_paths = False
+            continue
+        if in_watch_paths and not option.startswith("-"):
+            continue
+        in_watch_paths = False
+        kept.append(option)
+    return kept
+
+
+def source_stamp(root: str) -> list[tuple[str, int, int]]:
+    """Returns (path, mtime, size) for the config files and every file under the source, test and script dirs."""
+    config = project_config(root)
+    stamp = []
+    for name in CONFIG_FILES:
+        try:
+            stat = os.stat(os.path.join(root, name))
+        except OSError:
+            continue
+        stamp.append((name, stat.st_mtime_ns, stat.st_size))
+    pending = sorted({config.get("src", "src"), config.get("test", "test"), config.get("script", "script")})
+    while pending:
+        directory = pending.pop()
+        try:
+            entries = list(os.scandir(os.path.join(root, directory)))
+        except OSError:
+            continue
+        for entry in entries:
+            relative = os.path.join(directory, entry.name)
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIPPED_DIRS:
+                        pending.append(relative)
+                elif entry.is_file():
+                    stat = entry.stat()
+                    stamp.append((relative, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                continue
+    stamp.sort()
+    return stamp
+
+
+class BuildSession:
+    """Watches one project and keeps its latest build result."""
+
+    def __init__(
+        self, root: str, options: list[str], interval: float, debounce: float, idle_timeout: float,
+        max_interval: float | None = None,
+    ):
+        self.root = root
+        self.options = options
+        self.interval = interval
+        self.max_interval = max(interval, max_interval or interval)
+        self.debounce = debounce
+        self.idle_timeout = idle_timeout
+        self.command = ["forge", "build", "--json"] + options
+        self.out_dir = option_value(options, "--out", "-o") or project_config(root).get("out", "out")
+        self.result: CommandResult | None = None
+        self.report: BuildReport | None = None
+        self.built_digest: str | None = None
+        self.compiles = 0
+        self.compiled_at: float | None = None
+        self.last_used = time.monotonic()
+        self._compile: asyncio.Task | None = None
+        self._fresh = False
+        self._watcher: asyncio.Task | None = None
+        self.closed = False
+
+    @property
+    def compiling(self) -> bool:
+        return self._compile is not None and not self._compile.done()
+
+    def start(self) -> None:
+        self._watcher = asyncio.get_running_loop().create_task(self._watch())
+
+    def close(self) -> None:
+        self.closed = True
+        for task in (self._watcher, self._compile):
+            if task is not None and task is not asyncio.current_task():
+                task.cancel()
+
+    async def latest(self, fresh: bool = False) -> CommandResult:
+        """
+        Returns the build result for the current tree, compiling first only if it is out of date.
+
+        Parameters:
+        - fresh (bool): Compile again even if the tree is unchanged (bypassing the result cache).
+
+        Returns:
+        - CommandResult: The result of the latest compile.
+        """
+        self.last_used = time.monotonic()
+        if fresh or self.built_digest is None or await self._digest() != self.built_digest:
+            self._schedule(fresh)
+        if self._compile is not None:
+            # Shielded: a cancelled tool call must not abort the shared background compile.
+            await asyncio.shield(self._compile)
+        return self.result
+
+    def describe(self) -> dict:
+        return {
+            "root": self.root,
+            "options": " ".join(self.options),
+            "watching": not self.closed,
+            "compiles": self.compiles,
+            "compiling": self.compiling,
+            "seconds_since_compile": None if self.compiled_at is None else round(time.monotonic() - self.compiled_at, 1),
+            "exit_code": None if self.result is None else self.result.returncode,
+        }
+
+    async def _digest(self) -> str:
+        return await asyncio.to_thread(hasher.project_digest, self.root)
+
+    def _schedule(self, fresh: bool = False) -> None:
+        self._fresh = self._fresh or fresh
+        if not self.compiling:
+            self._compile = asyncio.get_running_loop().create_task(self._compile_until_current())
+
+    async def _compile_until_current(self) -> None:
+        while True:
+            digest = await self._digest()
+            fresh, self._fresh = self._fresh, False
+            try:
+                result = await run_cached(
+                    self.command, use_cache=not fresh, outputs=(self.out_dir,), full_stdout=True,
+                )
+            except OSError as error:
+                # Surfaced through `result` rather than as an exception nobody may be awaiting.
+                result = CommandResult(self.command, 127, "", str(error))
+            output = parse_json_output(result.stdout)
+            self.result = result
+            self.report = BuildReport.from_json(output, result.returncode) if isinstance(output, dict) else None
+            self.built_digest = digest
+            self.compiles += 1
+            self.compiled_at = time.monotonic()
+            # Edits made while compiling are picked up right away instead of on the next poll.
+            if not self._fresh and await self._digest() == digest:
+                return
+
+    async def _watch(self) -> None:
+        seen = checked = None
+        changed_at = time.monotonic()
+        interval = self.interval
+        while time.monotonic() - self.last_used < self.idle_timeout:
+            await asyncio.sleep(interval)
+            stamp = await asyncio.to_thread(source_stamp, self.root)
+            if stamp != seen:
+                seen, changed_at, interval = stamp, time.monotonic(), self.interval
+            elif stamp != checked and not self.compiling and time.monotonic() - changed_at >= self.debounce:
+                # Settled: only now pay for a digest, which also ignores touches that changed no content.
+                checked = stamp
+                if await self._digest() != self.built_digest:
+                    self._schedule()
+            elif stamp == checked:
+                interval = min(interval * 2, self.max_interval)
+        manager.remove(self)
+
+
+class BuildSessionManager:
+    """Owns one build session per (project root, build options)."""
+
+    def __init__(self, interval: float, debounce: float, idle_timeout: float, max_interval: float | None = None):
+        self.interval = interval
+        self.max_interval = max_interval
+        self.debounce = debounce
+        self.idle_timeout = idle_timeout
+        self.sessions: dict[tuple[str, tuple[str, ...]], BuildSession] = {}
+
+    def get(self, options: list[str], root: str | None = None) -> BuildSession:
+        """Returns the session for `options` in `root` (the working directory by default), starting it if needed."""
+        root = os.path.abspath(root or os.getcwd())
+        options = strip_watch_options(options)
+        key = (root, tuple(options))
+        session = self.sessions.get(key)
+        if session is None or session.closed:
+            session = BuildSession(
+                root, options, self.interval, self.debounce, self.idle_timeout, self.max_interval,
+            )
+            self.sessions[key] = session
+            session.start()
+        return session
+
+    def remove(self, session: BuildSession) -> None:
+        session.close()
+        key = (session.root, tuple(session.options))
+        if self.sessions.get(key) is session:
+            del self.sessions[key]
+
+    def stop(self, root: str | None = None) -> int:
+        """Stops every session of a project root (the working directory by default); returns how many."""
+        root = os.path.abspath(root or os.getcwd())
+        stopped = [session for (session_root, _), session in self.sessions.items() if session_root == root]
+        for session in stopped:
+            self.remove(session)
+        return len(stopped)
+
+
+manager = BuildSessionManager(
+    interval=env_int("FOUNDRY_MCP_WATCH_INTERVAL_MS", 500) / 1000,
+    max_interval=env_int("FOUNDRY_MCP_WATCH_MAX_INTERVAL_MS", 8000) / 1000,
+    debounce=env_int("FOUNDRY_MCP_BUILD_DEBOUNCE_MS", 300, minimum=0) / 1000,
+    idle_timeout=env_int("FOUNDRY_MCP_BUILD_SESSION_IDLE", 900),
+)
@@ -0,0 +1,308 @@
+"""
+Content-addressed cache of forge command results.
+
+A result is keyed by the command, the normalized option list and a digest of
+everything that can change its outcome: the `src`, `test`, `script` and `lib`
+trees, `foundry.toml`, `remappings.txt` and `.env` -- and by the forge version
+and the `FOUNDRY_*` environment variables forge reads its settings from.
+`TreeHasher` memoizes each file's digest by (mtime, size), so recomputing the
+key after an edit only re-reads the files that changed. Other environment
+variables a test or script reads through `vm.env*` are not part of the key.
+
+Only successful runs are cached: a failure may come from something outside the
+key (a flaky RPC, a full disk) and should be seen again on the next call.
+
+Results live in a byte-bounded in-memory LRU and are written through to an
+on-disk store (also byte-bounded) so they survive server restarts.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import tomllib
+from collections import OrderedDict
+from dataclasses import asdict, replace
+
+from eth_wh_mcp.runner import (
+    CommandResult,
+    LineCallback,
+    env_int,
+    option_value,
+    run_command,
+)
+from eth_wh_mcp.toolchain import toolchain
+
+# Options whose outcome depends on something other than the project tree.
+UNCACHEABLE_OPTIONS = {
+    "--fork-url", "-f", "--rpc-url", "--watch", "-w", "--debug", "--ffi", "--force", "--broadcast",
+}
+SKIPPED_DIRS = {".git", "node_modules", "out", "cache", "broadcast"}
+# Files forge reads its configuration from, relative to the project root.
+CONFIG_FILES = ("foundry.toml", "remappings.txt", ".env")
+
+
+def cache_dir(*parts: str) -> str:
+    """Returns (and creates) a directory under the server's persistent cache root."""
+    root = os.environ.get("FOUNDRY_MCP_CACHE_DIR") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "eth-wh-mcp"
+    )
+    path = os.path.join(root, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def project_config(root: str) -> dict:
+    """Returns the active foundry.toml profile for a project root, or {} if there is none."""
+    try:
+        with open(os.path.join(root, "foundry.toml"), "rb") as f:
+            config = tomllib.load(f)
+    except (OSError, tomllib.TOMLDecodeError):
+        return {}
+    return config.get("profile", {}).get(os.environ.get("FOUNDRY_PROFILE", "default"), {})
+
+
+def normalize_options(options: list[str]) -> list[str]:
+    """Splits `--flag=value` into `--flag value` so equivalent spellings share a key."""
+    normalized = []
+    for option in options:
+        if option.startswith("--") and "=" in option:
+            normalized.extend(option.split("=", 1))
+        else:
+            normalized.append(option)
+    return normalized
+
+
+class TreeHasher:
+    """Digests project trees, re-reading only files whose mtime or size changed."""
+
+    def __init__(self):
+        self._files: dict[str, tuple[int, int, bytes]] = {}
+
+    def file_digest(self, path: str, stat: os.stat_result) -> bytes:
+        cached = self._files.get(path)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                digest.update(chunk)
+        self._files[path] = (stat.st_mtime_ns, stat.st_size, digest.digest())
+        return self._files[path][2]
+
+    def project_digest(self, root: str, extra_files: tuple[str, ...] = ()) -> str:
+        """Digests the source, test, script and library trees plus the project's config and `.env` files."""
+        config = project_config(root)
+        dirs = [config.get("src", "src"), config.get("test", "test"), config.get("script", "script")]
+        dirs += config.get("libs", ["lib"])
+        files = [*CONFIG_FILES, *extra_files]
+
+        digest = hashlib.sha256()
+        for name in files:
+            self._add(digest, root, name)
+        for name in sorted(set(dirs)):
+            self._walk(digest, root, name)
+        return digest.hexdigest()
+
+    def tree_digest(self, root: str, dirs: list[str]) -> str:
+        """Digests every file under `dirs` (relative to `root`)."""
+        digest = hashlib.sha256()
+        for name in sorted(set(dirs)):
+            self._walk(digest, root, name)
+        return digest.hexdigest()
+
+    def _add(self, digest, root: str, relative: str) -> None:
+        path = os.path.join(root, relative)
+        try:
+            stat = os.stat(path)
+            file_digest = self.file_digest(path, stat)
+        except OSError:
+            file_digest = b"-"
+        digest.update(relative.encode() + b"\0" + file_digest)
+
+    def _walk(self, digest, root: str, relative: str) -> None:
+        try:
+            entries = sorted(os.scandir(os.path.join(root, relative)), key=lambda entry: entry.name)
+        except OSError:
+            return
+        for entry in entries:
+            child = os.path.join(relative, entry.name)
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in SKIPPED_DIRS:
+                    self._walk(digest, root, child)
+            elif entry.is_file():
+                try:
+                    file_digest = self.file_digest(entry.path, entry.stat())
+                except OSError:
+                    continue
+                digest.update(child.encode() + b"\0" + file_digest)
+
+
+class ResultCache:
+    """Byte-bounded LRU of command results with a persistent on-disk store."""
+
+    def __init__(self, max_bytes: int, max_disk_bytes: int, directory: str | None):
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[CommandResult, int]] = OrderedDict()
+        self._size = 0
+        self._writes = 0
+
+    def get(self, key: str) -> CommandResult | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        result = self._load(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._remember(key, result)
+        return result
+
+    def put(self, key: str, result: CommandResult) -> None:
+        self._remember(key, result)
+        self._store(key, result)
+
+    def _remember(self, key: str, result: CommandResult) -> None:
+        size = len(result.stdout) + len(result.stderr)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._size -= self._entries.pop(key)[1]
+        self._entries[key] = (result, size)
+        self._size += size
+        while self._size > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._size -= evicted
+
+    def _path(self, key: str) -> str | None:
+        if self.directory is None:
+            return None
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def _load(self, key: str) -> CommandResult | None:
+        path = self._path(key)
+        if path is None:
+            return None
+        try:
+            with open(path) as f:
+                result = CommandResult(**json.load(f))
+            os.utime(path)  # Disk eviction is least-recently-used by mtime.
+        except (OSError, ValueError, TypeError):
+            return None
+        return result
+
+    def _store(self, key: str, result: CommandResult) -> None:
+        path = self._path(key)
+        if path is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(asdict(result), f)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        self._writes += 1
+        if self._writes % 32 == 1:
+            self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        files = []
+        for dirpath, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+
+hasher = TreeHasher()
+results = ResultCache(
+    max_bytes=env_int("FOUNDRY_MCP_RESULT_CACHE_BYTES", 64 * 1024 * 1024),
+    max_disk_bytes=env_int("FOUNDRY_MCP_RESULT_DISK_BYTES", 512 * 1024 * 1024),
+    directory=None if os.environ.get("FOUNDRY_MCP_RESULT_CACHE") == "0" else cache_dir("results"),
+)
+
+
+def forge_environment() -> list[tuple[str, str]]:
+    """Returns the `FOUNDRY_*` variables forge would pick up (this server's own `FOUNDRY_MCP_*` excluded)."""
+    return sorted(
+        (name, value) for name, value in os.environ.items()
+        if name.startswith("FOUNDRY_") and not name.startswith("FOUNDRY_MCP_")
+    )
+
+
+def cache_key(args: list[str], root: str, tree_digest: str, forge_version: str | None = None) -> str:
+    payload = [
+        normalize_options(args), os.path.abspath(root), tree_digest, os.environ.get("FOUNDRY_PROFILE", "default"),
+        forge_version, forge_environment(),
+    ]
+    return hashlib.sha256(json.dumps(payload).encode()).hexdigest()
+
+
+def is_cacheable(args: list[str]) -> bool:
+    return not any(option.split("=", 1)[0] in UNCACHEABLE_OPTIONS for option in args)
+
+
+async def run_cached(
+    args: list[str],
+    use_cache: bool = True,
+    on_line: LineCallback | None = None,
+    inputs: tuple[str, ...] = (),
+    outputs: tuple[str, ...] = (),
+    full_stdout: bool = False,
+) -> CommandResult:
+    """
+    Runs a forge command, reusing an earlier result when the project and options are unchanged. The project is
+    the `--root` (`-C`) the command names, or else the working directory.
+
+    Parameters:
+    - args (list[str]): The full command, e.g. ["forge", "test", "--match-test", "testFoo"].
+    - use_cache (bool): Set to False to force a fresh run (the new result still refreshes the cache).
+    - on_line (LineCallback | None): Forwarded to `run_command` when the command actually runs.
+    - inputs (tuple[str, ...]): Extra project files the outcome depends on, e.g. an existing gas snapshot.
+    - outputs (tuple[str, ...]): Files or directories the command writes (relative to the project root); a
+      result is only replayed while they all still exist.
+    - full_stdout (bool): Forwarded to `run_command`; keep stdout whole (for `--json` output).
+
+    Returns:
+    - CommandResult: The fresh or cached result; `cached` is True when it was replayed. Only runs that
+      exited 0 within their timeout are stored.
+    """
+    if not is_cacheable(args):
+        return await run_command(args, on_line=on_line, full_stdout=full_stdout)
+
+    # Relative to the server's working directory, like forge resolves it.
+    root = os.path.abspath(option_value(args, "--root", "-C") or os.getcwd())
+    tree_digest = await asyncio.to_thread(hasher.project_digest, root, inputs)
+    versions = await toolchain.probe()
+    key = cache_key(args, root, tree_digest, versions["forge"])
+
+    if use_cache and all(os.path.exists(os.path.join(root, path)) for path in outputs):
+        cached = results.get(key)
+        if cached is not None:
+            return replace(cached, cached=True)
+
+    result = await run_command(args, on_line=on_line, full_stdout=full_stdout)
+    if result.returncode == 0 and result.timed_out_after is None:
+        results.put(key, result)
+    return result
@@ -0,0 +1,266 @@
+"""
+In-process implementations of common `cast` commands.
+
+`run_native` recognises two groups of commands and answers them without
+spawning `cast`:
+
+- pure utilities (keccak, sig, sig-event, to-wei, from-wei, to-hex, abi-encode,
+  calldata, compute-address), computed locally and memoized in a bounded LRU;
+- read-only RPC commands (balance, nonce, code, storage, block-number, ...),
+  sent through the pooled JSON-RPC client in `eth_wh_mcp.rpc`.
+
+Output is formatted the way `cast` prints it. Anything it does not fully
+understand -- an unknown flag, an ENS name, an RPC error -- returns None so
+the caller falls back to the real `cast` binary.
+"""
+import functools
+import os
+import re
+import tomllib
+
+import httpx
+
+from eth_wh_mcp import abi, rpc
+from eth_wh_mcp.keccak import keccak256
+
+DEFAULT_RPC_URL = "http://localhost:8545"
+
+_ADDRESS = re.compile(r"^0x[0-9a-fA-F]{40}$")
+_HEX = re.compile(r"^0x[0-9a-fA-F]*$")
+_BLOCK_TAGS = {"latest", "earliest", "pending", "finalized", "safe"}
+_UNITS = {
+    "wei": 0,
+    "kwei": 3, "femto": 3, "femtoether": 3, "babbage": 3,
+    "mwei": 6, "pico": 6, "picoether": 6, "lovelace": 6,
+    "gwei": 9, "nano": 9, "nanoether": 9, "shannon": 9,
+    "twei": 12, "micro": 12, "microether": 12, "szabo": 12,
+    "pwei": 15, "milli": 15, "milliether": 15, "finney": 15,
+    "eth": 18, "ether": 18,
+}
+_MAX_UINT256 = (1 << 256) - 1
+
+
+class _Unsupported(Exception):
+    """The invocation needs the real `cast` binary."""
+
+
+def _parse_rpc_args(args: list[str]) -> tuple[list[str], str, str]:
+    """Splits cast arguments into positionals, the RPC URL and the block tag."""
+    positionals = []
+    rpc_url = None
+    block = "latest"
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg in ("--rpc-url", "-r", "--block", "-B"):
+            if i + 1 >= len(args):
+                raise _Unsupported(arg)
+            value = args[i + 1]
+            i += 2
+        elif arg.startswith(("--rpc-url=", "--block=")):
+            arg, value = arg.split("=", 1)
+            i += 1
+        elif arg.startswith("-") and not _HEX.match(arg):
+            raise _Unsupported(arg)
+        else:
+            positionals.append(arg)
+            i += 1
+            continue
+
+        if arg in ("--rpc-url", "-r"):
+            rpc_url = value
+        else:
+            block = _block_tag(value)
+
+    rpc_url = rpc_url or default_rpc_url()
+    if not rpc_url.startswith(("http://", "https://")) or "${" in rpc_url:
+        # RPC aliases, environment references, WebSocket and IPC endpoints are resolved by cast itself.
+        raise _Unsupported(rpc_url)
+    return positionals, rpc_url, block
+
+
+def default_rpc_url() -> str:
+    """The endpoint cast uses without `--rpc-url`: ETH_RPC_URL, then foundry.toml's `eth_rpc_url`, then localhost."""
+    return os.environ.get("ETH_RPC_URL") or _configured_rpc_url() or DEFAULT_RPC_URL
+
+
+def _configured_rpc_url() -> str | None:
+    """Returns `eth_rpc_url` from the active foundry.toml profile, as cast would use it."""
+    try:
+        with open("foundry.toml", "rb") as f:
+            config = tomllib.load(f)
+    except (OSError, tomllib.TOMLDecodeError):
+        return None
+    profile = config.get("profile", {}).get(os.environ.get("FOUNDRY_PROFILE", "default"), {})
+    return profile.get("eth_rpc_url")
+
+
+def _block_tag(value: str) -> str:
+    if value in _BLOCK_TAGS:
+        return value
+    if value.isdigit():
+        return hex(int(value))
+    if _HEX.match(value) and len(value) <= 18:
+        return hex(int(value, 16))
+    # Block hashes and other forms are left to cast.
+    raise _Unsupported(value)
+
+
+def _address(value: str) -> str:
+    if not _ADDRESS.match(value):
+        raise _Unsupported(value)
+    return value
+
+
+def _quantity(value: str) -> int:
+    return int(value, 16)
+
+
+def _slot(value: str) -> str:
+    number = int(value, 16) if value.startswith("0x") else int(value)
+    return "0x" + format(number, "064x")
+
+
+async def _rpc_command(command: str, args: list[str], rpc_url: str, block: str) -> str:
+    call = rpc.call
+    match command, args:
+        case ("block-number" | "bn"), []:
+            return str(_quantity(await call(rpc_url, "eth_blockNumber")))
+        case ("chain-id" | "ci" | "cid"), []:
+            return str(_quantity(await call(rpc_url, "eth_chainId")))
+        case ("gas-price" | "g"), []:
+            return str(_quantity(await call(rpc_url, "eth_gasPrice")))
+        case ("balance" | "b"), [who]:
+            return str(_quantity(await call(rpc_url, "eth_getBalance", [_address(who), block])))
+        case ("nonce" | "n"), [who]:
+            return str(_quantity(await call(rpc_url, "eth_getTransactionCount", [_address(who), block])))
+        case ("code" | "co"), [who]:
+            return await call(rpc_url, "eth_getCode", [_address(who), block])
+        case ("codesize" | "cs"), [who]:
+            code = await call(rpc_url, "eth_getCode", [_address(who), block])
+            return str((len(code) - 2) // 2)
+        case ("storage" | "st"), [who, slot]:
+            value = await call(rpc_url, "eth_getStorageAt", [_address(who), _slot(slot), block])
+            return "0x" + value[2:].rjust(64, "0")
+        case ("call" | "c"), [to, data] if _HEX.match(data):
+            return await call(rpc_url, "eth_call", [{"to": _address(to), "data": data}, block])
+    raise _Unsupported(command)
+
+
+def _unit(name: str) -> int:
+    name = name.lower()
+    if name in _UNITS:
+        return _UNITS[name]
+    if name.isdigit() and int(name) <= 77:
+        return int(name)
+    raise _Unsupported(name)
+
+
+def _uint(value: str) -> int:
+    if value.startswith("0x"):
+        number = int(value, 16)
+    elif value.isdigit():
+        number = int(value)
+    else:
+        raise _Unsupported(value)
+    if number > _MAX_UINT256:
+        raise _Unsupported(value)
+    return number
+
+
+def _to_wei(value: str, unit: str) -> str:
+    decimals = _unit(unit)
+    if not re.match(r"^\d+(\.\d*)?$", value):
+        raise _Unsupported(value)
+    integer, _, fraction = value.partition(".")
+    fraction = fraction.rstrip("0")
+    if len(fraction) > decimals:
+        raise _Unsupported(value)
+    wei = int(integer) * 10 ** decimals + int(fraction.ljust(decimals, "0") or 0)
+    if wei > _MAX_UINT256:
+        raise _Unsupported(value)
+    return str(wei)
+
+
+def _from_wei(value: str, unit: str) -> str:
+    decimals = _unit(unit)
+    integer, remainder = divmod(_uint(value), 10 ** decimals)
+    return f"{integer}.{str(remainder).rjust(decimals, '0')}"
+
+
+def _rlp_bytes(data: bytes) -> bytes:
+    if len(data) == 1 and data[0] < 0x80:
+        return data
+    return bytes([0x80 + len(data)]) + data
+
+
+def _compute_address(deployer: str, nonce: int) -> str:
+    nonce_bytes = nonce.to_bytes((nonce.bit_length() + 7) // 8, "big")
+    payload = _rlp_bytes(bytes.fromhex(_address(deployer)[2:])) + _rlp_bytes(nonce_bytes)
+    encoded = bytes([0xC0 + len(payload)]) + payload
+    return abi.to_checksum_address(keccak256(encoded)[12:])
+
+
+@functools.lru_cache(maxsize=4096)
+def _offline(args: tuple[str, ...]) -> str | None:
+    command, rest = args[0], list(args[1:])
+    match command, rest:
+        case ("keccak" | "k"), [data]:
+            payload = bytes.fromhex(data[2:].rstrip()) if data.startswith("0x") else data.encode()
+            return "0x" + keccak256(payload).hex()
+        case ("sig" | "si"), [signature]:
+            return "0x" + abi.parse_signature(signature).selector.hex()
+        case ("sig-event" | "se"), [signature]:
+            return "0x" + abi.parse_signature(signature).topic.hex()
+        case ("to-wei" | "tw"), [value]:
+            return _to_wei(value, "ether")
+        case ("to-wei" | "tw"), [value, unit]:
+            return _to_wei(value, unit)
+        case ("from-wei" | "fw"), [value]:
+            return _from_wei(value, "ether")
+        case ("from-wei" | "fw"), [value, unit]:
+            return _from_wei(value, unit)
+        case ("to-hex" | "th"), [value]:
+            return hex(_uint(value))
+        case ("abi-encode" | "ae"), [signature, *values] if not any(v.startswith("--") for v in values):
+            return "0x" + abi.encode_arguments(abi.parse_signature(signature), values).hex()
+        case ("calldata" | "cd"), [signature, *values] if not any(v.startswith("--") for v in values):
+            parsed = abi.parse_signature(signature)
+            return "0x" + (parsed.selector + abi.encode_arguments(parsed, values)).hex()
+        case ("compute-address" | "ca"), [deployer, "--nonce", nonce]:
+            return f"Computed Address: {_compute_address(deployer, _uint(nonce))}"
+        case ("compute-address" | "ca"), [deployer, option] if option.startswith("--nonce="):
+            return f"Computed Address: {_compute_address(deployer, _uint(option.split('=', 1)[1]))}"
+    raise _Unsupported(command)
+
+
+def run_offline(args: list[str]) -> str | None:
+    """Evaluates a pure cast utility, or returns None if it is not one this module implements."""
+    try:
+        return _offline(tuple(args)) + "\n"
+    except (_Unsupported, ValueError, IndexError):
+        return None
+
+
+async def run_native(args: list[str]) -> str | None:
+    """
+    Evaluates a cast invocation in-process.
+
+    Parameters:
+    - args (list[str]): The cast arguments, without the leading "cast".
+
+    Returns:
+    - str | None: The output `cast` would print, or None if the call must go to `cast`.
+    """
+    if not args:
+        return None
+    output = run_offline(args)
+    if output is not None:
+        return output
+
+    command, rest = args[0], args[1:]
+    try:
+        positionals, rpc_url, block = _parse_rpc_args(rest)
+        return await _rpc_command(command, positionals, rpc_url, block) + "\n"
+    except (_Unsupported, ValueError, httpx.HTTPError, rpc.JsonRpcError):
+        return None
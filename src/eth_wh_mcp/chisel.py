@@ -0,0 +1,377 @@
+"""
+Pooled, long-lived Chisel REPL sessions.
+
+`ChiselManager` keeps Chisel processes alive and talks to them over stdin and
+stdout. Chisel reads one input per line, so a snippet is first split into
+input lines: comments are dropped, and a construct spanning several lines is
+joined into one. To know where the output of a snippet ends, its lines are
+followed by a string-literal sentinel; Chisel echoes its value, and everything
+printed before that echo belongs to the snippet.
+
+Option-less sessions are interchangeable, so the manager keeps a small warm
+pool of them, already past REPL start-up and the first compile, and fills it
+when the server starts. Start-ups are admitted as light jobs by the scheduler.
+Anonymous
+evaluations borrow a pooled session and `!clear` it before handing it back;
+named sessions keep their state between calls. Sessions idle for too long, or
+beyond the session limit (least recently used first), are stopped. Each
+session runs in its own process group and is recorded in the reaper's child
+registry until it is stopped.
+"""
+import asyncio
+import atexit
+import itertools
+import re
+import signal
+import time
+from collections import OrderedDict
+
+from eth_wh_mcp.reaper import children
+from eth_wh_mcp.runner import (
+    LIGHT,
+    OutputBuffer,
+    env_int,
+    pump_lines,
+    scheduler,
+    signal_group,
+)
+
+_ANSI = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+_PROMPT = re.compile(r"^(?:\s*(?:➜|>)\s)+")
+
+
+class ChiselError(Exception):
+    """Raised when a session cannot be started or stops responding."""
+
+
+def _clean(line: str) -> str:
+    return _PROMPT.sub("", _ANSI.sub("", line)).rstrip()
+
+
+def split_inputs(code: str) -> list[str]:
+    """
+    Splits a snippet into the lines to send to the REPL.
+
+    `//` and `/* */` comments outside string literals are removed, and lines inside
+    an unclosed bracket (a function or contract body, a call spread over several
+    lines) are joined with the line that closes it. Lines starting with `!` are REPL
+    commands and are passed on unchanged.
+    """
+    inputs = []
+    current: list[str] = []
+    depth = 0
+    in_comment = False
+
+    def finish() -> None:
+        text = "".join(current).strip()
+        if text:
+            inputs.append(text)
+        current.clear()
+
+    for line in code.splitlines():
+        line = line.strip()
+        if depth == 0 and not in_comment and not "".join(current).strip() and line.startswith("!"):
+            inputs.append(line)
+            continue
+        quote = None  # Solidity string literals cannot span lines.
+        i = 0
+        while i < len(line):
+            char = line[i]
+            if in_comment:
+                if line.startswith("*/", i):
+                    in_comment = False
+                    current.append(" ")
+                    i += 1
+            elif quote:
+                current.append(char)
+                if char == "\\" and i + 1 < len(line):
+                    i += 1
+                    current.append(line[i])
+                elif char == quote:
+                    quote = None
+            elif line.startswith("//", i):
+                break
+            elif line.startswith("/*", i):
+                in_comment = True
+                i += 1
+            else:
+                if char in "\"'":
+                    quote = char
+                elif char in "([{":
+                    depth += 1
+                elif char in ")]}":
+                    depth = max(0, depth - 1)
+                current.append(char)
+            i += 1
+        if depth == 0 and not in_comment:
+            finish()
+        elif current and current[-1] != " ":
+            current.append(" ")
+    finish()
+    return inputs
+
+
+class ChiselSession:
+    """A running Chisel REPL tracked by the manager."""
+
+    def __init__(self, session_id: str, options: list[str], process: asyncio.subprocess.Process):
+        self.session_id = session_id
+        self.options = options
+        self.process = process
+        self.started_at = time.time()
+        self.last_used = time.monotonic()
+        self.evaluations = 0
+        self.lock = asyncio.Lock()
+        self.stderr = OutputBuffer(4 * 1024, 60 * 1024)
+        self._errors: list[str] = []  # stderr lines not yet returned with an evaluation.
+        self._sentinels = itertools.count(1)
+        self._drain: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self.process.returncode is None
+
+    @property
+    def poolable(self) -> bool:
+        return not self.options
+
+    def describe(self) -> dict:
+        return {
+            "id": self.session_id,
+            "pid": self.process.pid,
+            "options": " ".join(self.options),
+            "running": self.running,
+            "evaluations": self.evaluations,
+            "idle_seconds": round(time.monotonic() - self.last_used, 1),
+        }
+
+    async def evaluate(self, code: str, timeout: float) -> str:
+        """
+        Sends a snippet to the REPL and returns what Chisel printed for it.
+
+        Parameters:
+        - code (str): Solidity statements, expressions or `!` commands, split into REPL inputs by `split_inputs`.
+        - timeout (float): Seconds to wait for the output before the session is considered hung.
+
+        Returns:
+        - str: The cleaned stdout of the snippet, followed by anything written to stderr meanwhile.
+        """
+        async with self.lock:
+            if not self.running:
+                raise ChiselError(f"Chisel session {self.session_id} has exited")
+            self.last_used = time.monotonic()
+            sentinel = f"__foundry_mcp_{next(self._sentinels)}__"
+            request = "".join(f"{line}\n" for line in split_inputs(code)) + f'"{sentinel}"\n'
+            self.process.stdin.write(request.encode())
+            try:
+                await self.process.stdin.drain()
+                lines = await asyncio.wait_for(self._read_until(sentinel), timeout)
+            except (TimeoutError, ConnectionError) as error:
+                signal_group(self.process, signal.SIGKILL)
+                raise ChiselError(f"Chisel session {self.session_id} did not answer within {timeout:g}s") from error
+            self.evaluations += 1
+            self.last_used = time.monotonic()
+
+            await asyncio.sleep(0)  # Let the stderr pump catch up with what was written before the sentinel.
+            errors, self._errors = self._errors, []
+            return "\n".join(lines + [_clean(line) for line in errors]).strip()
+
+    async def on_stderr(self, stream: str, line: str) -> None:
+        if len(self._errors) < 1000:
+            self._errors.append(line)
+
+    async def _read_until(self, sentinel: str) -> list[str]:
+        lines = []
+        while True:
+            raw = await self.process.stdout.readline()
+            if not raw:
+                raise ChiselError(f"Chisel session {self.session_id} exited:\n{self.stderr.text()}")
+            line = _clean(raw.decode(errors="replace"))
+            if sentinel not in line:
+                lines.append(line)
+                continue
+            # The sentinel's own value block ("Type: string", then "├ ..." lines up to a "└ ..." line).
+            if lines and lines[-1].startswith("Type: string"):
+                lines.pop()
+            if not line.startswith(("├", "└")):
+                return lines
+            while not line.startswith("└"):
+                raw = await self.process.stdout.readline()
+                if not raw:
+                    break
+                line = _clean(raw.decode(errors="replace"))
+            return lines
+
+
+class ChiselManager:
+    """Tracks named Chisel sessions and a warm pool of clean ones."""
+
+    def __init__(self, pool_size: int, max_sessions: int, idle_timeout: float, eval_timeout: float):
+        self.pool_size = pool_size
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.eval_timeout = eval_timeout
+        self.sessions: OrderedDict[str, ChiselSession] = OrderedDict()
+        self._pool: list[ChiselSession] = []
+        self._ids = itertools.count(1)
+        self._refill: asyncio.Task | None = None
+        self._reaper: asyncio.Task | None = None
+
+    def get(self, session_id: str) -> ChiselSession:
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise ChiselError(f"Unknown Chisel session: {session_id}")
+        return session
+
+    async def start(self, options: list[str]) -> ChiselSession:
+        """Starts a named session (or takes one from the warm pool), evicting the least recently used if full."""
+        self._schedule_reaper()
+        session = None
+        if not options:
+            session = self._take_from_pool()
+            self._schedule_refill()
+        if session is None:
+            session = await self._spawn(options)
+        self.sessions[session.session_id] = session
+        while len(self.sessions) > self.max_sessions:
+            _, evicted = self.sessions.popitem(last=False)
+            await self._terminate(evicted)
+        return session
+
+    async def evaluate(self, code: str, session_id: str = "") -> str:
+        """Evaluates a snippet in a named session, or in a borrowed clean session that is reset afterwards."""
+        self._schedule_reaper()
+        if session_id:
+            session = self.get(session_id)
+            self.sessions.move_to_end(session_id)
+            return await session.evaluate(code, self.eval_timeout)
+
+        session = self._take_from_pool() or await self._spawn([])
+        self._schedule_refill()
+        try:
+            output = await session.evaluate(code, self.eval_timeout)
+        except BaseException:
+            await self._terminate(session)
+            raise
+        await self._recycle(session)
+        return output
+
+    async def stop(self, session_id: str) -> None:
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            raise ChiselError(f"Unknown Chisel session: {session_id}")
+        await self._terminate(session)
+
+    async def reap_exited(self) -> int:
+        """Drops sessions whose process has exited and refills the warm pool; returns how many were dropped."""
+        exited = [session for session in list(self.sessions.values()) + self._pool if not session.running]
+        for session in exited:
+            self.sessions.pop(session.session_id, None)
+            if session in self._pool:
+                self._pool.remove(session)
+            await self._terminate(session)
+        if exited:
+            self._schedule_refill()
+        return len(exited)
+
+    def kill_all(self) -> None:
+        """Synchronously kills every session; registered to run at interpreter exit."""
+        for session in list(self.sessions.values()) + self._pool:
+            if session.running:
+                signal_group(session.process, signal.SIGKILL)
+        children.clear()
+
+    async def _recycle(self, session: ChiselSession) -> None:
+        if len(self._pool) < self.pool_size and session.running:
+            try:
+                await session.evaluate("!clear", self.eval_timeout)
+            except ChiselError:
+                pass
+            else:
+                self._pool.append(session)
+                return
+        await self._terminate(session)
+
+    def _take_from_pool(self) -> ChiselSession | None:
+        while self._pool:
+            session = self._pool.pop()
+            if session.running:
+                return session
+        return None
+
+    def prewarm(self) -> None:
+        """Starts filling the warm pool in the background, so the first anonymous evaluation does not wait for it."""
+        self._schedule_refill()
+
+    def _schedule_refill(self) -> None:
+        if self.pool_size and (self._refill is None or self._refill.done()):
+            self._refill = asyncio.create_task(self._fill_pool())
+
+    def _schedule_reaper(self) -> None:
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_idle())
+
+    async def _fill_pool(self) -> None:
+        while len(self._pool) < self.pool_size:
+            try:
+                session = await self._spawn([])
+            except (ChiselError, OSError):
+                return
+            if len(self._pool) >= self.pool_size:
+                await self._terminate(session)
+                return
+            self._pool.append(session)
+
+    async def _reap_idle(self) -> None:
+        while self.sessions:
+            await asyncio.sleep(min(self.idle_timeout, 30))
+            now = time.monotonic()
+            for session_id, session in list(self.sessions.items()):
+                if not session.running or (now - session.last_used > self.idle_timeout and not session.lock.locked()):
+                    del self.sessions[session_id]
+                    await self._terminate(session)
+
+    async def _spawn(self, options: list[str]) -> ChiselSession:
+        # Start-up (REPL and first solc compile) is the expensive part; once running, a session is idle input.
+        async with scheduler.slot(LIGHT):
+            process = await asyncio.create_subprocess_exec(
+                "chisel", *options,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True,
+            )
+            children.add(process.pid, "chisel")
+            session = ChiselSession(f"chisel-{next(self._ids)}", options, process)
+            session._drain = asyncio.create_task(
+                pump_lines(process.stderr, "stderr", session.stderr, session.on_stderr)
+            )
+            try:
+                # Consumes the banner, and the sentinel's compile pays for solc start-up before real input arrives.
+                await session.evaluate("", self.eval_timeout)
+            except BaseException:
+                await self._terminate(session)
+                raise
+        return session
+
+    async def _terminate(self, session: ChiselSession) -> None:
+        if session.running:
+            session.process.stdin.close()
+            signal_group(session.process, signal.SIGTERM)
+            try:
+                await asyncio.wait_for(session.process.wait(), 5)
+            except TimeoutError:
+                signal_group(session.process, signal.SIGKILL)
+                await session.process.wait()
+        children.discard(session.process.pid)
+        if session._drain is not None:
+            await session._drain
+
+
+manager = ChiselManager(
+    pool_size=env_int("FOUNDRY_MCP_CHISEL_POOL", 1, minimum=0),
+    max_sessions=env_int("FOUNDRY_MCP_CHISEL_SESSIONS", 8),
+    idle_timeout=env_int("FOUNDRY_MCP_CHISEL_IDLE", 600),
+    eval_timeout=env_int("FOUNDRY_MCP_CHISEL_TIMEOUT", 60),
+)
+atexit.register(manager.kill_all)
@@ -0,0 +1,523 @@
+"""
+An in-memory LCOV coverage index with incremental re-coverage.
+
+`parse_lcov` turns an `lcov.info` report into one `FileCoverage` per source
+file: line, branch and function hits held in sorted arrays, so a file summary
+or a line-range query is a couple of bisections.
+
+`CoverageIndex` keeps the index of one project, together with the digest of
+every Solidity file at the time it was measured, and persists both in the
+cache directory. When sources change, `plan` works out the smallest correct
+re-run from the project's import graph:
+
+1. the changed files,
+2. the tests that reach a changed file through their imports (or name it, as
+   in `deployCode("Counter.sol")`),
+3. the project files those tests reach (their hits may have moved), and
+4. every test that reaches one of those files.
+
+Re-running the tests of step 4 with `--match-path` gives complete hit counts
+for the files of step 3, which replace their entries in the index; all other
+entries are kept. Library files reached through imports are part of the graph,
+so an edited or updated library re-runs the tests that import it; their index
+entries are only replaced when they change themselves. Option or configuration
+changes, or a re-run that would include every test anyway, fall back to a full
+run. So does any change under the library directories when some import could
+not be resolved to a file, since the graph cannot tell what it reaches.
+"""
+import asyncio
+import bisect
+import hashlib
+import json
+import os
+import re
+import time
+from array import array
+from dataclasses import asdict, dataclass, field
+
+from eth_wh_mcp.cache import SKIPPED_DIRS, cache_dir, hasher, project_config
+from eth_wh_mcp.runner import CommandResult, LineCallback, run_command
+from eth_wh_mcp.shards import strip_options
+
+_IMPORT = re.compile(r"""\bimport\s+(?:[^"';]*?\bfrom\s+)?["']([^"']+)["']""")
+_CONFIG_FILES = ("foundry.toml", "remappings.txt")
+
+# Options the index manages itself; they are not part of the options a coverage index is measured with.
+REPORT_OPTIONS = {"--report", "--report-file", "-r", "--match-path", "--mp"}
+
+
+@dataclass
+class FileCoverage:
+    """Line, branch and function hits of one source file."""
+
+    path: str
+    lines: array = field(default_factory=lambda: array("I"))  # Instrumented line numbers, ascending.
+    line_hits: array = field(default_factory=lambda: array("Q"))
+    branch_lines: array = field(default_factory=lambda: array("I"))  # One entry per branch, ascending by line.
+    branch_ids: list[str] = field(default_factory=list)  # "block:branch"
+    branch_taken: array = field(default_factory=lambda: array("q"))  # -1 when the branch was never evaluated.
+    functions: list[tuple[str, int, int]] = field(default_factory=list)  # (name, line, hits), ascending by line.
+
+    @classmethod
+    def build(cls, path: str, lines: dict, branches: dict, functions: dict) -> "FileCoverage":
+        ordered_lines = sorted(lines)
+        ordered_branches = sorted(branches, key=lambda key: (key[0], key[1], key[2]))
+        return cls(
+            path=path,
+            lines=array("I", ordered_lines),
+            line_hits=array("Q", (lines[line] for line in ordered_lines)),
+            branch_lines=array("I", (key[0] for key in ordered_branches)),
+            branch_ids=[f"{key[1]}:{key[2]}" for key in ordered_branches],
+            branch_taken=array("q", (branches[key] for key in ordered_branches)),
+            functions=sorted(((name, line, hits) for name, (line, hits) in functions.items()),
+                             key=lambda function: (function[1], function[0])),
+        )
+
+    def summary(self) -> dict:
+        lines_hit = sum(1 for hits in self.line_hits if hits)
+        branches_hit = sum(1 for taken in self.branch_taken if taken > 0)
+        functions_hit = sum(1 for _, _, hits in self.functions if hits)
+        return {
+            "file": self.path,
+            "lines": [lines_hit, len(self.lines)],
+            "branches": [branches_hit, len(self.branch_taken)],
+            "functions": [functions_hit, len(self.functions)],
+            "line_percent": _percent(lines_hit, len(self.lines)),
+        }
+
+    def query(self, start: int = 0, end: int = 0, uncovered_only: bool = False) -> dict:
+        """Returns the hits of lines `start`..`end` (inclusive; 0 means unbounded) and the branches and functions there."""
+        end = end or 2 ** 32 - 1
+        first, last = bisect.bisect_left(self.lines, start), bisect.bisect_right(self.lines, end)
+        lines = [
+            [self.lines[i], self.line_hits[i]]
+            for i in range(first, last)
+            if not uncovered_only or not self.line_hits[i]
+        ]
+        first, last = bisect.bisect_left(self.branch_lines, start), bisect.bisect_right(self.branch_lines, end)
+        branches = [
+            {"line": self.branch_lines[i], "branch": self.branch_ids[i], "taken": max(self.branch_taken[i], 0)}
+            for i in range(first, last)
+            if not uncovered_only or self.branch_taken[i] <= 0
+        ]
+        functions = [
+            {"name": name, "line": line, "hits": hits}
+            for name, line, hits in self.functions
+            if start <= line <= end and (not uncovered_only or not hits)
+        ]
+        return {**self.summary(), "range": [start, end if end < 2 ** 32 - 1 else None], "line_hits": lines,
+                "branch_hits": branches, "function_hits": functions}
+
+    def to_lcov(self) -> str:
+        out = [f"SF:{self.path}"]
+        out += [f"FN:{line},{name}" for name, line, _ in self.functions]
+        out += [f"FNDA:{hits},{name}" for name, _, hits in self.functions]
+        out += [f"FNF:{len(self.functions)}", f"FNH:{sum(1 for _, _, hits in self.functions if hits)}"]
+        out += [f"DA:{line},{hits}" for line, hits in zip(self.lines, self.line_hits)]
+        out += [f"LF:{len(self.lines)}", f"LH:{sum(1 for hits in self.line_hits if hits)}"]
+        for line, branch, taken in zip(self.branch_lines, self.branch_ids, self.branch_taken):
+            block, number = branch.split(":")
+            out.append(f"BRDA:{line},{block},{number},{'-' if taken < 0 else taken}")
+        out += [f"BRF:{len(self.branch_taken)}", f"BRH:{sum(1 for taken in self.branch_taken if taken > 0)}"]
+        out.append("end_of_record")
+        return "\n".join(out) + "\n"
+
+
+def _percent(hit: int, found: int) -> float | None:
+    return round(100 * hit / found, 2) if found else None
+
+
+def parse_lcov(text: str, root: str = "") -> dict[str, FileCoverage]:
+    """
+    Parses an LCOV tracefile into `FileCoverage` records keyed by project-relative path.
+
+    Records for the same file (e.g. from several test names) are merged by summing their hits.
+    """
+    files: dict[str, tuple[dict, dict, dict]] = {}
+    current = None
+    for raw in text.splitlines():
+        tag, _, value = raw.strip().partition(":")
+        if tag == "SF":
+            path = os.path.relpath(value, root) if root and os.path.isabs(value) else os.path.normpath(value)
+            current = files.setdefault(path, ({}, {}, {}))
+        elif current is None:
+            continue
+        elif tag == "DA":
+            line, hits = value.split(",")[:2]
+            current[0][int(line)] = current[0].get(int(line), 0) + int(hits)
+        elif tag == "BRDA":
+            line, block, branch, taken = value.split(",")[:4]
+            key = (int(line), block, branch)
+            previous = current[1].get(key, -1)
+            current[1][key] = previous if taken == "-" else max(previous, 0) + int(taken)
+        elif tag == "FN":
+            # "FN:line,name", or "FN:start,end,name" from newer tools.
+            parts = value.split(",")
+            name = parts[-1]
+            current[2][name] = (int(parts[0]), current[2].get(name, (0, 0))[1])
+        elif tag == "FNDA":
+            hits, name = value.split(",", 1)
+            line, previous = current[2].get(name, (0, 0))
+            current[2][name] = (line, previous + int(hits))
+        elif tag == "end_of_record":
+            current = None
+    return {path: FileCoverage.build(path, *data) for path, data in files.items()}
+
+
+class ImportGraph:
+    """The Solidity files of a project, the library files they import, and what each file imports, transitively."""
+
+    def __init__(self, root: str):
+        self.root = root
+        config = project_config(root)
+        self.source_dirs = [config.get("src", "src"), config.get("script", "script")]
+        self.test_dir = config.get("test", "test")
+        self.lib_dirs = list(config.get("libs", ["lib"]))
+        self.remappings = self._remappings(config)
+        self.files: dict[str, str] = {}  # relative path -> source text
+        for directory in self.source_dirs + [self.test_dir]:
+            self._scan(directory)
+        self.unresolved: set[str] = set()  # Non-relative imports that matched no file.
+        self.imports: dict[str, set[str]] = {}
+        pending = list(self.files)
+        while pending:
+            path = pending.pop()
+            if path not in self.imports:
+                self.imports[path] = self._resolve_imports(path, self.files[path], pending)
+        self._closure: dict[str, set[str]] = {}
+
+    @property
+    def tests(self) -> list[str]:
+        return sorted(path for path in self.files if self.is_test(path) and path.endswith(".t.sol"))
+
+    def is_test(self, path: str) -> bool:
+        return path == self.test_dir or path.startswith(self.test_dir.rstrip("/") + "/")
+
+    def is_library(self, path: str) -> bool:
+        return any(path.startswith(directory.rstrip("/") + "/") for directory in self.lib_dirs)
+
+    def dependencies(self, path: str) -> set[str]:
+        """Every project file `path` imports, directly or through other imports."""
+        if path not in self._closure:
+            self._closure[path] = set()  # Guards against import cycles.
+            reached = set()
+            for imported in self.imports.get(path, ()):
+                reached.add(imported)
+                reached |= self.dependencies(imported)
+            self._closure[path] = reached
+        return self._closure[path]
+
+    def tests_reaching(self, paths: set[str]) -> set[str]:
+        """Tests that import one of `paths` (transitively), are one of them, or name one of them."""
+        names = {os.path.basename(path) for path in paths if not self.is_test(path)}
+        reached = set()
+        for test in self.tests:
+            if (test in paths or self.dependencies(test) & paths
+                    or any(f'"{name}' in self.files[test] or f"/{name}" in self.files[test] for name in names)):
+                reached.add(test)
+        return reached
+
+    def _scan(self, relative: str) -> None:
+        try:
+            entries = list(os.scandir(os.path.join(self.root, relative)))
+        except OSError:
+            return
+        for entry in entries:
+            child = os.path.normpath(os.path.join(relative, entry.name))
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in SKIPPED_DIRS:
+                    self._scan(child)
+            elif entry.name.endswith(".sol"):
+                try:
+                    with open(entry.path, encoding="utf-8", errors="replace") as f:
+                        self.files[child] = f.read()
+                except OSError:
+                    continue
+
+    def _remappings(self, config: dict) -> list[tuple[str, str]]:
+        remappings = list(config.get("remappings", []))
+        try:
+            with open(os.path.join(self.root, "remappings.txt")) as f:
+                remappings += [line.strip() for line in f if "=" in line]
+        except OSError:
+            pass
+        pairs = []
+        for remapping in remappings:
+            prefix, _, target = remapping.split(":", 1)[-1].partition("=")
+            pairs.append((prefix, target))
+        return sorted(pairs, key=lambda pair: len(pair[0]), reverse=True)
+
+    def _resolve_imports(self, path: str, text: str, pending: list[str]) -> set[str]:
+        """Resolves the imports of one file, loading imported files outside the scanned dirs (libraries) on the way."""
+        resolved = set()
+        for target in _IMPORT.findall(text):
+            if target.startswith("."):
+                candidates = [os.path.join(os.path.dirname(path), target)]
+            else:
+                candidates = [target]
+                for prefix, replacement in self.remappings:
+                    if target.startswith(prefix):
+                        candidates = [replacement + target[len(prefix):]]
+                        break
+                else:
+                    # forge's automatic remappings: "name/..." -> "<lib>/name/src/..." or "<lib>/name/...".
+                    name, _, rest = target.partition("/")
+                    for directory in self.lib_dirs:
+                        candidates += [os.path.join(directory, name, "src", rest), os.path.join(directory, name, rest)]
+            candidate = next(filter(None, map(self._load, candidates)), None)
+            if candidate is None:
+                if not target.startswith("."):
+                    self.unresolved.add(target)
+                continue
+            resolved.add(candidate)
+            if candidate not in self.imports:
+                pending.append(candidate)
+        return resolved
+
+    def _load(self, candidate: str) -> str | None:
+        """Returns the normalized path of an importable file inside the project, reading it if not seen yet."""
+        candidate = os.path.normpath(candidate)
+        if candidate in self.files:
+            return candidate
+        if os.path.isabs(candidate) or candidate.startswith(".."):
+            return None
+        try:
+            with open(os.path.join(self.root, candidate), encoding="utf-8", errors="replace") as f:
+                self.files[candidate] = f.read()
+        except OSError:
+            return None
+        return candidate
+
+
+@dataclass
+class CoveragePlan:
+    """What an `update` will run: everything, nothing, or the tests needed to refresh `patch`."""
+
+    mode: str  # "full", "incremental" or "current"
+    reason: str
+    changed: list[str] = field(default_factory=list)
+    tests: list[str] = field(default_factory=list)
+    patch: list[str] = field(default_factory=list)
+    deleted: list[str] = field(default_factory=list)
+
+    def match_path(self) -> str:
+        return self.tests[0] if len(self.tests) == 1 else "{" + ",".join(self.tests) + "}"
+
+
+class CoverageIndex:
+    """The coverage of one project, the file digests it was measured at, and its on-disk copy."""
+
+    def __init__(self, root: str):
+        self.root = root
+        name = hashlib.sha256(root.encode()).hexdigest()[:16]
+        self.report_path = os.path.join(cache_dir("coverage"), name + ".info")
+        self.state_path = os.path.join(cache_dir("coverage"), name + ".json")
+        self.run_path = os.path.join(cache_dir("coverage"), name + ".run.info")  # Where forge writes each run.
+        self.lock = asyncio.Lock()
+        self.files: dict[str, FileCoverage] = {}
+        self.digests: dict[str, str] = {}
+        self.config_digest: str | None = None
+        self.options: list[str] | None = None
+        self.updated_at: float | None = None
+        self._load()
+
+    def summary(self) -> dict:
+        totals = [0] * 6
+        for coverage in self.files.values():
+            summary = coverage.summary()
+            for i, key in enumerate(("lines", "branches", "functions")):
+                totals[2 * i] += summary[key][0]
+                totals[2 * i + 1] += summary[key][1]
+        return {
+            "files": len(self.files),
+            "lines": totals[0:2],
+            "branches": totals[2:4],
+            "functions": totals[4:6],
+            "line_percent": _percent(totals[0], totals[1]),
+            "options": None if self.options is None else " ".join(self.options),
+            "seconds_since_update": None if self.updated_at is None else round(time.time() - self.updated_at, 1),
+        }
+
+    def find(self, file: str) -> FileCoverage | None:
+        """Looks a file up by its project-relative path, or by a unique path suffix such as "Counter.sol"."""
+        path = os.path.normpath(os.path.relpath(file, self.root) if os.path.isabs(file) else file)
+        if path in self.files:
+            return self.files[path]
+        matches = [coverage for name, coverage in self.files.items() if name.endswith("/" + path)]
+        return matches[0] if len(matches) == 1 else None
+
+    def load_report(self, report_file: str, options: list[str]) -> None:
+        """Replaces the index with a full report, such as one written by `forge coverage --report lcov`."""
+        with open(os.path.join(self.root, report_file)) as f:
+            files = parse_lcov(f.read(), self.root)
+        graph = ImportGraph(self.root)
+        self._commit(files, graph, options)
+
+    def plan(self, options: list[str]) -> tuple[CoveragePlan, "ImportGraph"]:
+        """Decides how to bring the index up to date with the working tree."""
+        graph = ImportGraph(self.root)
+        if self.updated_at is None:
+            return CoveragePlan("full", "no coverage recorded yet"), graph
+        if options != self.options:
+            return CoveragePlan("full", "coverage options changed"), graph
+        if self._config_digest(graph) != self.config_digest:
+            reason = "foundry.toml or remappings.txt changed"
+            if graph.unresolved:
+                reason += ", or a library changed while some imports could not be resolved"
+            return CoveragePlan("full", reason), graph
+
+        digests = self._digests(graph)
+        changed = {path for path, digest in digests.items() if self.digests.get(path) != digest}
+        deleted = {path for path in self.digests if path not in digests}
+        if not changed and not deleted:
+            return CoveragePlan("current", "no Solidity file changed since the last run"), graph
+
+        touched = changed | deleted
+        first_tests = graph.tests_reaching(touched)
+        patch = {path for path in changed if not graph.is_test(path)}
+        for test in first_tests:
+            patch |= {
+                path for path in graph.dependencies(test) if not graph.is_test(path) and not graph.is_library(path)
+            }
+        tests = graph.tests_reaching(patch) | first_tests
+
+        plan = CoveragePlan("incremental", f"{len(touched)} file(s) changed", changed=sorted(changed),
+                            tests=sorted(tests), patch=sorted(patch), deleted=sorted(deleted))
+        if not tests and patch:
+            plan.mode, plan.reason = "full", "changed sources are not reached by any test"
+        elif tests and len(tests) == len(graph.tests):
+            plan.mode, plan.reason = "full", "every test is affected"
+        return plan, graph
+
+    def apply(self, plan: CoveragePlan, graph: ImportGraph, report_file: str | None, options: list[str]) -> None:
+        """Patches the index with the report of an incremental run (or just drops deleted files)."""
+        files = dict(self.files)
+        if report_file is not None:
+            with open(os.path.join(self.root, report_file)) as f:
+                fresh = parse_lcov(f.read(), self.root)
+            for path in plan.patch:
+                if path in fresh:
+                    files[path] = fresh[path]
+                else:
+                    files.pop(path, None)
+        for path in plan.deleted:
+            files.pop(path, None)
+        self._commit(files, graph, options)
+
+    def _digests(self, graph: ImportGraph) -> dict[str, str]:
+        digests = {}
+        for path in graph.files:
+            full = os.path.join(self.root, path)
+            try:
+                digests[path] = hasher.file_digest(full, os.stat(full)).hex()
+            except OSError:
+                continue
+        return digests
+
+    def _config_digest(self, graph: ImportGraph) -> str:
+        digest = hashlib.sha256()
+        for name in _CONFIG_FILES:
+            path = os.path.join(self.root, name)
+            try:
+                digest.update(hasher.file_digest(path, os.stat(path)))
+            except OSError:
+                digest.update(b"-")
+        if graph.unresolved:
+            # What an unresolved import reaches is unknown, so any library change invalidates the whole index.
+            digest.update(hasher.tree_digest(self.root, graph.lib_dirs).encode())
+        return digest.hexdigest()
+
+    def _commit(self, files: dict[str, FileCoverage], graph: ImportGraph, options: list[str]) -> None:
+        self.files = files
+        self.digests = digests = self._digests(graph)
+        self.config_digest = self._config_digest(graph)
+        self.options = list(options)
+        self.updated_at = time.time()
+        state = {"digests": digests, "config_digest": self.config_digest, "options": self.options,
+                 "updated_at": self.updated_at}
+        try:
+            for path, content in ((self.report_path, "".join(f.to_lcov() for f in files.values())),
+                                  (self.state_path, json.dumps(state))):
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, "w") as f:
+                    f.write(content)
+                os.replace(tmp, path)
+        except OSError:
+            pass
+
+    def _load(self) -> None:
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+            with open(self.report_path) as f:
+                self.files = parse_lcov(f.read())
+        except (OSError, ValueError):
+            return
+        self.digests = state.get("digests", {})
+        self.config_digest = state.get("config_digest")
+        self.options = state.get("options")
+        self.updated_at = state.get("updated_at")
+
+
+class CoverageStore:
+    """One `CoverageIndex` per project root, loaded from the cache directory on first use."""
+
+    def __init__(self):
+        self.indexes: dict[str, CoverageIndex] = {}
+
+    def get(self, root: str | None = None) -> CoverageIndex:
+        root = os.path.abspath(root or os.getcwd())
+        if root not in self.indexes:
+            self.indexes[root] = CoverageIndex(root)
+        return self.indexes[root]
+
+
+store = CoverageStore()
+
+
+def coverage_options(options: list[str]) -> list[str]:
+    """The options a coverage index is measured with: everything but the report and path-filter options."""
+    return strip_options(options, REPORT_OPTIONS)
+
+
+async def update(
+    options: list[str], incremental: bool = True, on_line: LineCallback | None = None, root: str | None = None
+) -> dict | CommandResult:
+    """
+    Brings a project's coverage index up to date with its working tree.
+
+    Parameters:
+    - options (list[str]): `forge coverage` options; report and --match-path options are dropped.
+    - incremental (bool): Re-run only the affected tests when the plan allows it; False always runs everything.
+    - on_line (LineCallback | None): Receives the output of `forge coverage`.
+    - root (str | None): The project root (the working directory by default).
+
+    Returns:
+    - dict | CommandResult: The plan that was carried out and the project totals, or the `forge coverage` result
+      if it failed (the index is then left unchanged).
+    """
+    options = coverage_options(options)
+    index = store.get(root)
+    async with index.lock:
+        plan, graph = await asyncio.to_thread(index.plan, options)
+        if not incremental and plan.mode != "full":
+            plan = CoveragePlan("full", "full run requested")
+        started = time.monotonic()
+        if plan.mode == "incremental" and not plan.tests:
+            await asyncio.to_thread(index.apply, plan, graph, None, options)
+        elif plan.mode != "current":
+            command = ["forge", "coverage", "--report", "lcov", "--report-file", index.run_path] + options
+            if plan.mode == "incremental":
+                command += ["--match-path", plan.match_path()]
+            try:
+                os.remove(index.run_path)
+            except OSError:
+                pass
+            result = await run_command(command, cwd=index.root, on_line=on_line)
+            if result.returncode != 0 or not os.path.exists(index.run_path):
+                return result
+            if plan.mode == "full":
+                await asyncio.to_thread(index.load_report, index.run_path, options)
+            else:
+                await asyncio.to_thread(index.apply, plan, graph, index.run_path, options)
+        return {**asdict(plan), "seconds": round(time.monotonic() - started, 3), "totals": index.summary()}
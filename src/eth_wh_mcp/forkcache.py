@@ -0,0 +1,427 @@
+"""
+A caching JSON-RPC proxy for forked tests, scripts and Anvil nodes.
+
+Forge and Anvil fetch fork state lazily -- storage slots, code, balances,
+nonces and blocks -- one request per item, and every process starts from
+nothing. `ForkProxy` is a small HTTP server on 127.0.0.1 that forwards to one
+upstream endpoint and answers repeated requests locally:
+
+- Responses that cannot change are stored in a SQLite database shared by all
+  proxies and server runs, keyed by chain ID, method and parameters: state
+  reads pinned to a block number or hash, blocks by number or hash, and mined
+  transactions and receipts. The store is bounded by
+  FOUNDRY_MCP_FORK_CACHE_BYTES and evicts the least recently used responses.
+  Store reads and writes run in worker threads, off the event loop, and the
+  last-use times of hits are written in batches rather than one UPDATE each.
+- Identical read requests in flight at the same time share one upstream call.
+- Everything else (`latest` reads, `eth_blockNumber`, transactions, ...) is
+  forwarded unchanged. Misses go through the pooled, batching `rpc` client.
+
+`route_fork_urls` rewrites the `--fork-url` option of a command to the proxy
+for that upstream, starting the proxy on first use. A reorg of a cached block
+is not detected; pin forks to settled blocks (`--fork-block-number`) when that
+matters.
+"""
+import asyncio
+import atexit
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+from eth_wh_mcp import rpc
+from eth_wh_mcp.cache import cache_dir
+from eth_wh_mcp.runner import env_int
+
+FORK_OPTIONS = ("--fork-url", "-f")
+
+_NUMBER = re.compile(r"0x[0-9a-fA-F]{1,16}")
+_HASH = re.compile(r"0x[0-9a-fA-F]{64}")
+_MAX_HEADER_BYTES = 64 * 1024
+_LENGTH = re.compile(r"[0-9]{1,12}")
+
+# Index of the block parameter of state reads.
+_STATE_METHODS = {
+    "eth_getStorageAt": 2,
+    "eth_getCode": 1,
+    "eth_getBalance": 1,
+    "eth_getTransactionCount": 1,
+    "eth_call": 1,
+    "eth_getProof": 2,
+}
+# Responses that are immutable once they exist (a null result is never stored).
+_MINED_METHODS = {"eth_getBlockByHash", "eth_getTransactionByHash", "eth_getTransactionReceipt"}
+# Requests that may share an identical in-flight upstream call.
+_READ_PREFIXES = ("eth_get", "eth_call", "eth_chainId", "eth_blockNumber", "eth_gasPrice", "eth_feeHistory",
+                  "eth_maxPriorityFeePerGas", "eth_estimateGas", "net_version")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_by_use ON responses (used_at);
+"""
+
+_STATUS = {200: "OK", 400: "Bad Request", 405: "Method Not Allowed", 411: "Length Required",
+           413: "Payload Too Large"}
+
+
+def _pinned(tag) -> bool:
+    """Whether a block parameter names one block for good: a number, a hash or an EIP-1898 object."""
+    if isinstance(tag, dict):
+        return _pinned(tag.get("blockHash") or tag.get("blockNumber"))
+    return isinstance(tag, str) and (_NUMBER.fullmatch(tag) is not None or _HASH.fullmatch(tag) is not None)
+
+
+def is_cacheable(method: str, params: list) -> bool:
+    """Whether the response to a request can be stored (a null result for it still is not)."""
+    if method in _STATE_METHODS:
+        index = _STATE_METHODS[method]
+        return len(params) > index and _pinned(params[index])
+    if method in ("eth_getBlockByNumber", "eth_getBlockReceipts"):
+        return bool(params) and _pinned(params[0])
+    return method in _MINED_METHODS
+
+
+def _normalize(value):
+    """Lower-cases hex strings so requests differing only in address checksum case share an entry."""
+    if isinstance(value, str):
+        return value.lower() if value.startswith("0x") else value
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    return value
+
+
+def redact(url: str) -> str:
+    """Drops the path and query of an endpoint URL, where providers put API keys."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.hostname}" + (f":{parts.port}" if parts.port else "")
+
+
+class ResponseStore:
+    """
+    Stored JSON-RPC results in SQLite, bounded by total size with least-recently-used eviction.
+
+    The methods block on SQLite; call them from a worker thread. Hits only record their time in memory, and the
+    pending times are written in one batch once `touch_batch` have accumulated, on the next `put`, or before an
+    eviction picks its victims.
+    """
+
+    def __init__(self, path: str, max_bytes: int, touch_batch: int = 256):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.touch_batch = touch_batch
+        self._db: sqlite3.Connection | None = None
+        self._size = 0
+        self._touched: dict[str, float] = {}  # key -> last use not yet written
+        self._lock = threading.Lock()
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(_SCHEMA)
+            self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        return self._db
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            _ = self.db  # Opening the store loads the size.
+            return self._size
+
+    def entries(self) -> int:
+        with self._lock:
+            return self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            row = self.db.execute("SELECT body FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._touched[key] = time.time()
+                if len(self._touched) >= self.touch_batch:
+                    self._write_touched()
+        return None if row is None else row[0]
+
+    def put(self, key: str, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            db = self.db
+            self._touched.pop(key, None)
+            self._write_touched()
+            old = db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            db.execute("INSERT OR REPLACE INTO responses (key, body, size, used_at) VALUES (?, ?, ?, ?)",
+                       (key, body, len(body), time.time()))
+            self._size += len(body) - (old[0] if old else 0)
+            if self._size > self.max_bytes:
+                self._evict(self.max_bytes * 9 // 10)
+
+    def flush(self) -> None:
+        """Writes the pending last-use times of hits."""
+        with self._lock:
+            self._write_touched()
+
+    def _write_touched(self) -> None:
+        if self._touched:
+            self.db.executemany("UPDATE responses SET used_at = ? WHERE key = ?",
+                                [(used_at, key) for key, used_at in self._touched.items()])
+            self._touched.clear()
+
+    def _evict(self, target: int) -> None:
+        rows = self.db.execute("SELECT key, size FROM responses ORDER BY used_at").fetchall()
+        doomed = []
+        for key, size in rows:
+            if self._size <= target:
+                break
+            doomed.append((key,))
+            self._size -= size
+        self.db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+
+store = ResponseStore(
+    path=os.path.join(cache_dir("fork"), "responses.sqlite3"),
+    max_bytes=env_int("FOUNDRY_MCP_FORK_CACHE_BYTES", 256 * 1024 * 1024),
+)
+
+
+class ForkProxy:
+    """A local JSON-RPC endpoint that caches and deduplicates requests to one upstream."""
+
+    def __init__(self, upstream: str, responses: ResponseStore, timeout: float = 60.0):
+        self.upstream = upstream
+        self.responses = responses
+        self.timeout = timeout
+        self.server: asyncio.Server | None = None
+        self.port: int | None = None
+        self.chain_id: str | None = None
+        self.stats = dict.fromkeys(("requests", "hits", "misses", "shared", "forwarded", "errors"), 0)
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._connections: set[asyncio.StreamWriter] = set()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def running(self) -> bool:
+        return self.server is not None and self.server.is_serving()
+
+    def describe(self) -> dict:
+        return {"url": self.url, "upstream": redact(self.upstream), "chain_id": self.chain_id, **self.stats}
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0, limit=_MAX_HEADER_BYTES)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            for writer in list(self._connections):
+                writer.close()  # Idle keep-alive connections would hold wait_closed() open.
+            await self.server.wait_closed()
+
+    async def handle(self, request) -> dict | None:
+        """Answers one JSON-RPC request object (None for a notification)."""
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "Invalid request"}}
+        self.stats["requests"] += 1
+        method, params = request["method"], request.get("params") or []
+        try:
+            result = await self._result(method, params)
+        except rpc.JsonRpcError as error:
+            self.stats["errors"] += 1
+            reply = {"code": error.code, "message": error.message}
+            if error.data is not None:
+                reply["data"] = error.data
+            return {"jsonrpc": "2.0", "id": request.get("id"), "error": reply}
+        except (httpx.HTTPError, ValueError) as error:
+            self.stats["errors"] += 1
+            return {"jsonrpc": "2.0", "id": request.get("id"),
+                    "error": {"code": -32603, "message": f"Upstream request failed: {error}"}}
+        if "id" not in request:
+            return None
+        return {"jsonrpc": "2.0", "id": request["id"], "result": result}
+
+    async def _result(self, method: str, params: list):
+        if method == "eth_chainId":
+            return await self._chain_id()
+        if not is_cacheable(method, params):
+            self.stats["forwarded"] += 1
+            return await self._shared(method, params, None)
+
+        key = hashlib.sha256(json.dumps(
+            [await self._chain_id(), method, _normalize(params)], sort_keys=True, separators=(",", ":"),
+        ).encode()).hexdigest()
+        body = await asyncio.to_thread(self.responses.get, key)
+        if body is not None:
+            self.stats["hits"] += 1
+            return json.loads(body)
+        self.stats["misses"] += 1
+        return await self._shared(method, params, key)
+
+    async def _chain_id(self) -> str:
+        if self.chain_id is None:
+            self.chain_id = await self._shared("eth_chainId", [], None)
+        return self.chain_id
+
+    async def _shared(self, method: str, params: list, key: str | None):
+        """Calls upstream, joining an identical read already in flight, and stores the result under `key`."""
+        if not method.startswith(_READ_PREFIXES):
+            return await rpc.call(self.upstream, method, params, self.timeout)
+        flight = json.dumps([method, params], separators=(",", ":"))
+        fut = self._inflight.get(flight)
+        if fut is not None:
+            self.stats["shared"] += 1
+            return await asyncio.shield(fut)
+
+        fut = self._inflight[flight] = asyncio.get_running_loop().create_future()
+        try:
+            result = await rpc.call(self.upstream, method, params, self.timeout)
+        except BaseException as error:
+            fut.set_exception(error)
+            fut.exception()  # Waiters, if any, see it; mark it retrieved either way.
+            raise
+        else:
+            fut.set_result(result)
+            if key is not None and result is not None and (method not in _MINED_METHODS or _mined(result)):
+                await asyncio.to_thread(self.responses.put, key, json.dumps(result, separators=(",", ":")).encode())
+            return result
+        finally:
+            del self._inflight[flight]
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._connections.add(writer)
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = headers.get("connection", "").lower() != "close"
+
+                if not request_line.startswith("POST "):
+                    await self._respond(writer, 405, b"", keep_alive=False)
+                    return
+                if "content-length" not in headers:
+                    await self._respond(writer, 411, b"", keep_alive=False)
+                    return
+                if not _LENGTH.fullmatch(headers["content-length"]):
+                    await self._respond(writer, 400, b"", keep_alive=False)
+                    return
+                length = int(headers["content-length"])
+                if length > env_int("FOUNDRY_MCP_FORK_MAX_REQUEST_BYTES", 16 * 1024 * 1024):
+                    await self._respond(writer, 413, b"", keep_alive=False)
+                    return
+                body = await reader.readexactly(length)
+                try:
+                    payload = json.loads(body)
+                except ValueError:
+                    reply = {"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "Parse error"}}
+                else:
+                    if isinstance(payload, list):
+                        replies = await asyncio.gather(*(self.handle(item) for item in payload))
+                        reply = [item for item in replies if item is not None]
+                    else:
+                        reply = await self.handle(payload)
+                data = b"" if reply is None else json.dumps(reply, separators=(",", ":")).encode()
+                await self._respond(writer, 200, data, keep_alive)
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, data: bytes, keep_alive: bool) -> None:
+        writer.write(
+            f"HTTP/1.1 {status} {_STATUS[status]}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+            .encode() + data
+        )
+        await writer.drain()
+
+
+def _mined(result) -> bool:
+    return not isinstance(result, dict) or "blockHash" not in result or result["blockHash"] is not None
+
+
+class ForkProxyManager:
+    """One proxy per upstream endpoint, started on first use on the running event loop."""
+
+    def __init__(self, responses: ResponseStore, enabled: bool):
+        self.responses = responses
+        self.enabled = enabled
+        self.proxies: dict[str, ForkProxy] = {}
+        self._lock: asyncio.Lock | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    async def get(self, upstream: str) -> ForkProxy:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._lock, self._loop = asyncio.Lock(), loop
+        async with self._lock:
+            proxy = self.proxies.get(upstream)
+            if proxy is None or not proxy.running or proxy.server.get_loop() is not loop:
+                proxy = self.proxies[upstream] = ForkProxy(upstream, self.responses)
+                await proxy.start()
+            return proxy
+
+    def describe(self) -> dict:
+        """Blocks on the response store; call it from a worker thread."""
+        return {
+            "enabled": self.enabled,
+            "stored_responses": self.responses.entries(),
+            "stored_bytes": self.responses.size,
+            "max_bytes": self.responses.max_bytes,
+            "proxies": [proxy.describe() for proxy in self.proxies.values() if proxy.running],
+        }
+
+
+manager = ForkProxyManager(store, enabled=os.environ.get("FOUNDRY_MCP_FORK_CACHE") != "0")
+atexit.register(store.flush)
+
+
+async def route_fork_urls(options: list[str]) -> list[str]:
+    """
+    Points the `--fork-url` (`-f`) option of a command at the caching proxy for its endpoint.
+
+    Only http(s) URLs are rewritten; RPC aliases from foundry.toml, WebSocket URLs and commands without the
+    option pass through unchanged, as does everything when FOUNDRY_MCP_FORK_CACHE=0.
+    """
+    if not manager.enabled:
+        return options
+    routed = list(options)
+    for i, option in enumerate(routed):
+        flag, _, inline = option.partition("=")
+        if flag not in FORK_OPTIONS:
+            continue
+        url = inline if inline else routed[i + 1] if i + 1 < len(routed) else ""
+        if not url.startswith(("http://", "https://")):
+            continue
+        proxy = await manager.get(url)
+        if inline:
+            routed[i] = f"{flag}={proxy.url}"
+        else:
+            routed[i + 1] = proxy.url
+    return routed
@@ -0,0 +1,295 @@
+"""
+A queryable history of gas snapshots.
+
+`parse_snapshot` reads a `.gas-snapshot` file, and `GasHistory` stores each
+parsed snapshot in SQLite as a run of one project, keyed by a run ID -- the
+commit it was taken at, by default. Diffs between runs, tolerance checks,
+top-N regressions and per-test trends are then single indexed queries over
+stored rows, answered in milliseconds without running any test.
+"""
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+from eth_wh_mcp.cache import cache_dir
+from eth_wh_mcp.runner import LIGHT, env_int, run_command
+
+# "Contract:test() (gas: 123)", "(runs: 256, μ: 456, ~: 450)" or "(runs: 256, calls: 3840, reverts: 0)".
+_LINE = re.compile(r"^(?P<test>\S.*?)\s+\((?P<fields>[^()]*)\)\s*$")
+_FIELD = re.compile(r"(gas|runs|μ|~|calls|reverts):\s*(\d+)")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    project TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    commit_hash TEXT,
+    created_at REAL NOT NULL,
+    UNIQUE (project, run_id)
+);
+CREATE TABLE IF NOT EXISTS gas (
+    run INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    test TEXT NOT NULL,
+    gas INTEGER,
+    median INTEGER,
+    kind TEXT NOT NULL,
+    PRIMARY KEY (run, test)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS gas_by_test ON gas (test, run);
+"""
+
+
+@dataclass
+class GasEntry:
+    """One snapshot line: unit tests have `gas`, fuzz tests a mean (`gas`) and median, invariant tests neither."""
+
+    gas: int | None
+    median: int | None
+    kind: str  # unit, fuzz or invariant
+
+
+def parse_snapshot(text: str) -> dict[str, GasEntry]:
+    """Parses `.gas-snapshot` content into entries keyed by "Contract:test(args)"."""
+    entries = {}
+    for line in text.splitlines():
+        match = _LINE.match(line.strip())
+        if match is None:
+            continue
+        fields = dict(_FIELD.findall(match.group("fields")))
+        if "gas" in fields:
+            entries[match.group("test")] = GasEntry(int(fields["gas"]), None, "unit")
+        elif "μ" in fields:
+            entries[match.group("test")] = GasEntry(int(fields["μ"]), int(fields.get("~", fields["μ"])), "fuzz")
+        elif "calls" in fields:
+            entries[match.group("test")] = GasEntry(None, None, "invariant")
+    return entries
+
+
+class GasHistory:
+    """Gas snapshots of every project, one run per snapshot, in a SQLite database."""
+
+    def __init__(self, path: str, max_runs: int):
+        self.path = path
+        self.max_runs = max_runs
+        self._db: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA foreign_keys=ON")
+            self._db.executescript(_SCHEMA)
+        return self._db
+
+    def record(self, project: str, run_id: str, entries: dict[str, GasEntry], commit: str | None = None) -> int:
+        """Stores a snapshot as `run_id` (replacing an earlier run with that ID) and prunes the oldest runs."""
+        with self._lock:
+            db = self.db
+            db.execute("BEGIN")
+            try:
+                db.execute("DELETE FROM runs WHERE project = ? AND run_id = ?", (project, run_id))
+                run = db.execute(
+                    "INSERT INTO runs (project, run_id, commit_hash, created_at) VALUES (?, ?, ?, ?)",
+                    (project, run_id, commit, time.time()),
+                ).lastrowid
+                db.executemany(
+                    "INSERT INTO gas (run, test, gas, median, kind) VALUES (?, ?, ?, ?, ?)",
+                    ((run, test, entry.gas, entry.median, entry.kind) for test, entry in entries.items()),
+                )
+                db.execute(
+                    "DELETE FROM runs WHERE project = ? AND id NOT IN "
+                    "(SELECT id FROM runs WHERE project = ? ORDER BY id DESC LIMIT ?)",
+                    (project, project, self.max_runs),
+                )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return len(entries)
+
+    def runs(self, project: str, limit: int = 20) -> list[dict]:
+        """The most recent runs of a project, newest first."""
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT r.run_id, r.commit_hash, r.created_at, COUNT(g.test), SUM(g.gas) FROM runs r "
+                "LEFT JOIN gas g ON g.run = r.id WHERE r.project = ? GROUP BY r.id ORDER BY r.id DESC LIMIT ?",
+                (project, limit),
+            ).fetchall()
+        return [
+            {"run_id": run_id, "commit": commit, "recorded_at": _timestamp(created), "tests": tests,
+             "total_gas": total}
+            for run_id, commit, created, tests, total in rows
+        ]
+
+    def resolve(self, project: str, ref: str = "", offset: int = 0) -> tuple[int, str]:
+        """
+        Finds a run by ID or by a unique prefix of its ID or commit; an empty `ref` means the latest run.
+
+        `offset` then steps back that many runs, so ("", 1) is the run before the latest.
+        """
+        with self._lock:
+            if ref:
+                rows = self.db.execute(
+                    "SELECT id, run_id FROM runs WHERE project = ? "
+                    "AND (run_id = ? OR run_id LIKE ? ESCAPE '\\' OR commit_hash LIKE ? ESCAPE '\\') "
+                    "ORDER BY run_id = ? DESC, id DESC",
+                    (project, ref, _escape(ref) + "%", _escape(ref) + "%", ref),
+                ).fetchall()
+                if not rows:
+                    raise ValueError(f"No gas snapshot run matches {ref!r}")
+                if rows[0][1] != ref and len({run_id for _, run_id in rows}) > 1:
+                    raise ValueError(f"{ref!r} matches several runs: {', '.join(run_id for _, run_id in rows[:5])}")
+                anchor = rows[0][0]
+            else:
+                anchor = None
+            rows = self.db.execute(
+                "SELECT id, run_id FROM runs WHERE project = ? AND (? IS NULL OR id <= ?) ORDER BY id DESC LIMIT 1 OFFSET ?",
+                (project, anchor, anchor, offset),
+            ).fetchall()
+        if not rows:
+            raise ValueError("Not enough recorded gas snapshot runs; record one with snapshot_project")
+        return rows[0]
+
+    def entries(self, run: int) -> dict[str, tuple[int | None, str]]:
+        with self._lock:
+            rows = self.db.execute("SELECT test, gas, kind FROM gas WHERE run = ?", (run,)).fetchall()
+        return {test: (gas, kind) for test, gas, kind in rows}
+
+    def diff(self, project: str, base: str = "", head: str = "", tolerance: float = 0.0, top: int = 10) -> dict:
+        """
+        Compares two runs (by default the latest run and the one before it).
+
+        Parameters:
+        - project (str): The project root.
+        - base (str): The run to compare against; empty for the run before `head`.
+        - head (str): The run to compare; empty for the latest run.
+        - tolerance (float): Changes of at most this many percent count as unchanged, as with `forge snapshot
+          --check --tolerance`.
+        - top (int): How many of the largest regressions and improvements to list.
+
+        Returns:
+        - dict: Counts of regressions, improvements, unchanged, added and removed tests, whether the check passes
+          (no change beyond the tolerance), the total gas change, and the top regressions and improvements. A change
+          from a base of 0 gas has a `percent` of None.
+        """
+        head_run, head_id = self.resolve(project, head)
+        base_run, base_id = self.resolve(project, base) if base else self.resolve(project, head, offset=1)
+        before, after = self.entries(base_run), self.entries(head_run)
+
+        changes = []
+        unchanged = 0
+        for test in before.keys() & after.keys():
+            old, new = before[test][0], after[test][0]
+            if old is None or new is None or old == new:
+                unchanged += 1
+                continue
+            # From a base of 0 any change is beyond every tolerance; JSON has no infinity, so the percent is None.
+            percent = (new - old) / old * 100 if old else None
+            if percent is not None and abs(percent) <= tolerance:
+                unchanged += 1
+                continue
+            changes.append({"test": test, "base": old, "head": new, "delta": new - old,
+                            "percent": None if percent is None else round(percent, 3)})
+
+        regressions = sorted((c for c in changes if c["delta"] > 0), key=lambda c: c["delta"], reverse=True)
+        improvements = sorted((c for c in changes if c["delta"] < 0), key=lambda c: c["delta"])
+        shared = before.keys() & after.keys()
+        return {
+            "base": base_id,
+            "head": head_id,
+            "tolerance_percent": tolerance,
+            "check_passed": not changes,
+            "regressions": len(regressions),
+            "improvements": len(improvements),
+            "unchanged": unchanged,
+            "added": sorted(after.keys() - before.keys()),
+            "removed": sorted(before.keys() - after.keys()),
+            "total_delta": sum((after[t][0] or 0) - (before[t][0] or 0) for t in shared),
+            "top_regressions": regressions[:top],
+            "top_improvements": improvements[:top],
+        }
+
+    def trend(self, project: str, pattern: str, limit: int = 20) -> dict:
+        """Gas per run, oldest first, of the tests whose name contains `pattern`, over the last `limit` runs."""
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT g.test, r.run_id, g.gas FROM gas g JOIN runs r ON r.id = g.run "
+                "WHERE r.id IN (SELECT id FROM runs WHERE project = ? ORDER BY id DESC LIMIT ?) "
+                "AND g.test LIKE ? ESCAPE '\\' ORDER BY g.test, r.id",
+                (project, limit, "%" + _escape(pattern) + "%"),
+            ).fetchall()
+        tests: dict[str, list] = {}
+        for test, run_id, gas in rows:
+            tests.setdefault(test, []).append([run_id, gas])
+        result = {}
+        for test, points in tests.items():
+            values = [gas for _, gas in points if gas is not None]
+            result[test] = {
+                "points": points,
+                "min": min(values, default=None),
+                "max": max(values, default=None),
+                "change": values[-1] - values[0] if values else None,
+            }
+        return result
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _read_text(path: str) -> str:
+    with open(path) as f:
+        return f.read()
+
+
+def _timestamp(seconds: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(seconds))
+
+
+history = GasHistory(
+    path=os.path.join(cache_dir("gas"), "history.sqlite3"),
+    max_runs=env_int("FOUNDRY_MCP_GAS_HISTORY_RUNS", 500),
+)
+
+
+async def current_commit(root: str, ignored: tuple[str, ...] = ()) -> tuple[str | None, bool]:
+    """Returns the short HEAD commit of `root` and whether tracked files other than `ignored` have changes."""
+    status_command = ["git", "status", "--porcelain", "--untracked-files=no", "--", "."]
+    status_command += [f":(exclude){path}" for path in ignored]
+    try:
+        head = await run_command(["git", "rev-parse", "--short", "HEAD"], LIGHT, cwd=root)
+        status = await run_command(status_command, LIGHT, cwd=root)
+    except OSError:
+        return None, False
+    if head.returncode != 0:
+        return None, False
+    return head.stdout.strip(), bool(status.stdout.strip())
+
+
+async def record_snapshot(snap_file: str, run_id: str = "", root: str | None = None) -> dict:
+    """
+    Parses a snapshot file and records it in the history.
+
+    Parameters:
+    - snap_file (str): The snapshot file, relative to the project root.
+    - run_id (str): The run ID; by default the HEAD commit, with a "+dirty-<time>" suffix when tracked files (other
+      than the snapshot itself) have uncommitted changes, or "run-<time>" outside a git repository.
+    - root (str | None): The project root (the working directory by default).
+
+    Returns:
+    - dict: The run ID, the commit and the number of tests recorded.
+    """
+    root = os.path.abspath(root or os.getcwd())
+    entries = parse_snapshot(await asyncio.to_thread(_read_text, os.path.join(root, snap_file)))
+    commit, dirty = await current_commit(root, ignored=(snap_file,))
+    if not run_id:
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        run_id = f"run-{stamp}" if commit is None else f"{commit}+dirty-{stamp}" if dirty else commit
+    await asyncio.to_thread(history.record, root, run_id, entries, commit)
+    return {"run_id": run_id, "commit": commit, "tests": len(entries)}
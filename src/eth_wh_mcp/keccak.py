@@ -0,0 +1,78 @@
+"""
+Pure-Python Keccak-256, the hash Ethereum uses for selectors, topics and addresses.
+
+This is the original Keccak padding (0x01), not the NIST SHA3-256 padding that
+`hashlib.sha3_256` implements, so the two produce different digests.
+"""
+
+_MASK = (1 << 64) - 1
+_RATE = 136
+
+_ROUND_CONSTANTS = [
+    0x0000000000000001, 0x0000000000008082, 0x800000000000808A, 0x8000000080008000,
+    0x000000000000808B, 0x0000000080000001, 0x8000000080008081, 0x8000000000008009,
+    0x000000000000008A, 0x0000000000000088, 0x0000000080008009, 0x000000008000000A,
+    0x000000008000808B, 0x800000000000008B, 0x8000000000008089, 0x8000000000008003,
+    0x8000000000008002, 0x8000000000000080, 0x000000000000800A, 0x800000008000000A,
+    0x8000000080008081, 0x8000000000008080, 0x0000000080000001, 0x8000000080008008,
+]
+
+# Rotation offsets indexed by lane position x + 5 * y.
+_ROTATIONS = [
+    0, 1, 62, 28, 27,
+    36, 44, 6, 55, 20,
+    3, 10, 43, 25, 39,
+    41, 45, 15, 21, 8,
+    18, 2, 61, 56, 14,
+]
+
+# For each source lane x + 5 * y, the destination lane y + 5 * ((2x + 3y) % 5) of the pi step.
+_PI = [y + 5 * ((2 * x + 3 * y) % 5) for y in range(5) for x in range(5)]
+
+
+# Lane indices for the chi step: each lane is combined with its next two row neighbours.
+_CHI = [((x + 1) % 5 + y, (x + 2) % 5 + y) for y in range(0, 25, 5) for x in range(5)]
+_STEPS = list(zip(range(25), _ROTATIONS, _PI))
+
+
+def _permute(lanes: list[int]) -> None:
+    b = [0] * 25
+    for constant in _ROUND_CONSTANTS:
+        c0 = lanes[0] ^ lanes[5] ^ lanes[10] ^ lanes[15] ^ lanes[20]
+        c1 = lanes[1] ^ lanes[6] ^ lanes[11] ^ lanes[16] ^ lanes[21]
+        c2 = lanes[2] ^ lanes[7] ^ lanes[12] ^ lanes[17] ^ lanes[22]
+        c3 = lanes[3] ^ lanes[8] ^ lanes[13] ^ lanes[18] ^ lanes[23]
+        c4 = lanes[4] ^ lanes[9] ^ lanes[14] ^ lanes[19] ^ lanes[24]
+        d = (
+            c4 ^ (((c1 << 1) | (c1 >> 63)) & _MASK),
+            c0 ^ (((c2 << 1) | (c2 >> 63)) & _MASK),
+            c1 ^ (((c3 << 1) | (c3 >> 63)) & _MASK),
+            c2 ^ (((c4 << 1) | (c4 >> 63)) & _MASK),
+            c3 ^ (((c0 << 1) | (c0 >> 63)) & _MASK),
+        )
+
+        for i, rotation, target in _STEPS:
+            lane = lanes[i] ^ d[i % 5]
+            b[target] = ((lane << rotation) | (lane >> (64 - rotation))) & _MASK
+
+        for i, (j, k) in enumerate(_CHI):
+            lanes[i] = b[i] ^ (~b[j] & b[k])
+
+        lanes[0] ^= constant
+
+
+def keccak256(data: bytes) -> bytes:
+    """Returns the 32-byte Keccak-256 digest of `data`."""
+    padded = bytearray(data)
+    padded.append(0x01)
+    padded.extend(b"\x00" * (-len(padded) % _RATE))
+    padded[-1] |= 0x80
+
+    lanes = [0] * 25
+    for offset in range(0, len(padded), _RATE):
+        block = padded[offset:offset + _RATE]
+        for i in range(_RATE // 8):
+            lanes[i] ^= int.from_bytes(block[8 * i:8 * i + 8], "little")
+        _permute(lanes)
+
+    return b"".join(lane.to_bytes(8, "little") for lane in lanes[:4])
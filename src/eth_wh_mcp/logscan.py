@@ -0,0 +1,428 @@
+"""
+Chunked, concurrent and resumable `eth_getLogs` scans.
+
+A single `eth_getLogs` over a wide block range either times out or is refused
+by the provider's range and result limits, and `cast logs` buffers whatever
+comes back into one string. `scan` splits the range into chunks and fetches up
+to FOUNDRY_MCP_LOG_SCAN_JOBS of them at a time, each as its own unbatched
+request:
+
+- `ChunkSizer` adapts the chunk size. A chunk the provider refuses (block
+  range or result limits, response size, timeouts) is put back and re-cut
+  smaller -- to the range the provider suggests when its error names one --
+  and chunks grow or shrink towards FOUNDRY_MCP_LOG_SCAN_TARGET_LOGS logs per
+  response as results come back.
+- Rate limits, server errors and dropped connections are retried with
+  backoff; a chunk that still fails ends the scan with an error.
+- Every completed chunk is recorded in a `Cursor` under the cache directory
+  and its decoded events are handed to a callback at once, so an interrupted
+  or cancelled scan resumes from its cursor and only refetches the chunks that
+  were in flight.
+"""
+import asyncio
+import json
+import os
+import re
+import uuid
+
+import httpx
+
+from eth_wh_mcp import abi, rpc
+from eth_wh_mcp.cache import cache_dir
+from eth_wh_mcp.cast_native import default_rpc_url
+from eth_wh_mcp.runner import env_int
+
+MAX_ATTEMPTS = 5
+MAX_CHUNK_BLOCKS = 1_000_000
+
+# Provider errors that mean the request asked for too much at once.
+_TOO_MUCH = re.compile(
+    r"range|too many|too large|more than|limit exceeded|exceed|response size|timeout|timed out", re.IGNORECASE
+)
+# Errors that mean the request should be retried as is, later.
+_RATE_LIMITED = re.compile(r"rate|throttl|capacity|too many requests|try again", re.IGNORECASE)
+# Limits on the block range itself, as opposed to the number of results.
+_BLOCK_RANGE = re.compile(r"block range|blocks? (range|limit)|range (is )?too (large|wide)", re.IGNORECASE)
+# "eth_getLogs is limited to a 10000 block range", "block range is too wide, maximum 3000" and similar.
+_STATED_LIMIT = re.compile(r"(\d[\d,]*)[ -]block range|block range[^\d\[]{0,24}?(\d[\d,]*)", re.IGNORECASE)
+# "... this block range should work: [0x10f3b40, 0x10f4a0c]" (Alchemy) and similar.
+_SUGGESTED_RANGE = re.compile(r"\[\s*(0x[0-9a-fA-F]+)\s*,\s*(0x[0-9a-fA-F]+)\s*\]")
+_NUMBER = re.compile(r"^(0x[0-9a-fA-F]+|\d+)$")
+_TAGS = {"latest", "safe", "finalized", "earliest"}
+
+
+class _TooMuch(Exception):
+    """The provider refused a chunk as too large."""
+
+    def __init__(self, message: str, suggested: int | None = None, limit: int | None = None):
+        super().__init__(message)
+        self.suggested = suggested
+        self.limit = limit
+
+
+class _Transient(Exception):
+    """A chunk failed for a reason that retrying later may fix."""
+
+
+class ChunkSizer:
+    """Adapts the number of blocks per `eth_getLogs` request to the provider's limits and the density of logs."""
+
+    def __init__(self, size: int, target_logs: int, ceiling: int = MAX_CHUNK_BLOCKS):
+        self.ceiling = ceiling
+        self.size = max(1, min(size, ceiling))
+        self.target_logs = target_logs
+
+    def observe(self, blocks: int, logs: int) -> None:
+        """
+        Steers the size towards `target_logs` per request after a chunk of `blocks` returned `logs` logs.
+
+        The size at most doubles per chunk, and only chunks of at least half the current size (not the short
+        remainders at the end of a range) can grow it.
+        """
+        wanted = blocks * self.target_logs // logs if logs else self.ceiling
+        growth = self.size * 2 if blocks * 2 >= self.size else self.size
+        self.size = max(1, min(wanted, growth, self.ceiling))
+
+    def refused(self, blocks: int, suggested: int | None = None, limit: int | None = None) -> None:
+        """
+        Shrinks after a chunk of `blocks` was refused: to the provider's suggestion if it made one, else to half.
+
+        A `limit` on the block range itself (rather than on results or time) also caps all later chunks.
+        """
+        if limit:
+            self.ceiling = max(1, min(self.ceiling, limit))
+        self.size = max(1, min(self.size, suggested or blocks // 2, self.ceiling))
+
+
+class Cursor:
+    """A scan's query and the block ranges already fetched, saved after every chunk."""
+
+    def __init__(self, cursor_id: str, query: dict, done: list[list[int]] | None = None,
+                 chunk: int | None = None, ceiling: int | None = None):
+        self.cursor_id = cursor_id
+        self.query = query
+        self.done = done or []
+        self.chunk = chunk
+        self.ceiling = ceiling
+
+    @staticmethod
+    def path(cursor_id: str) -> str:
+        return os.path.join(cache_dir("logs"), f"{cursor_id}.json")
+
+    @classmethod
+    def create(cls, query: dict) -> "Cursor":
+        return cls("scan-" + uuid.uuid4().hex[:12], query)
+
+    @classmethod
+    def load(cls, cursor_id: str) -> "Cursor":
+        """Raises ValueError for an unknown cursor; finished scans forget theirs."""
+        if not re.match(r"^scan-[0-9a-f]{12}$", cursor_id):
+            raise ValueError(f"Invalid cursor: {cursor_id!r}")
+        try:
+            with open(cls.path(cursor_id)) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            raise ValueError(f"Unknown cursor {cursor_id!r}; it may belong to a scan that already finished")
+        return cls(cursor_id, record["query"], record["done"], record.get("chunk"), record.get("ceiling"))
+
+    def remaining(self) -> list[list[int]]:
+        """The block ranges of the query not fetched yet, in order."""
+        remaining, start = [], self.query["from_block"]
+        for low, high in self.done:
+            if low > start:
+                remaining.append([start, low - 1])
+            start = max(start, high + 1)
+        if start <= self.query["to_block"]:
+            remaining.append([start, self.query["to_block"]])
+        return remaining
+
+    def mark_done(self, low: int, high: int) -> None:
+        merged = []
+        for span in sorted(self.done + [[low, high]]):
+            if merged and span[0] <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], span[1])
+            else:
+                merged.append(list(span))
+        self.done = merged
+
+    def save(self) -> None:
+        record = {"query": self.query, "done": self.done, "chunk": self.chunk, "ceiling": self.ceiling}
+        path = self.path(self.cursor_id)
+        tmp = path + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(record, f)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+    def forget(self) -> None:
+        try:
+            os.remove(self.path(self.cursor_id))
+        except OSError:
+            pass
+
+
+def _quantity(value: str) -> int:
+    return int(value, 16) if value.startswith("0x") else int(value)
+
+
+async def block_number(rpc_url: str, value: str) -> int:
+    """Resolves a block number (decimal or 0x-hex) or tag (latest, safe, finalized, earliest) to a number."""
+    value = str(value).strip()
+    if _NUMBER.match(value):
+        return _quantity(value)
+    if value == "earliest":
+        return 0
+    if value not in _TAGS:
+        raise ValueError(f"Invalid block: {value!r}")
+    if value == "latest":
+        return _quantity(await rpc.call(rpc_url, "eth_blockNumber", batch=False))
+    block = await rpc.call(rpc_url, "eth_getBlockByNumber", [value, False], batch=False)
+    if not block:
+        raise ValueError(f"The endpoint has no {value} block")
+    return _quantity(block["number"])
+
+
+def topic(value: str) -> str | None:
+    """Normalizes a topic filter value: 32-byte hex as is, shorter hex (an address, a number) left-padded."""
+    value = value.strip()
+    if value in ("", "null", "_", "*"):
+        return None
+    if not re.match(r"^0x[0-9a-fA-F]{1,64}$", value):
+        raise ValueError(f"Invalid topic: {value!r}")
+    return "0x" + value[2:].lower().rjust(64, "0")
+
+
+async def new_cursor(event: str, address: str, from_block: str, to_block: str, topics: str, rpc_url: str) -> Cursor:
+    """
+    Builds the query of a new scan, resolving block tags once so that resuming it later scans the same blocks.
+
+    Raises:
+    - ValueError: For a malformed event signature, address, topic or block, or an endpoint that is not HTTP(S).
+    """
+    rpc_url = rpc_url or default_rpc_url()
+    if not rpc_url.startswith(("http://", "https://")) or "${" in rpc_url:
+        raise ValueError(f"Log scans need an HTTP(S) endpoint, got {rpc_url!r}; pass rpc_url")
+    topic_filter = [topic(value) for value in topics.split()]
+    if event.startswith("0x"):
+        topic_filter.insert(0, topic(event))
+        event = ""
+    elif event:
+        topic_filter.insert(0, "0x" + abi.parse_signature(event).topic.hex())
+    if len(topic_filter) > 4:
+        raise ValueError("A log has at most four topics")
+    while topic_filter and topic_filter[-1] is None:
+        topic_filter.pop()
+    addresses = address.replace(",", " ").split()
+    for value in addresses:
+        if not re.match(r"^0x[0-9a-fA-F]{40}$", value):
+            raise ValueError(f"Invalid address: {value!r}")
+    low, high = await block_number(rpc_url, from_block), await block_number(rpc_url, to_block)
+    if low > high:
+        raise ValueError(f"from_block {low} is after to_block {high}")
+    return Cursor.create({
+        "rpc_url": rpc_url,
+        "event": event,
+        "address": addresses[0] if len(addresses) == 1 else addresses,
+        "topics": topic_filter,
+        "from_block": low,
+        "to_block": high,
+    })
+
+
+def _jsonable(value):
+    if isinstance(value, bytes):
+        return "0x" + value.hex()
+    if isinstance(value, list):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, int) and not isinstance(value, bool):
+        return str(value)  # Beyond 2**53 numbers lose precision in most JSON readers.
+    return value
+
+
+def decode_log(log: dict, signature: abi.Signature | None) -> dict:
+    """A compact record of one log, with its arguments decoded when it matches `signature`."""
+    record = {
+        "block": _quantity(log["blockNumber"]),
+        "log_index": _quantity(log["logIndex"]),
+        "tx": log["transactionHash"],
+        "address": log["address"],
+    }
+    topics = log.get("topics") or []
+    if signature is not None and topics and topics[0].lower() == "0x" + signature.topic.hex():
+        try:
+            values = abi.decode_event(signature, [bytes.fromhex(t[2:]) for t in topics],
+                                      bytes.fromhex(log.get("data", "0x")[2:]))
+        except ValueError:  # Including AbiError: the log does not fit the signature after all.
+            pass
+        else:
+            names = [name or str(i) for i, name in enumerate(signature.names or [""] * len(values))]
+            record["event"] = signature.name
+            record["args"] = {name: _jsonable(value) for name, value in zip(names, values)}
+            return record
+    record["topics"] = topics
+    record["data"] = log.get("data", "0x")
+    return record
+
+
+async def _fetch(rpc_url: str, log_filter: dict, low: int, high: int, timeout: float, delay: float) -> list:
+    """One `eth_getLogs` call for blocks `low`..`high`, classifying its failures."""
+    if delay:
+        await asyncio.sleep(delay)
+    params = [{**log_filter, "fromBlock": hex(low), "toBlock": hex(high)}]
+    try:
+        logs = await rpc.call(rpc_url, "eth_getLogs", params, timeout=timeout, batch=False)
+    except rpc.JsonRpcError as exc:
+        text = f"{exc.message} {exc.data or ''}"
+        if _RATE_LIMITED.search(text) and not _BLOCK_RANGE.search(text):
+            raise _Transient(str(exc))
+        if _TOO_MUCH.search(text) or exc.code == -32005:
+            match = _SUGGESTED_RANGE.search(text)
+            suggested = _quantity(match.group(2)) - _quantity(match.group(1)) + 1 if match else None
+            suggested = suggested if suggested and suggested > 0 else None
+            match = _STATED_LIMIT.search(text)
+            if match:
+                limit = int((match.group(1) or match.group(2)).replace(",", ""))
+            elif _BLOCK_RANGE.search(text) and not suggested:
+                limit = max(1, (high - low + 1) // 2)  # A range limit that does not say what it is.
+            else:
+                limit = None
+            raise _TooMuch(str(exc), suggested, limit)
+        raise
+    except httpx.TimeoutException as exc:
+        raise _TooMuch(f"timed out after {timeout:g}s") from exc
+    except httpx.HTTPStatusError as exc:
+        if exc.response.status_code == 413:
+            raise _TooMuch("response too large (HTTP 413)") from exc
+        raise _Transient(f"HTTP {exc.response.status_code}") from exc
+    except (httpx.HTTPError, ValueError) as exc:
+        raise _Transient(str(exc) or type(exc).__name__) from exc
+    if not isinstance(logs, list):
+        raise _Transient(f"Malformed eth_getLogs result: {logs!r:.200}")
+    return logs
+
+
+async def scan(cursor: Cursor, on_chunk=None, max_events: int = 1000, jobs: int | None = None,
+               sizer: ChunkSizer | None = None, keep_events: bool = True) -> dict:
+    """
+    Fetches the blocks `cursor` has not covered yet, until they are done or `max_events` events were found.
+
+    Parameters:
+    - cursor (Cursor): The query and its progress; saved after every completed chunk.
+    - on_chunk (callable | None): Awaited with (low, high, events) as each chunk completes, in completion order.
+    - max_events (int): No new chunks are started once this many events were found (0 for no limit); chunks in
+      flight still finish.
+    - jobs (int | None): Concurrent requests; FOUNDRY_MCP_LOG_SCAN_JOBS (4) by default.
+    - sizer (ChunkSizer | None): The chunk size policy; by default it resumes from the cursor's last chunk size.
+    - keep_events (bool): Collect the events for the result. Without it they only reach `on_chunk`, and memory
+      stays bounded by the chunks in flight however many events the scan finds.
+
+    Returns:
+    - dict: The events found (by block and log index; omitted without `keep_events`) and their count, whether the
+      scan is done, the blocks scanned and remaining, request, retry and refusal counts, the final chunk size and
+      the error that ended the scan early, if any.
+    """
+    query = cursor.query
+    rpc_url, jobs = query["rpc_url"], jobs or env_int("FOUNDRY_MCP_LOG_SCAN_JOBS", 4)
+    timeout = env_int("FOUNDRY_MCP_LOG_SCAN_TIMEOUT", 60)
+    sizer = sizer or ChunkSizer(
+        cursor.chunk or env_int("FOUNDRY_MCP_LOG_SCAN_CHUNK", 2000),
+        env_int("FOUNDRY_MCP_LOG_SCAN_TARGET_LOGS", 2000),
+        cursor.ceiling or MAX_CHUNK_BLOCKS,
+    )
+    signature = abi.parse_signature(query["event"]) if query.get("event") else None
+    log_filter = {"topics": query.get("topics") or []}
+    if query.get("address"):
+        log_filter["address"] = query["address"]
+
+    pending = cursor.remaining()  # Ranges not handed out yet, in order.
+    attempts: dict[int, int] = {}  # Failed attempts per chunk start.
+    stats = {"requests": 0, "retries": 0, "refused": 0}
+    events, found, error = [], 0, None
+    in_flight: dict[asyncio.Task, tuple[int, int]] = {}
+
+    def next_chunk() -> tuple[int, int]:
+        low, high = pending[0]
+        end = min(high, low + sizer.size - 1)
+        if end == high:
+            pending.pop(0)
+        else:
+            pending[0] = [end + 1, high]
+        return low, end
+
+    def put_back(low: int, high: int) -> None:
+        if pending and pending[0][0] == high + 1:
+            pending[0][0] = low
+        else:
+            pending.insert(0, [low, high])
+            pending.sort()
+
+    try:
+        while pending or in_flight:
+            while pending and len(in_flight) < jobs and error is None and (
+                    max_events <= 0 or found < max_events):
+                low, high = next_chunk()
+                attempt = attempts.get(low, 0)
+                delay = min(8.0, 0.5 * 2 ** (attempt - 1)) if attempt else 0.0
+                task = asyncio.ensure_future(_fetch(rpc_url, log_filter, low, high, timeout, delay))
+                in_flight[task] = (low, high)
+                stats["requests"] += 1
+            if not in_flight:
+                break
+            finished, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                low, high = in_flight.pop(task)
+                try:
+                    logs = task.result()
+                except (_TooMuch, _Transient) as exc:
+                    attempts[low] = attempts.get(low, 0) + 1
+                    if isinstance(exc, _TooMuch) and high > low:
+                        stats["refused"] += 1
+                        sizer.refused(high - low + 1, exc.suggested, exc.limit)
+                        attempts[low] = 0
+                    elif attempts[low] >= MAX_ATTEMPTS:
+                        error = error or f"Blocks {low}-{high} failed {MAX_ATTEMPTS} times: {exc}"
+                    else:
+                        stats["retries"] += 1
+                    put_back(low, high)
+                    continue
+                except rpc.JsonRpcError as exc:
+                    error = error or f"Blocks {low}-{high}: {exc}"
+                    put_back(low, high)
+                    continue
+                sizer.observe(high - low + 1, len(logs))
+                chunk_events = [decode_log(log, signature) for log in logs if log.get("blockNumber")]
+                chunk_events.sort(key=lambda event: (event["block"], event["log_index"]))
+                found += len(chunk_events)
+                if keep_events:
+                    events.extend(chunk_events)
+                cursor.mark_done(low, high)
+                cursor.chunk, cursor.ceiling = sizer.size, sizer.ceiling
+                cursor.save()
+                if on_chunk is not None:
+                    await on_chunk(low, high, chunk_events)
+    finally:
+        for task in in_flight:
+            task.cancel()
+
+    remaining = cursor.remaining()
+    done = not remaining
+    if done:
+        cursor.forget()
+    events.sort(key=lambda event: (event["block"], event["log_index"]))
+    total = query["to_block"] - query["from_block"] + 1
+    return {
+        "cursor": None if done else cursor.cursor_id,
+        "done": done,
+        **({"events": events} if keep_events else {}),
+        "event_count": found,
+        "blocks": {
+            "from": query["from_block"], "to": query["to_block"],
+            "scanned": total - sum(high - low + 1 for low, high in remaining),
+            "remaining": remaining,
+        },
+        **stats,
+        "chunk_size": sizer.size,
+        "error": error,
+    }
@@ -1,17 +1,59 @@
-from mcp.server.fastmcp import FastMCP
-import subprocess
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+
+from mcp.server.fastmcp import Context, FastMCP
+
+from eth_wh_mcp.anvil import manager as anvil_manager
+from eth_wh_mcp.artifacts import get_index as get_artifact_index
+from eth_wh_mcp.builds import manager as build_manager
+from eth_wh_mcp.builds import strip_watch_options
+from eth_wh_mcp.cache import is_cacheable, project_config, run_cached
+from eth_wh_mcp.cast_native import run_native as run_cast_native
+from eth_wh_mcp.chisel import manager as chisel_manager
+from eth_wh_mcp.coverage import coverage_options
+from eth_wh_mcp.coverage import store as coverage_store
+from eth_wh_mcp.coverage import update as update_coverage_index
+from eth_wh_mcp.forkcache import manager as fork_manager
+from eth_wh_mcp.forkcache import route_fork_urls
+from eth_wh_mcp.gas import history as gas_history
+from eth_wh_mcp.gas import record_snapshot as record_gas_snapshot
+from eth_wh_mcp.logscan import Cursor as LogCursor
+from eth_wh_mcp.logscan import new_cursor as new_log_cursor
+from eth_wh_mcp.logscan import scan as scan_log_chunks
+from eth_wh_mcp.metrics import instrumented
+from eth_wh_mcp.metrics import registry as metrics_registry
+from eth_wh_mcp.progress import ProgressStreamer
+from eth_wh_mcp.reaper import reap_periodically
+from eth_wh_mcp.results import (
+    RESULT_URI,
+    TEXT_BUILD_OPTIONS,
+    TEXT_TEST_OPTIONS,
+    TestReport,
+    json_mode,
+    parse_json_output,
+    summarize,
+)
+from eth_wh_mcp.results import store as result_store
+from eth_wh_mcp.runner import LIGHT, CommandResult, env_int, option_value, run_command
+from eth_wh_mcp.shards import run_sharded
+from eth_wh_mcp.toolchain import toolchain
 
 # Initialize the MCP server
 mcp = FastMCP("FoundryServer")
 
 @mcp.tool()
-def create_project(project_name: str) -> str:
+@instrumented
+async def create_project(project_name: str) -> str:
     """Creates a new Foundry project."""
-    result = subprocess.run(["forge", "init", project_name], capture_output=True, text=True)
+    result = await run_command(["forge", "init", project_name])
     return result.stdout or result.stderr
 
 @mcp.tool()
-def build_project(options: str = "") -> str:
+@instrumented
+async def build_project(options: str = "", use_cache: bool = True, raw: bool = False, ctx: Context = None) -> str:
     """
     Builds the current Foundry project with optional parameters.
 
@@ -45,20 +87,45 @@ def build_project(options: str = "") -> str:
         * --hh/--hardhat: Convenience flag equivalent to passing --contracts contracts --lib-paths node-modules.
         * --out: Specify the project's artifacts directory.
         * --silent: Suppress all output.
-        * --watch: Watch specific file(s) or folder(s) for changes.
-        * --delay: Specify file update debounce delay.
-        * --no-restart: Do not restart the command while it's running.
-        * --run-all: Explicitly re-run the command on all files when a change is made.
+        * --watch: Accepted for compatibility. Every structured build already runs in a background build session
+          that watches the project and recompiles on changes; --watch, --delay, --no-restart and --run-all are
+          ignored.
+    - use_cache (bool): Return the session's latest build when no source, test, script, library or config file
+      has changed and the options are the same. Set to False to force a fresh compile. Runs with --force are
+      never cached.
+    - raw (bool): Return forge's terminal output of a one-shot `forge build` instead of the parsed summary. Runs
+      using --sizes, --names or --force are always one-shot and return terminal output.
 
     Returns:
-    - str: The output of the `forge build` command.
+    - str: By default a JSON summary parsed from `forge build --json`: the exit code, error and warning counts,
+      the number of compiled contracts, the first diagnostics with file, line and message, and the state of the
+      project's build session. Every diagnostic
+      and contract name is kept server-side and can be read page by page from the `detail.uri` resource
+      (foundry://results/{result_id}/{page}). With raw=True, or if the output cannot be parsed, the exit code
+      and the stdout and stderr of the command.
     """
-    command = ["forge", "build"] + options.split()
-    result = subprocess.run(command, capture_output=True, text=True)
-    return result.stdout or result.stderr
+    option_list = [option for option in strip_watch_options(options.split()) if option != "--json"]
+    if not raw and json_mode(option_list, TEXT_BUILD_OPTIONS) and is_cacheable(option_list):
+        # The session answers from memory when nothing changed, or waits for the compile in flight.
+        session = build_manager.get(option_list)
+        result = await session.latest(fresh=not use_cache)
+        if session.report is None:
+            return result.format()
+        session.report.extra["session"] = session.describe()
+        return summarize(session.report)
+
+    command = ["forge", "build"] + option_list
+    out_dir = option_value(command, "--out", "-o") or project_config(".").get("out", "out")
+    streamer = ProgressStreamer(ctx)
+    result = await run_cached(command, use_cache, on_line=streamer, outputs=(out_dir,))
+    await streamer.flush()
+    return result.format()
 
 @mcp.tool()
-def test_project(options: str = "") -> str:
+@instrumented
+async def test_project(
+    options: str = "", use_cache: bool = True, shards: int = 1, raw: bool = False, ctx: Context = None
+) -> str:
     """
     Runs the project's tests with optional parameters.
 
@@ -123,16 +190,41 @@ def test_project(options: str = "") -> str:
         * --run-all: Explicitly re-run the command on all files when a change is made.
         * --list: List tests instead of running them.
         * --json: Print the deployment information as JSON.
+    - use_cache (bool): Reuse the previous result when no source, test, script, library or config file has changed
+      and the options are the same. Runs with --force, --fork-url, --watch, --debug or --ffi are never cached.
+    - shards (int): Split the suite by contract into up to this many `forge test` processes that run
+      concurrently after one shared compile, balanced by each suite's recorded duration. The summary then
+      also lists per-shard timings and the total wall time. Default 1 (a single run). Sharded runs always run
+      (use_cache does not apply) and always return the summary (raw does not apply).
+    - raw (bool): Return forge's terminal output instead of the parsed summary. Ignored for sharded runs. Runs
+      using --list, --watch, --debug, --gas-report, --flamegraph or --flamechart always return terminal output.
 
     Returns:
-    - str: The output of the `forge test` command.
+    - str: By default a JSON summary parsed from `forge test --json`: pass/fail/skip counts, failures with their
+      reasons and counterexamples, and the slowest and most gas-hungry tests. The full per-test records are kept
+      server-side and can be read page by page from the `detail.uri` resource (foundry://results/{result_id}/{page}).
+      With raw=True, or if the output cannot be parsed, the exit code and the stdout and stderr of the command.
     """
-    command = ["forge", "test"] + options.split()
-    result = subprocess.run(command, capture_output=True, text=True)
-    return result.stdout or result.stderr
+    option_list = await route_fork_urls(options.split())
+    streamer = ProgressStreamer(ctx)
+    if shards > 1:
+        report = await run_sharded(option_list, shards, on_line=streamer)
+        await streamer.flush()
+        return summarize(report) if isinstance(report, TestReport) else report.format()
+
+    structured = not raw and json_mode(option_list, TEXT_TEST_OPTIONS)
+    command = ["forge", "test"] + option_list + (["--json"] if structured and "--json" not in option_list else [])
+    result = await run_cached(command, use_cache, on_line=streamer, full_stdout=structured)
+    await streamer.flush()
+    if structured:
+        suites = parse_json_output(result.stdout)
+        if isinstance(suites, dict):
+            return summarize(TestReport.from_json(suites, result.returncode))
+    return result.format()
 
 @mcp.tool()
-def clone_contract(contract_address: str, root: str = "", chain_id: str = "", etherscan_api_key: str = "", no_remappings_txt: bool = False, no_commit: bool = False, no_git: bool = False, quiet: bool = False) -> str:
+@instrumented
+async def clone_contract(contract_address: str, root: str = "", chain_id: str = "", etherscan_api_key: str = "", no_remappings_txt: bool = False, no_commit: bool = False, no_git: bool = False, quiet: bool = False) -> str:
     """Clones a contract from Etherscan with specified options."""
     command = ["forge", "clone", contract_address]
 
@@ -151,17 +243,19 @@ def clone_contract(contract_address: str, root: str = "", chain_id: str = "", et
     if quiet:
         command.append("--quiet")
 
-    result = subprocess.run(command, capture_output=True, text=True)
+    result = await run_command(command)
     return result.stdout or result.stderr
 
 @mcp.tool()
-def run_script(script_name: str) -> str:
+@instrumented
+async def run_script(script_name: str) -> str:
     """Runs a script in the current Foundry project."""
-    result = subprocess.run(["forge", "script", script_name], capture_output=True, text=True)
+    result = await run_command(["forge", "script", script_name])
     return result.stdout or result.stderr
 
 @mcp.tool()
-def run_cast_command_with_options(command: str, options: str = "") -> str:
+@instrumented
+async def run_cast_command_with_options(command: str, options: str = "") -> str:
     """
     Executes a Cast command with optional parameters.
 
@@ -182,15 +276,95 @@ def run_cast_command_with_options(command: str, options: str = "") -> str:
         * -V, --version: Print version info and exit.
         * -h, --help: Prints help information.
 
+    Pure utilities (keccak, sig, sig-event, to-wei, from-wei, to-hex, abi-encode, calldata and
+    compute-address with --nonce) are computed in-process and memoized. Read-only RPC commands
+    (balance, nonce, code, codesize, storage, block-number, chain-id, gas-price and raw-calldata call)
+    against an HTTP endpoint are answered over a pooled, batching JSON-RPC client. Everything else
+    runs the `cast` binary. For `logs` over more than a few thousand blocks, use `scan_logs`.
+
     Returns:
     - str: The output of the Cast command.
     """
-    full_command = ["cast"] + command.split() + options.split()
-    result = subprocess.run(full_command, capture_output=True, text=True)
+    args = command.split() + options.split()
+    native = await run_cast_native(args)
+    if native is not None:
+        return native
+    full_command = ["cast"] + args
+    result = await run_command(full_command, LIGHT)
     return result.stdout or result.stderr
 
 @mcp.tool()
-def start_anvil_with_options(options: str = "") -> str:
+@instrumented
+async def scan_logs(
+    event: str = "",
+    address: str = "",
+    from_block: int | str = 0,
+    to_block: int | str = "latest",
+    topics: str = "",
+    rpc_url: str = "",
+    cursor: str = "",
+    limit: int = 1000,
+    ctx: Context = None,
+) -> str:
+    """
+    Scans a block range for event logs in concurrent, adaptively sized `eth_getLogs` chunks, like a `cast logs`
+    that neither times out nor runs into the provider's block range and result limits.
+
+    Parameters:
+    - event (str): An event signature such as "Transfer(address indexed from, address indexed to, uint256 value)",
+      whose logs are matched by topic and decoded (named parameters keep their names), or a topic0 hash. Empty
+      matches every event.
+    - address (str): Emitting contract addresses, separated by spaces or commas. Empty matches every contract.
+    - from_block (int | str): The first block: a number, 0x-hex or a tag (earliest, latest, safe, finalized).
+    - to_block (int | str): The last block, as for from_block. Tags are resolved once, when the scan starts.
+    - topics (str): Further topic filters after the event's, separated by spaces: 32-byte hex, or shorter hex such as
+      an address (left-padded), or "null" for any value.
+    - rpc_url (str): The HTTP(S) endpoint. Defaults to ETH_RPC_URL, then foundry.toml's `eth_rpc_url`, then
+      http://localhost:8545.
+    - cursor (str): A cursor from an earlier, unfinished scan; continues that scan and ignores the query parameters.
+    - limit (int): Stop starting new chunks once this many events were found (0 for no limit). Chunks in flight
+      still finish, and the returned cursor continues from there.
+
+    Events are streamed as progress notifications when the client sends a progress token: JSON messages per
+    completed chunk with the cursor, its blocks and its events, and the result then leaves the events out. Each
+    completed chunk is also saved to the cursor, so a scan that is interrupted or cancelled resumes without
+    refetching them.
+
+    Returns:
+    - str: JSON with the events found by this call (block, log index, transaction, address, and either the decoded
+      event name and arguments or the raw topics and data; omitted when they were streamed) and their count, the
+      cursor to continue with (null once done), the blocks scanned and remaining, request, retry and refused-chunk
+      counts, the final chunk size and, if the scan stopped on a failing chunk, the error.
+    """
+    if cursor:
+        scan_cursor = LogCursor.load(str(cursor))
+    else:
+        scan_cursor = await new_log_cursor(event, address, str(from_block), str(to_block), topics, rpc_url)
+    max_message_bytes = 4 * 1024 * 1024
+    streamer = ProgressStreamer(ctx, interval=0, max_batch_bytes=max_message_bytes)
+
+    async def send(low: int, high: int, events: list) -> None:
+        await streamer("stdout", json.dumps({"cursor": scan_cursor.cursor_id, "from": low, "to": high, "events": events}))
+
+    async def on_chunk(low: int, high: int, events: list) -> None:
+        # Split a dense chunk: a message over the streamer's batch limit would be dropped.
+        part, size = [], 0
+        for record in events:
+            record_size = len(json.dumps(record)) + 2
+            if part and size + record_size > max_message_bytes // 2:
+                await send(low, high, part)
+                part, size = [], 0
+            part.append(record)
+            size += record_size
+        await send(low, high, part)
+
+    report = await scan_log_chunks(scan_cursor, on_chunk, limit, keep_events=not streamer.enabled)
+    await streamer.flush()
+    return json.dumps(report, indent=2)
+
+@mcp.tool()
+@instrumented
+async def start_anvil_with_options(options: str = "") -> str:
     """
     Starts the Anvil local Ethereum node with optional parameters.
 
@@ -231,17 +405,81 @@ def start_anvil_with_options(options: str = "") -> str:
         * --config-out: Writes output of anvil as JSON to a user-specified file.
         * --prune-history: Don’t keep full chain history.
 
+    A free port is allocated when --port is not given, and the call returns once the node answers
+    JSON-RPC. Nodes started without options are served from a warm pool when one is available.
+
+    Returns:
+    - str: The node ID and RPC URL of the running node.
+    """
+    node = await anvil_manager.start(await route_fork_urls(options.split()))
+    return f"Anvil node {node.node_id} is ready at {node.rpc_url} (pid {node.process.pid})."
+
+@mcp.tool()
+@instrumented
+async def stop_anvil(node_id: str, recycle: bool = True) -> str:
+    """
+    Stops an Anvil node started by `start_anvil_with_options`.
+
+    Parameters:
+    - node_id (str): The ID of the node to stop.
+    - recycle (bool): Return a node started without options to the warm pool (reverted to its
+      initial state) instead of terminating it.
+
+    Returns:
+    - str: Whether the node was stopped or recycled.
+    """
+    outcome = await anvil_manager.stop(node_id, recycle)
+    return f"Anvil node {node_id} {outcome}."
+
+@mcp.tool()
+@instrumented
+def list_anvil_nodes() -> str:
+    """Lists the Anvil nodes started by this server as JSON."""
+    return json.dumps([node.describe() for node in anvil_manager.nodes.values()], indent=2)
+
+@mcp.tool()
+@instrumented
+def get_anvil_logs(node_id: str) -> str:
+    """Returns the retained output of an Anvil node (the head and tail of its log)."""
+    return anvil_manager.get(node_id).logs.text()
+
+@mcp.tool()
+@instrumented
+async def snapshot_anvil(node_id: str) -> str:
+    """
+    Snapshots the state of an Anvil node with `evm_snapshot`.
+
+    Returns:
+    - str: The snapshot ID to pass to `revert_anvil`.
+    """
+    return await anvil_manager.snapshot(anvil_manager.get(node_id))
+
+@mcp.tool()
+@instrumented
+async def revert_anvil(node_id: str, snapshot_id: str = "") -> str:
+    """
+    Reverts an Anvil node to a snapshot with `evm_revert`.
+
+    Parameters:
+    - node_id (str): The ID of the node to revert.
+    - snapshot_id (str): The snapshot to revert to. When empty, a node started without options is
+      reset to its initial state.
+
     Returns:
-    - str: The output of the `anvil` command.
+    - str: Whether the revert succeeded.
     """
-    command = ["anvil"] + options.split()
-    result = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    return "Anvil started with the specified options. Check the terminal for logs."
+    node = anvil_manager.get(node_id)
+    if not snapshot_id:
+        await anvil_manager.reset(node)
+        return f"Anvil node {node_id} reset to its initial state."
+    reverted = await anvil_manager.revert(node, snapshot_id)
+    return f"Anvil node {node_id} reverted to snapshot {snapshot_id}." if reverted else f"Snapshot {snapshot_id} not found on {node_id}."
 
 @mcp.tool()
-def start_chisel_with_options(options: str = "") -> str:
+@instrumented
+async def start_chisel_with_options(options: str = "") -> str:
     """
-    Starts the Chisel Solidity REPL with optional parameters.
+    Starts a Chisel Solidity REPL session with optional parameters, or runs a Chisel session-cache subcommand.
 
     Parameters:
     - options (str): Additional options for the `chisel` command. Possible values include:
@@ -249,16 +487,56 @@ def start_chisel_with_options(options: str = "") -> str:
         * load <id>: Launches the REPL and loads the corresponding session if a cached session with id = <id> exists.
         * view <id>: Displays the source code of the session’s REPL contract if a cached session with id = <id> exists.
         * clear-cache: Deletes all cache files within the ~/.foundry/cache/chisel directory. These sessions are unrecoverable.
+        * --fork-url: Fork the REPL state from a remote endpoint.
+        * --use: Specify the solc version or path to a local solc.
 
     Returns:
-    - str: The output of the `chisel` command.
+    - str: The output of `list`, `view` and `clear-cache`. Otherwise the id of the new REPL session, to be passed
+      to `evaluate_solidity`. Sessions that stay idle for FOUNDRY_MCP_CHISEL_IDLE seconds are stopped.
     """
-    command = ["chisel"] + options.split()
-    result = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    return "Chisel started with the specified options. Check the terminal for logs."
+    option_list = options.split()
+    if option_list[:1] in (["list"], ["view"], ["clear-cache"]):
+        result = await run_command(["chisel"] + option_list, LIGHT)
+        return result.stdout or result.stderr
+
+    session = await chisel_manager.start(option_list)
+    return f"Chisel session {session.session_id} is ready (pid {session.process.pid})."
 
 @mcp.tool()
-def inspect_contract(contract_name: str, field: str, options: str = "") -> str:
+@instrumented
+async def evaluate_solidity(code: str, session_id: str = "") -> str:
+    """
+    Evaluates Solidity in a warm Chisel REPL and returns what Chisel printed.
+
+    Parameters:
+    - code (str): Statements, expressions or Chisel `!` commands, e.g. "uint256 x = 42; x * 2" or
+      "keccak256(abi.encode(1))". Each line is a separate REPL input, except that a definition or
+      expression left open on one line (e.g. a function body) continues until its brackets close. Comments are
+      removed.
+    - session_id (str): A session from `start_chisel_with_options`, whose variables and definitions persist
+      between calls. Leave empty to evaluate in a fresh, stateless session taken from the warm pool.
+
+    Returns:
+    - str: The REPL output for the snippet (types and values of expressions, or compiler errors).
+    """
+    return await chisel_manager.evaluate(code, session_id) or "(no output)"
+
+@mcp.tool()
+@instrumented
+async def stop_chisel(session_id: str) -> str:
+    """Stops a Chisel REPL session started with `start_chisel_with_options`."""
+    await chisel_manager.stop(session_id)
+    return f"Chisel session {session_id} stopped."
+
+@mcp.tool()
+@instrumented
+def list_chisel_sessions() -> str:
+    """Lists the named Chisel REPL sessions as JSON."""
+    return json.dumps([session.describe() for session in chisel_manager.sessions.values()], indent=2)
+
+@mcp.tool()
+@instrumented
+async def inspect_contract(contract_name: str, field: str, options: str = "") -> str:
     """
     Inspects a smart contract and retrieves specialized information based on the specified field.
 
@@ -312,15 +590,25 @@ def inspect_contract(contract_name: str, field: str, options: str = "") -> str:
         * --no-restart: Do not restart the command while it's running.
         * --run-all: Explicitly re-run the command on all files when a change is made.
 
+    When the only option is --json, the field is read directly from the compiled artifacts in the
+    project's out directory, provided they are up to date with the sources. Fields the artifacts do
+    not contain, and the table output forge prints without --json, fall back to `forge inspect`.
+
     Returns:
     - str: The output of the `forge inspect` command.
     """
+    if options.split() == ["--json"]:
+        output = get_artifact_index().inspect(contract_name, field)
+        if output is not None:
+            return output + "\n"
+
     command = ["forge", "inspect", contract_name, field] + options.split()
-    result = subprocess.run(command, capture_output=True, text=True)
+    result = await run_command(command)
     return result.stdout or result.stderr
 
 @mcp.tool()
-def snapshot_project(options: str = "") -> str:
+@instrumented
+async def snapshot_project(options: str = "", use_cache: bool = True, run_id: str = "", ctx: Context = None) -> str:
     """
     Creates a snapshot of each test's gas usage with optional parameters.
 
@@ -391,16 +679,83 @@ def snapshot_project(options: str = "") -> str:
         * --delay: Specify file update debounce delay.
         * --no-restart: Do not restart the command while it's running.
         * --run-all: Explicitly re-run the command on all files when a change is made.
+    - use_cache (bool): Reuse the previous result when no source, test, script, library or config file has changed
+      and the options are the same. Runs with --force, --fork-url, --watch, --debug or --ffi are never cached.
+    - run_id (str): The ID under which the snapshot is recorded in the gas history. Defaults to the HEAD commit
+      (with a "+dirty-<time>" suffix when tracked files have uncommitted changes). Recording the same ID again
+      replaces that run.
 
     Returns:
-    - str: The output of the `forge snapshot` command.
+    - str: The exit code and the stdout and stderr of the `forge snapshot` command. Output is streamed as progress
+      notifications while the command runs, and very long output keeps only its head and tail. A successful run
+      that writes the snapshot file is recorded in the gas history used by `diff_gas_snapshots` and `gas_trend`.
     """
-    command = ["forge", "snapshot"] + options.split()
-    result = subprocess.run(command, capture_output=True, text=True)
-    return result.stdout or result.stderr
+    command = ["forge", "snapshot"] + await route_fork_urls(options.split())
+    snap_file = option_value(command, "--snap") or ".gas-snapshot"
+    # --diff and --check compare against the existing snapshot; a plain run (re)writes it.
+    compares = any(option.split("=", 1)[0] in ("--diff", "--check") for option in command)
+    streamer = ProgressStreamer(ctx)
+    result = await run_cached(
+        command, use_cache, on_line=streamer,
+        inputs=(snap_file,) if compares else (), outputs=() if compares else (snap_file,),
+    )
+    await streamer.flush()
+    if not compares and result.returncode == 0:
+        try:
+            recorded = await record_gas_snapshot(snap_file, run_id)
+        except (OSError, sqlite3.Error):
+            pass  # The snapshot itself succeeded; only the history misses this run.
+        else:
+            return result.format() + f"\n\nRecorded {recorded['tests']} tests in the gas history as run {recorded['run_id']}."
+    return result.format()
 
 @mcp.tool()
-def coverage_project(options: str = "") -> str:
+@instrumented
+async def diff_gas_snapshots(base: str = "", head: str = "", tolerance: float = 0.0, top: int = 10) -> str:
+    """
+    Compares two recorded gas snapshots without running any test.
+
+    Parameters:
+    - base (str): The run to compare against: a run ID, or a unique prefix of a run ID or commit. Defaults to the
+      run recorded before `head`.
+    - head (str): The run to compare. Defaults to the latest recorded run.
+    - tolerance (float): Gas changes of at most this many percent count as unchanged (like `forge snapshot --check
+      --tolerance`).
+    - top (int): How many of the largest regressions and improvements to list.
+
+    Returns:
+    - str: JSON with the two run IDs, whether the check passes (no change beyond the tolerance), the numbers of
+      regressions, improvements and unchanged tests, the added and removed tests, the total gas change, and the
+      top regressions and improvements with their absolute and percentage change (the percentage is null for a
+      change from 0 gas).
+    """
+    return json.dumps(await asyncio.to_thread(gas_history.diff, os.getcwd(), base, head, tolerance, top), indent=2)
+
+@mcp.tool()
+@instrumented
+async def gas_trend(test: str, limit: int = 20) -> str:
+    """
+    Shows how the gas of tests changed over the recorded snapshot runs.
+
+    Parameters:
+    - test (str): A substring of the test name, e.g. "test_Increment" or "CounterTest:".
+    - limit (int): How many of the most recent runs to include.
+
+    Returns:
+    - str: JSON mapping each matching "Contract:test" to its gas per run (oldest first) and its minimum, maximum
+      and overall change.
+    """
+    return json.dumps(await asyncio.to_thread(gas_history.trend, os.getcwd(), test, limit), indent=2)
+
+@mcp.tool()
+@instrumented
+async def list_gas_runs(limit: int = 20) -> str:
+    """Lists the most recent gas snapshot runs recorded for the current project as JSON, newest first."""
+    return json.dumps(await asyncio.to_thread(gas_history.runs, os.getcwd(), limit), indent=2)
+
+@mcp.tool()
+@instrumented
+async def coverage_project(options: str = "", use_cache: bool = True, ctx: Context = None) -> str:
     """
     Displays which parts of your code are covered by tests with optional parameters.
 
@@ -412,16 +767,88 @@ def coverage_project(options: str = "") -> str:
             - debug: Outputs lines describing the location of uncovered code.
         * --ir-minimum: Run the coverage with via-ir enabled for the minimum amount of optimization necessary.
         * --no-match-coverage: Exclude paths and contracts from the coverage report. Example: "(script|Foo|Bar)".
+    - use_cache (bool): Reuse the previous result when no source, test, script, library or config file has changed
+      and the options are the same. Runs with --force, --fork-url, --watch, --debug or --ffi are never cached.
 
     Returns:
-    - str: The output of the `forge coverage` command.
+    - str: The exit code and the stdout and stderr of the `forge coverage` command. Output is streamed as progress
+      notifications while the command runs, and very long output keeps only its head and tail. An lcov report is
+      also loaded into the coverage index read by `query_coverage`.
     """
     command = ["forge", "coverage"] + options.split()
-    result = subprocess.run(command, capture_output=True, text=True)
-    return result.stdout or result.stderr
+    reports = [command[i + 1] for i, option in enumerate(command[:-1]) if option == "--report"]
+    reports += [option.split("=", 1)[1] for option in command if option.startswith("--report=")]
+    outputs = (option_value(command, "--report-file", "-r") or "lcov.info",) if "lcov" in reports else ()
+    streamer = ProgressStreamer(ctx)
+    result = await run_cached(command, use_cache, on_line=streamer, outputs=outputs)
+    await streamer.flush()
+    if outputs and result.returncode == 0:
+        index = coverage_store.get()
+        try:
+            await asyncio.to_thread(index.load_report, outputs[0], coverage_options(command[2:]))
+        except OSError:
+            pass
+        else:
+            return result.format() + f"\n\nCoverage index updated: {len(index.files)} files (see query_coverage)."
+    return result.format()
 
 @mcp.tool()
-def run_script_with_options(path: str, options: str = "") -> str:
+@instrumented
+async def update_coverage(options: str = "", incremental: bool = True, ctx: Context = None) -> str:
+    """
+    Brings the coverage index up to date, re-running only the tests affected by changed files when possible.
+
+    Parameters:
+    - options (str): Additional options for the `forge coverage` command, e.g. "--ir-minimum" or
+      "--no-match-coverage script". The server sets --report, --report-file and --match-path itself.
+    - incremental (bool): Re-run only the tests that reach a changed file through their imports, and replace just
+      the index entries of the files those tests reach. Set to false to recompute all coverage. The first run, and
+      runs with different options or a changed foundry.toml or remappings.txt, are always full.
+
+    Returns:
+    - str: JSON with the mode ("full", "incremental" or "current"), the reason, the changed files, the tests that
+      were re-run, the patched files and the project totals; or the exit code and output of `forge coverage` if it
+      failed, in which case the index is unchanged.
+    """
+    streamer = ProgressStreamer(ctx)
+    outcome = await update_coverage_index(options.split(), incremental, on_line=streamer)
+    await streamer.flush()
+    return outcome.format() if isinstance(outcome, CommandResult) else json.dumps(outcome, indent=2)
+
+@mcp.tool()
+@instrumented
+def query_coverage(file: str = "", start_line: int = 0, end_line: int = 0, uncovered_only: bool = False) -> str:
+    """
+    Reads line, branch and function coverage from the index kept by `update_coverage`.
+
+    Parameters:
+    - file (str): A source file, e.g. "src/Counter.sol" (a unique suffix such as "Counter.sol" also works). Leave
+      empty for the project totals and a summary per file.
+    - start_line (int): First line of the range to report (0 for the start of the file).
+    - end_line (int): Last line of the range to report, inclusive (0 for the end of the file).
+    - uncovered_only (bool): List only lines, branches and functions that were never hit (or, without a file, only
+      files that are not fully covered).
+
+    Returns:
+    - str: JSON. For a file: its line, branch and function counts as [hit, found], and the hits of each line,
+      branch and function in the range. Without a file: the project totals and per-file counts.
+    """
+    index = coverage_store.get()
+    if index.updated_at is None:
+        raise ValueError("No coverage recorded for this project yet; run update_coverage first.")
+    if not file:
+        files = [coverage.summary() for _, coverage in sorted(index.files.items())]
+        if uncovered_only:
+            files = [summary for summary in files if summary["lines"][0] < summary["lines"][1]]
+        return json.dumps({**index.summary(), "per_file": files}, indent=2)
+    coverage = index.find(file)
+    if coverage is None:
+        raise ValueError(f"No coverage recorded for {file}")
+    return json.dumps(coverage.query(start_line, end_line, uncovered_only), indent=2)
+
+@mcp.tool()
+@instrumented
+async def run_script_with_options(path: str, options: str = "", ctx: Context = None) -> str:
     """
     Runs a smart contract as a script, building transactions that can be sent on-chain with optional parameters.
 
@@ -481,11 +908,116 @@ def run_script_with_options(path: str, options: str = "") -> str:
         * EVM Options: Includes options for RPC URL, fork URL, verbosity, sender, initial balance, and more.
 
     Returns:
-    - str: The output of the `forge script` command.
+    - str: The exit code and the stdout and stderr of the `forge script` command. Output is streamed as progress
+      notifications while the command runs, and very long output keeps only its head and tail.
     """
-    command = ["forge", "script", path] + options.split()
-    result = subprocess.run(command, capture_output=True, text=True)
-    return result.stdout or result.stderr
+    command = ["forge", "script", path] + await route_fork_urls(options.split())
+    streamer = ProgressStreamer(ctx)
+    result = await run_command(command, on_line=streamer)
+    await streamer.flush()
+    return result.format()
+
+@mcp.tool()
+@instrumented
+def list_build_sessions() -> str:
+    """Lists the background build sessions (one per project and build options) as JSON."""
+    return json.dumps([session.describe() for session in build_manager.sessions.values()], indent=2)
+
+@mcp.tool()
+@instrumented
+def stop_build_sessions() -> str:
+    """Stops watching the current project: ends every build session for the working directory."""
+    return f"Stopped {build_manager.stop()} build session(s)."
+
+@mcp.tool()
+@instrumented
+async def fork_cache_stats() -> str:
+    """
+    Shows the fork-state cache that `--fork-url` runs of test_project, snapshot_project, run_script_with_options
+    and start_anvil_with_options are routed through.
+
+    Returns:
+    - str: JSON with the stored responses and bytes, the size limit, and per proxy (one per upstream endpoint,
+      shown without its path or query) the local URL, the chain ID and counts of requests, cache hits and misses,
+      requests that shared an identical in-flight call, forwarded requests and errors.
+    """
+    return json.dumps(await asyncio.to_thread(fork_manager.describe), indent=2)
+
+@mcp.resource(RESULT_URI)
+def get_result_page(result_id: str, page: str) -> str:
+    """
+    Returns one page of a stored build or test result.
+
+    Parameters:
+    - result_id (str): The `detail.result_id` from a `build_project` or `test_project` summary.
+    - page (str): The zero-based page number; the summary's `detail.pages` gives the page count.
+
+    Returns:
+    - str: JSON with the page number, the page count and the records on this page (the complete forge record for
+      each test, or each compiler diagnostic and compiled contract).
+    """
+    return result_store.page(result_id, int(page))
+
+@mcp.resource("foundry://metrics")
+def get_metrics() -> str:
+    """
+    Returns the server's metrics in the Prometheus text format.
+
+    Returns:
+    - str: Per-tool call latency and outcomes, and per-tool histograms of scheduler queue wait, process spawn time,
+      child run time and output bytes, plus a count of child exit codes.
+    """
+    return metrics_registry.render()
+
+
+@mcp.resource("foundry://versions")
+async def get_versions() -> str:
+    """
+    Returns the versions of the Foundry binaries the server runs, probed once at startup.
+
+    Returns:
+    - str: JSON with the first line of `--version` for forge, cast, anvil and chisel (null where a binary is
+      missing) and when they were probed.
+    """
+    versions = await toolchain.probe()
+    return json.dumps({"versions": versions, "probed_at": toolchain.probed_at})
+
+
+async def serve(transport: str) -> None:
+    """
+    Serves MCP over `transport` until the client or server exits, probing the toolchain, filling the warm Anvil
+    and Chisel pools and reaping orphaned Anvil and Chisel processes in the background.
+    """
+    toolchain.start()
+    anvil_manager.prewarm()
+    chisel_manager.prewarm()
+    reaper = asyncio.create_task(reap_periodically([anvil_manager, chisel_manager]))
+    try:
+        if transport == "sse":
+            await mcp.run_sse_async()
+        else:
+            await mcp.run_stdio_async()
+    finally:
+        reaper.cancel()
+
+
+def cli() -> None:
+    """
+    Runs the server.
+
+    Over stdio (the default) the server belongs to the one client that launched it. With `--transport sse` it
+    listens on `--host`:`--port`, and every client that connects shares the same caches, Anvil nodes, Chisel
+    sessions, build sessions and scheduler slots.
+    """
+    parser = argparse.ArgumentParser(prog="eth-wh-mcp", description="Foundry MCP server.")
+    parser.add_argument("--transport", choices=("stdio", "sse"), default=os.environ.get("FOUNDRY_MCP_TRANSPORT", "stdio"))
+    parser.add_argument("--host", default=os.environ.get("FOUNDRY_MCP_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=env_int("FOUNDRY_MCP_PORT", 8000))
+    args = parser.parse_args()
+    mcp.settings.host = args.host
+    mcp.settings.port = args.port
+    asyncio.run(serve(args.transport))
+
 
 if __name__ == "__main__":
-    mcp.run()
\ No newline at end of file
+    cli()
\ No newline at end of file
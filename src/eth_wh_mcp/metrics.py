@@ -0,0 +1,270 @@
+"""
+Latency, spawn-cost and output-size instrumentation.
+
+Every MCP tool is wrapped with `instrumented`, which times the call and sets
+the current tool name in a context variable. `run_command` reports the phases
+of each child process -- time queued in the scheduler, time to spawn, time
+until exit, output bytes and exit code -- through `record_command`, and the
+context variable attributes them to the tool that started the child.
+`instrumented` also sets `current_client` to a label for the MCP session
+that made the call, which the scheduler uses to share slots fairly between
+clients of one server.
+
+`registry` renders everything in the Prometheus text format. It is served as
+the `foundry://metrics` resource and, when FOUNDRY_MCP_METRICS_FILE is set,
+written to that file (for a node-exporter textfile collector or similar).
+When FOUNDRY_MCP_TRACE_FILE is set, one JSON line per tool call with its
+child-process spans is appended to that file.
+"""
+import atexit
+import bisect
+import contextvars
+import functools
+import inspect
+import itertools
+import json
+import os
+import threading
+import time
+import weakref
+
+from mcp.server.lowlevel.server import request_ctx
+
+_DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900)
+_BYTE_BUCKETS = tuple(256 * 4 ** i for i in range(12))  # 256 B .. 1 GiB
+
+current_tool: contextvars.ContextVar[str] = contextvars.ContextVar("current_tool", default="-")
+current_client: contextvars.ContextVar[str] = contextvars.ContextVar("current_client", default="-")
+_spans: contextvars.ContextVar[list | None] = contextvars.ContextVar("trace_spans", default=None)
+
+_client_labels: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_client_ids = itertools.count(1)
+
+
+def client_label() -> str:
+    """Names the MCP session of the current request "client-N" (N in connection order), or "-" outside one."""
+    try:
+        session = request_ctx.get().session
+    except LookupError:
+        return "-"
+    label = _client_labels.get(session)
+    if label is None:
+        label = _client_labels[session] = f"client-{next(_client_ids)}"
+    return label
+
+
+def _escape(value: str) -> str:
+    """Escapes a label value for the Prometheus text format (backslash, double quote and newline)."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Histogram:
+    """A Prometheus-style histogram with fixed buckets, one series per label set."""
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...], buckets: tuple[float, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series: dict[tuple[str, ...], list] = {}  # labels -> [bucket counts, sum, count]
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), labels + (f'{bound:g}',))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), labels + ('+Inf',))} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, labels)} {total:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labels, labels)} {count}")
+        return lines
+
+    def snapshot(self) -> dict:
+        return {
+            ",".join(labels) or "-": {"count": count, "sum": round(total, 6)}
+            for labels, (_, total, count) in sorted(self._series.items())
+        }
+
+
+class Counter:
+    """A Prometheus-style counter, one series per label set."""
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._series: dict[tuple[str, ...], int] = {}
+
+    def inc(self, *labels: str) -> None:
+        self._series[labels] = self._series.get(labels, 0) + 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_labels(self.labels, labels)} {value}" for labels, value in sorted(self._series.items())]
+        return lines
+
+
+class Registry:
+    """All server metrics, plus the optional Prometheus text file and trace log."""
+
+    def __init__(self, metrics_file: str | None, trace_file: str | None, write_interval: float = 1.0):
+        self.metrics_file = metrics_file
+        self.trace_file = trace_file
+        self.write_interval = write_interval
+        self.tool_seconds = Histogram(
+            "foundry_mcp_tool_duration_seconds", "Wall time of MCP tool calls.", ("tool",), _DURATION_BUCKETS)
+        self.tool_calls = Counter("foundry_mcp_tool_calls_total", "MCP tool calls by outcome.", ("tool", "outcome"))
+        self.queue_seconds = Histogram(
+            "foundry_mcp_queue_wait_seconds", "Time child processes waited for a scheduler slot.",
+            ("tool", "class"), _DURATION_BUCKETS)
+        self.spawn_seconds = Histogram(
+            "foundry_mcp_spawn_seconds", "Time to spawn a child process.", ("tool",), _DURATION_BUCKETS)
+        self.child_seconds = Histogram(
+            "foundry_mcp_child_runtime_seconds", "Child process run time, from spawn to exit.", ("tool",),
+            _DURATION_BUCKETS)
+        self.output_bytes = Histogram(
+            "foundry_mcp_output_bytes", "Bytes written by a child process (stdout and stderr, before truncation).",
+            ("tool",), _BYTE_BUCKETS)
+        self.exit_codes = Counter("foundry_mcp_exit_codes_total", "Child process exit codes.", ("tool", "code"))
+        self._lock = threading.Lock()
+        self._last_write = 0.0
+
+    def record_command(
+        self,
+        tool_class: str,
+        queue_seconds: float,
+        spawn_seconds: float,
+        run_seconds: float,
+        output_bytes: int,
+        returncode: int,
+        args: list[str] | None = None,
+    ) -> None:
+        """Records the phases of one finished child process under the current tool."""
+        tool = current_tool.get()
+        self.queue_seconds.observe(queue_seconds, tool, tool_class)
+        self.spawn_seconds.observe(spawn_seconds, tool)
+        self.child_seconds.observe(run_seconds, tool)
+        self.output_bytes.observe(output_bytes, tool)
+        self.exit_codes.inc(tool, str(returncode))
+
+        spans = _spans.get()
+        if spans is not None:
+            spans.append({
+                "command": " ".join((args or [])[:2]),
+                "class": tool_class,
+                "queue_seconds": round(queue_seconds, 6),
+                "spawn_seconds": round(spawn_seconds, 6),
+                "run_seconds": round(run_seconds, 6),
+                "output_bytes": output_bytes,
+                "exit_code": returncode,
+            })
+
+    def record_call(
+        self, tool: str, client: str, started: float, seconds: float, error: BaseException | None, spans
+    ) -> None:
+        self.tool_seconds.observe(seconds, tool)
+        self.tool_calls.inc(tool, "ok" if error is None else type(error).__name__)
+        if spans is not None:
+            self._trace({
+                "tool": tool,
+                "client": client,
+                "start": round(started, 6),
+                "seconds": round(seconds, 6),
+                "error": None if error is None else str(error),
+                "spans": spans,
+            })
+        if self.metrics_file and time.monotonic() - self._last_write >= self.write_interval:
+            self.write()
+
+    def render(self) -> str:
+        metrics = (self.tool_seconds, self.tool_calls, self.queue_seconds, self.spawn_seconds, self.child_seconds,
+                   self.output_bytes, self.exit_codes)
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+    def write(self) -> None:
+        """Atomically rewrites the Prometheus text file."""
+        if not self.metrics_file:
+            return
+        self._last_write = time.monotonic()
+        tmp = f"{self.metrics_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                f.write(self.render())
+            os.replace(tmp, self.metrics_file)
+        except OSError:
+            pass
+
+    def _trace(self, record: dict) -> None:
+        with self._lock:
+            try:
+                with open(self.trace_file, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+            except OSError:
+                pass
+
+
+registry = Registry(
+    metrics_file=os.environ.get("FOUNDRY_MCP_METRICS_FILE") or None,
+    trace_file=os.environ.get("FOUNDRY_MCP_TRACE_FILE") or None,
+)
+atexit.register(registry.write)
+
+
+def instrumented(fn):
+    """Times an MCP tool and attributes the child processes it runs to it."""
+    tool = fn.__name__
+
+    def begin():
+        spans = [] if registry.trace_file else None
+        tokens = current_tool.set(tool), current_client.set(client_label()), _spans.set(spans)
+        return tokens, spans, time.time(), time.perf_counter()
+
+    def end(tokens, spans, started, t0, error):
+        registry.record_call(tool, current_client.get(), started, time.perf_counter() - t0, error, spans)
+        current_tool.reset(tokens[0])
+        current_client.reset(tokens[1])
+        _spans.reset(tokens[2])
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            tokens, spans, started, t0 = begin()
+            error = None
+            try:
+                return await fn(*args, **kwargs)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                end(tokens, spans, started, t0, error)
+    else:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            tokens, spans, started, t0 = begin()
+            error = None
+            try:
+                return fn(*args, **kwargs)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                end(tokens, spans, started, t0, error)
+    return wrapper
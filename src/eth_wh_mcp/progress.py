@@ -0,0 +1,78 @@
+"""
+Streams child process output to the client as MCP progress notifications.
+
+Progress notifications are only sent when the client supplied a progress token.
+Lines are batched and flushed at most every `interval` seconds, and each batch is
+capped in size, so a chatty `-vvvv` run cannot flood the transport.
+"""
+import time
+
+from mcp import types
+from mcp.server.fastmcp import Context
+
+
+class ProgressStreamer:
+    """Line callback for `run_command` that forwards output as progress messages."""
+
+    def __init__(self, ctx: Context | None, interval: float = 0.25, max_batch_bytes: int = 16 * 1024):
+        self.interval = interval
+        self.max_batch_bytes = max_batch_bytes
+        self.lines_seen = 0
+        self._session = None
+        self._token = None
+        self._batch: list[str] = []
+        self._batch_size = 0
+        self._skipped = 0
+        self._last_flush = time.monotonic()
+
+        try:
+            request_context = ctx.request_context if ctx is not None else None
+        except ValueError:
+            # Called outside of an MCP request (e.g. directly from Python).
+            request_context = None
+        if request_context is not None and request_context.meta is not None:
+            self._token = request_context.meta.progressToken
+            self._session = request_context.session
+
+    @property
+    def enabled(self) -> bool:
+        return self._token is not None
+
+    async def __call__(self, stream: str, line: str) -> None:
+        self.lines_seen += 1
+        if not self.enabled:
+            return
+
+        entry = line if stream == "stdout" else f"[stderr] {line}"
+        if self._batch_size + len(entry) < self.max_batch_bytes:
+            self._batch.append(entry)
+            self._batch_size += len(entry) + 1
+        else:
+            self._skipped += 1
+
+        if time.monotonic() - self._last_flush >= self.interval:
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Sends any batched lines; call once more after the child exits."""
+        if not self.enabled or not (self._batch or self._skipped):
+            return
+
+        if self._skipped:
+            self._batch.append(f"... [{self._skipped} lines not streamed] ...")
+        message = "\n".join(self._batch)
+        self._batch, self._batch_size, self._skipped = [], 0, 0
+        self._last_flush = time.monotonic()
+
+        await self._session.send_notification(
+            types.ServerNotification(
+                types.ProgressNotification(
+                    method="notifications/progress",
+                    params=types.ProgressNotificationParams(
+                        progressToken=self._token,
+                        progress=self.lines_seen,
+                        message=message,
+                    ),
+                )
+            )
+        )
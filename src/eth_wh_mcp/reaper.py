@@ -0,0 +1,131 @@
+"""
+Reaping of orphaned Anvil and Chisel processes.
+
+Anvil nodes and Chisel sessions run in their own process groups and are meant
+to outlive the request that started them, so they also outlive a server that
+crashes or is killed. `ChildRegistry` records each of them -- pid and process
+start time -- in one file per server process under the cache directory, and
+`reap_orphans` kills the recorded groups of servers that are no longer alive.
+The start time guards against pid reuse: a process is only killed if it is
+the very process that was recorded, which is checked through /proc, so
+orphans are reaped on Linux and left alone elsewhere.
+
+`reap_periodically` runs `reap_orphans` when the server starts and then every
+FOUNDRY_MCP_REAP_INTERVAL seconds, and has each manager drop the nodes and
+sessions whose process has exited, so their pool slots are refilled at once.
+"""
+import asyncio
+import json
+import os
+import signal
+import threading
+
+from eth_wh_mcp.cache import cache_dir
+from eth_wh_mcp.runner import env_int
+
+
+def start_time(pid: int) -> int | None:
+    """The start time of a process in clock ticks since boot, or None if it is gone or unknown."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # The command name may contain spaces and parentheses; the fields after it are fixed.
+    fields = stat[stat.rindex(")") + 2:].split()
+    return int(fields[19])
+
+
+class ChildRegistry:
+    """The long-lived children of this server process, persisted so a later server can reap them."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.path = os.path.join(directory, f"{os.getpid()}.json")
+        self._children: dict[int, tuple[int | None, str]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, pid: int, kind: str) -> None:
+        with self._lock:
+            self._children[pid] = (start_time(pid), kind)
+            self._save()
+
+    def discard(self, pid: int) -> None:
+        with self._lock:
+            if self._children.pop(pid, None) is not None:
+                self._save()
+
+    def clear(self) -> None:
+        """Forgets every child; called once they have all been killed at exit."""
+        with self._lock:
+            self._children.clear()
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def reap_orphans(self) -> int:
+        """Kills the recorded children of servers that have exited and returns how many were still running."""
+        reaped = 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if path == self.path or not name.endswith(".json"):
+                continue
+            try:
+                with open(path) as f:
+                    record = json.load(f)
+                server_pid, server_start = record["server"]
+            except (OSError, ValueError, KeyError, TypeError):
+                continue
+            if server_start is None or start_time(server_pid) == server_start:
+                continue  # That server is still running (or cannot be told apart) and owns its children.
+            for pid, (started, _) in record.get("children", {}).items():
+                if started is not None and start_time(int(pid)) == started:
+                    try:
+                        os.killpg(int(pid), signal.SIGKILL)
+                        reaped += 1
+                    except (ProcessLookupError, PermissionError):
+                        pass
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return reaped
+
+    def _save(self) -> None:
+        if not self._children:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            return
+        record = {
+            "server": [os.getpid(), start_time(os.getpid())],
+            "children": {str(pid): list(entry) for pid, entry in self._children.items()},
+        }
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(record, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+
+children = ChildRegistry(cache_dir("children"))
+
+
+async def reap_periodically(managers: list, interval: float | None = None) -> None:
+    """
+    Reaps orphans of earlier servers, then keeps dropping exited children of this one.
+
+    Parameters:
+    - managers (list): Objects with an async `reap_exited()` method, such as the Anvil and Chisel managers.
+    - interval (float | None): Seconds between passes; FOUNDRY_MCP_REAP_INTERVAL (30) by default.
+    """
+    interval = interval or env_int("FOUNDRY_MCP_REAP_INTERVAL", 30)
+    while True:
+        await asyncio.to_thread(children.reap_orphans)
+        for manager in managers:
+            await manager.reap_exited()
+        await asyncio.sleep(interval)
@@ -0,0 +1,270 @@
+"""
+Typed models of forge's `--json` output, compact summaries, and paged storage.
+
+`TestReport.from_json` turns `forge test --json` output into `TestCase`
+records and `BuildReport.from_json` turns `forge build --json` output into
+`Diagnostic` records. Tools return a small summary (counts, failures, the
+slowest and most gas-hungry tests) and keep the full records in `store`, from
+where clients read them page by page through the
+`foundry://results/{result_id}/{page}` resource.
+"""
+import json
+import re
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+
+from eth_wh_mcp.runner import env_int
+
+RESULT_URI = "foundry://results/{result_id}/{page}"
+
+_HUMANTIME = re.compile(r"([\d.]+)\s*(ns|us|µs|ms|s|m|h)\b")
+_UNIT_SECONDS = {"ns": 1e-9, "us": 1e-6, "µs": 1e-6, "ms": 1e-3, "s": 1.0, "m": 60.0, "h": 3600.0}
+_LOCATION = re.compile(r"-->\s*(\S+?):(\d+):(\d+)")
+_STATUSES = {"Success": "passed", "Failure": "failed", "Skipped": "skipped"}
+
+# Options whose output is not the regular `--json` report; runs using them return plain text.
+TEXT_TEST_OPTIONS = {"--list", "-l", "--watch", "-w", "--debug", "--gas-report", "--flamegraph", "--flamechart"}
+TEXT_BUILD_OPTIONS = {"--sizes", "--names"}
+
+
+def duration_seconds(value) -> float:
+    """Converts a duration as forge serializes it ({"secs", "nanos"}, "1s 20ms", or a number) to seconds."""
+    if isinstance(value, dict):
+        return value.get("secs", 0) + value.get("nanos", 0) / 1e9
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        return sum(float(amount) * _UNIT_SECONDS[unit] for amount, unit in _HUMANTIME.findall(value))
+    return 0.0
+
+
+def parse_json_output(stdout: str):
+    """Returns the JSON document forge printed, tolerating stray non-JSON lines before it."""
+    try:
+        return json.loads(stdout)
+    except ValueError:
+        pass
+    for line in reversed(stdout.splitlines()):
+        if line.startswith(("{", "[")):
+            try:
+                return json.loads(line)
+            except ValueError:
+                continue
+    return None
+
+
+def json_mode(options: list[str], text_options: set[str]) -> bool:
+    """Whether a run with `options` can be parsed from `--json` output."""
+    return not any(option.split("=", 1)[0] in text_options for option in options)
+
+
+@dataclass
+class TestCase:
+    """One test function's outcome."""
+
+    suite: str  # "path:Contract"
+    name: str
+    status: str  # passed, failed or skipped
+    reason: str | None = None
+    seconds: float = 0.0
+    gas: int | None = None  # Unit test gas, or the mean gas of a fuzz test.
+    kind: str = "Unit"
+    counterexample: dict | None = None
+    detail: dict = field(default_factory=dict, repr=False)  # The raw forge record.
+
+    @property
+    def test_id(self) -> str:
+        return f"{self.suite}::{self.name}"
+
+    @classmethod
+    def from_json(cls, suite: str, name: str, data: dict) -> "TestCase":
+        kind, kind_data = next(iter((data.get("kind") or {"Unit": {}}).items()))
+        gas = kind_data.get("gas", kind_data.get("mean_gas")) if isinstance(kind_data, dict) else None
+        return cls(
+            suite=suite,
+            name=name,
+            status=_STATUSES.get(data.get("status"), "failed"),
+            reason=data.get("reason"),
+            seconds=duration_seconds(data.get("duration")),
+            gas=gas,
+            kind=kind,
+            counterexample=data.get("counterexample"),
+            detail=data,
+        )
+
+
+@dataclass
+class TestReport:
+    """All test cases of one `forge test --json` run (or of several merged shards)."""
+
+    exit_code: int
+    cases: list[TestCase]
+    suites: int
+    suite_seconds: float = 0.0  # Sum of the suites' own durations.
+    extra: dict = field(default_factory=dict)  # Run-specific details, e.g. shard timings.
+
+    @classmethod
+    def from_json(cls, suites: dict, exit_code: int) -> "TestReport":
+        cases = [
+            TestCase.from_json(suite, name, data)
+            for suite, suite_data in suites.items()
+            for name, data in suite_data.get("test_results", {}).items()
+        ]
+        suite_seconds = sum(duration_seconds(data.get("duration")) for data in suites.values())
+        return cls(exit_code=exit_code, cases=cases, suites=len(suites), suite_seconds=suite_seconds)
+
+    def counts(self) -> dict[str, int]:
+        counts = dict.fromkeys(_STATUSES.values(), 0)
+        for case in self.cases:
+            counts[case.status] += 1
+        return counts
+
+    def summary(self, top: int = 5, max_failures: int = 20) -> dict:
+        failures = [case for case in self.cases if case.status == "failed"]
+        gas_cases = [case for case in self.cases if case.gas is not None]
+        summary = {
+            "exit_code": self.exit_code,
+            **self.counts(),
+            "suites": self.suites,
+            "suite_seconds": round(self.suite_seconds, 3),
+            "failures": [
+                {"test": case.test_id, "reason": case.reason, "counterexample": case.counterexample}
+                for case in failures[:max_failures]
+            ],
+            "slowest": [
+                {"test": case.test_id, "seconds": round(case.seconds, 6)}
+                for case in sorted(self.cases, key=lambda case: case.seconds, reverse=True)[:top]
+            ],
+            "most_gas": [
+                {"test": case.test_id, "gas": case.gas}
+                for case in sorted(gas_cases, key=lambda case: case.gas, reverse=True)[:top]
+            ],
+            **self.extra,
+        }
+        if len(failures) > max_failures:
+            summary["more_failures"] = len(failures) - max_failures
+        return summary
+
+    def records(self) -> list[dict]:
+        return [{"test": case.test_id, **case.detail} for case in self.cases]
+
+
+@dataclass
+class Diagnostic:
+    """One compiler error or warning."""
+
+    severity: str
+    message: str
+    code: str | None = None
+    file: str | None = None
+    line: int | None = None
+    column: int | None = None
+    formatted: str | None = None
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Diagnostic":
+        location = data.get("sourceLocation") or {}
+        formatted = data.get("formattedMessage")
+        match = _LOCATION.search(formatted or "")
+        return cls(
+            severity=data.get("severity", "error"),
+            message=data.get("message", ""),
+            code=data.get("errorCode"),
+            file=location.get("file") or (match.group(1) if match else None),
+            line=int(match.group(2)) if match else None,
+            column=int(match.group(3)) if match else None,
+            formatted=formatted,
+        )
+
+
+@dataclass
+class BuildReport:
+    """Diagnostics and compiled contract names of one `forge build --json` run."""
+
+    exit_code: int
+    diagnostics: list[Diagnostic]
+    contracts: list[str]
+    extra: dict = field(default_factory=dict)  # Run-specific details, e.g. build session state.
+
+    @classmethod
+    def from_json(cls, output: dict, exit_code: int) -> "BuildReport":
+        contracts = [
+            f"{path}:{name}"
+            for path, names in (output.get("contracts") or {}).items()
+            for name in names
+        ]
+        return cls(
+            exit_code=exit_code,
+            diagnostics=[Diagnostic.from_json(error) for error in output.get("errors") or []],
+            contracts=contracts,
+        )
+
+    def summary(self, max_diagnostics: int = 20) -> dict:
+        errors = [d for d in self.diagnostics if d.severity == "error"]
+        warnings = [d for d in self.diagnostics if d.severity == "warning"]
+        shown = (errors + warnings)[:max_diagnostics]
+        return {
+            "exit_code": self.exit_code,
+            "errors": len(errors),
+            "warnings": len(warnings),
+            "contracts": len(self.contracts),
+            "diagnostics": [
+                {key: value for key, value in asdict(d).items() if key != "formatted" and value is not None}
+                for d in shown
+            ],
+            **self.extra,
+        }
+
+    def records(self) -> list[dict]:
+        return [asdict(d) for d in self.diagnostics] + [{"contract": name} for name in self.contracts]
+
+
+class ResultStore:
+    """The most recent full results, kept server-side and served in pages."""
+
+    def __init__(self, max_results: int, page_size: int):
+        self.max_results = max_results
+        self.page_size = page_size
+        self._results: OrderedDict[str, list[dict]] = OrderedDict()
+
+    def add(self, records: list[dict]) -> dict:
+        """Stores records and returns the reference to include in a summary."""
+        result_id = uuid.uuid4().hex[:12]
+        self._results[result_id] = records
+        while len(self._results) > self.max_results:
+            self._results.popitem(last=False)
+        return {
+            "result_id": result_id,
+            "records": len(records),
+            "pages": max(1, -(-len(records) // self.page_size)),
+            "uri": RESULT_URI.replace("{result_id}", result_id),
+        }
+
+    def page(self, result_id: str, page: int) -> str:
+        if result_id not in self._results:
+            raise ValueError(f"Unknown or expired result: {result_id}")
+        records = self._results[result_id]
+        pages = max(1, -(-len(records) // self.page_size))
+        if not 0 <= page < pages:
+            raise ValueError(f"Page {page} is out of range (0-{pages - 1})")
+        start = page * self.page_size
+        return json.dumps({
+            "result_id": result_id,
+            "page": page,
+            "pages": pages,
+            "records": records[start:start + self.page_size],
+        }, indent=2)
+
+
+store = ResultStore(
+    max_results=env_int("FOUNDRY_MCP_STORED_RESULTS", 32),
+    page_size=env_int("FOUNDRY_MCP_RESULT_PAGE_SIZE", 50),
+)
+
+
+def summarize(report: TestReport | BuildReport) -> str:
+    """Stores the report's full records and returns its compact JSON summary."""
+    summary = report.summary()
+    summary["detail"] = store.add(report.records())
+    return json.dumps(summary, indent=2)
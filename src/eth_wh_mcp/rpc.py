@@ -0,0 +1,162 @@
+"""
+Asynchronous JSON-RPC client for Ethereum nodes.
+
+Requests share one keep-alive HTTP connection pool per event loop. Calls made
+to the same endpoint within a short window (FOUNDRY_MCP_RPC_BATCH_WINDOW_MS)
+are combined into a single JSON-RPC batch; endpoints that reject batches are
+remembered and served with individual requests from then on.
+"""
+import asyncio
+import itertools
+
+import httpx
+
+from eth_wh_mcp.runner import env_int
+
+MAX_BATCH_SIZE = 100
+
+
+class JsonRpcError(Exception):
+    """An error object returned by a JSON-RPC endpoint."""
+
+    def __init__(self, code: int, message: str, data=None):
+        super().__init__(f"{message} (code {code})")
+        self.code = code
+        self.message = message
+        self.data = data
+
+
+def _result(body: dict):
+    if not isinstance(body, dict):
+        raise JsonRpcError(-32603, f"Malformed JSON-RPC response: {body!r}")
+    if body.get("error") is not None:
+        error = body["error"]
+        raise JsonRpcError(error.get("code", 0), error.get("message", ""), error.get("data"))
+    return body.get("result")
+
+
+# What a request can fail with: an unreachable endpoint or HTTP error, a body that is not JSON, an error object.
+_FAILURES = (httpx.HTTPError, ValueError, JsonRpcError)
+
+
+class RpcClient:
+    """Pooled, batching JSON-RPC client bound to the event loop that created it."""
+
+    def __init__(self, batch_window: float):
+        self.batch_window = batch_window
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=16, keepalive_expiry=30),
+        )
+        self._ids = itertools.count(1)
+        self._pending: dict[str, list[tuple[dict, asyncio.Future, float]]] = {}
+        self._no_batch: set[str] = set()
+        self._sends: set[asyncio.Task] = set()  # Batches in flight; the loop only keeps weak references to tasks.
+
+    async def call(self, url: str, method: str, params: list | None = None, timeout: float = 30.0, batch: bool = True):
+        """
+        Sends a JSON-RPC request and returns its result.
+
+        Raises:
+        - JsonRpcError: If the endpoint answered with an error object.
+        - httpx.HTTPError: If the endpoint could not be reached.
+        """
+        payload = {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params or []}
+        if not batch or url in self._no_batch:
+            return _result(await self._post(url, payload, timeout))
+
+        fut = asyncio.get_running_loop().create_future()
+        pending = self._pending.setdefault(url, [])
+        pending.append((payload, fut, timeout))
+        if len(pending) == 1:
+            asyncio.get_running_loop().call_later(self.batch_window, self._flush, url)
+        elif len(pending) >= MAX_BATCH_SIZE:
+            self._flush(url)
+        return await fut
+
+    async def batch(self, url: str, calls: list[tuple[str, list]], timeout: float = 30.0) -> list:
+        """Runs several (method, params) calls concurrently; results (or exceptions) come back in order."""
+        return await asyncio.gather(
+            *(self.call(url, method, params, timeout) for method, params in calls),
+            return_exceptions=True,
+        )
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+    def _flush(self, url: str) -> None:
+        pending = self._pending.pop(url, [])
+        pending = [entry for entry in pending if not entry[1].done()]
+        if pending:
+            task = asyncio.ensure_future(self._send(url, pending))
+            self._sends.add(task)
+            task.add_done_callback(self._sends.discard)
+
+    async def _post(self, url: str, payload, timeout: float):
+        response = await self._http.post(url, json=payload, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+    async def _send(self, url: str, pending: list[tuple[dict, asyncio.Future, float]]) -> None:
+        if len(pending) == 1:
+            payload, fut, timeout = pending[0]
+            await self._settle(fut, self._post(url, payload, timeout))
+            return
+
+        timeout = max(entry[2] for entry in pending)
+        try:
+            body = await self._post(url, [entry[0] for entry in pending], timeout)
+        except _FAILURES as exc:
+            for _, fut, _ in pending:
+                if not fut.done():
+                    fut.set_exception(exc)
+            return
+
+        if not isinstance(body, list):
+            # The endpoint does not support batches; replay the calls one by one.
+            self._no_batch.add(url)
+            await asyncio.gather(*(self._settle(fut, self._post(url, payload, t)) for payload, fut, t in pending))
+            return
+
+        by_id = {item.get("id"): item for item in body if isinstance(item, dict)}
+        for payload, fut, _ in pending:
+            if fut.done():
+                continue
+            item = by_id.get(payload["id"])
+            if item is None:
+                fut.set_exception(JsonRpcError(-32603, f"No response for request {payload['id']} in batch"))
+            else:
+                try:
+                    fut.set_result(_result(item))
+                except JsonRpcError as exc:
+                    fut.set_exception(exc)
+
+    @staticmethod
+    async def _settle(fut: asyncio.Future, request) -> None:
+        try:
+            result = _result(await request)
+        except _FAILURES as exc:
+            if not fut.done():
+                fut.set_exception(exc)
+        else:
+            if not fut.done():
+                fut.set_result(result)
+
+
+_clients: dict[asyncio.AbstractEventLoop, RpcClient] = {}
+
+
+def get_client() -> RpcClient:
+    """Returns the client for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        for stale in [other for other in _clients if other.is_closed()]:
+            del _clients[stale]
+        window = env_int("FOUNDRY_MCP_RPC_BATCH_WINDOW_MS", 2, minimum=0) / 1000
+        client = _clients[loop] = RpcClient(window)
+    return client
+
+
+async def call(url: str, method: str, params: list | None = None, timeout: float = 30.0, batch: bool = True):
+    """Sends a JSON-RPC request through the shared client for the running loop."""
+    return await get_client().call(url, method, params, timeout, batch)
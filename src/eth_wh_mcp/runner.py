@@ -0,0 +1,408 @@
+"""
+Asynchronous execution of Foundry command-line tools.
+
+Every tool call goes through `run_command`, which spawns the child with
+`asyncio.create_subprocess_exec` so the MCP event loop keeps serving other
+requests while forge or cast is running. A `Scheduler` caps how many children
+of each tool class run at once. Queued calls are admitted round-robin across
+MCP clients (in arrival order within a client), so when several agents share
+one server, a client that queues twenty builds cannot starve another's one.
+
+Child output is read incrementally. Each line can be forwarded to a callback
+(used for MCP progress notifications) and is retained in an `OutputBuffer`
+that keeps only the head and tail of the stream, so memory stays flat no
+matter how verbose the run is. Machine-readable output (`--json`) can instead
+be retained in full, since a truncated JSON document is useless; it is still
+held to FOUNDRY_MCP_MAX_JSON_BYTES, and a child that writes more is killed and
+reported as failed.
+
+Every child leads its own process group, so whatever forge starts (solc,
+FFI commands, ...) can be killed with it. A child that outlives its timeout,
+or whose MCP request is cancelled, is killed with its whole group. Heavy
+children can additionally be held to address-space and CPU-time rlimits.
+"""
+import asyncio
+import os
+import signal
+import time
+from collections import OrderedDict, deque
+from collections.abc import Awaitable, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+from eth_wh_mcp.metrics import current_client, current_tool, registry
+
+try:
+    import resource
+except ImportError:  # Not available on Windows.
+    resource = None
+
+# Tool classes. Heavy jobs compile or execute whole projects (forge build,
+# test, coverage, script, ...); light jobs are short cast invocations.
+HEAVY = "heavy"
+LIGHT = "light"
+
+# Longest line forwarded in one piece; longer lines are split.
+MAX_LINE_BYTES = 64 * 1024
+_READ_CHUNK = 64 * 1024
+
+LineCallback = Callable[[str, str], Awaitable[None]]
+
+
+def env_int(name: str, default: int, minimum: int = 1) -> int:
+    """Reads an integer setting from the environment, falling back to `default`."""
+    try:
+        return max(minimum, int(os.environ[name]))
+    except (KeyError, ValueError):
+        return default
+
+
+class OutputBuffer:
+    """
+    Retains the first and last lines of a stream within a fixed byte budget.
+
+    Lines are kept in the head until it is full; later lines go into a tail ring
+    that evicts its oldest lines once over budget. Everything evicted is counted
+    so the rendered text can say how much was dropped.
+    """
+
+    def __init__(self, head_bytes: int, tail_bytes: int):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.total_bytes = 0
+        self.dropped_lines = 0
+        self.dropped_bytes = 0
+        self._head: list[str] = []
+        self._head_size = 0
+        self._tail: deque[tuple[str, int]] = deque()  # (line, size in bytes)
+        self._tail_size = 0
+
+    @property
+    def truncated(self) -> bool:
+        return self.dropped_bytes > 0
+
+    def append(self, line: str) -> None:
+        size = len(line.encode()) + 1  # UTF-8 bytes plus the newline.
+        self.total_bytes += size
+        if not self._tail and self._head_size + size <= self.head_bytes:
+            self._head.append(line)
+            self._head_size += size
+            return
+
+        if size > self.tail_bytes:
+            # Keep the line's last bytes, dropping a character the cut splits.
+            kept = line.encode()[-(self.tail_bytes - 1):] if self.tail_bytes > 1 else b""
+            line = kept.decode(errors="ignore")
+            truncated_size = len(line.encode()) + 1
+            self.dropped_bytes += size - truncated_size
+            size = truncated_size
+        self._tail.append((line, size))
+        self._tail_size += size
+        while self._tail_size > self.tail_bytes:
+            _, evicted = self._tail.popleft()
+            self._tail_size -= evicted
+            self.dropped_lines += 1
+            self.dropped_bytes += evicted
+
+    def text(self) -> str:
+        lines = list(self._head)
+        if self.truncated:
+            lines.append(f"... [{self.dropped_lines} lines ({self.dropped_bytes} bytes) truncated] ...")
+        lines.extend(line for line, _ in self._tail)
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+def option_value(options: list[str], flag: str, short: str | None = None) -> str | None:
+    """Returns the value given for `flag` (as `--flag value`, `--flag=value` or `-f value`), if any."""
+    for i, option in enumerate(options):
+        if option in (flag, short) and i + 1 < len(options):
+            return options[i + 1]
+        if option.startswith(flag + "="):
+            return option.split("=", 1)[1]
+    return None
+
+
+def new_output_buffer() -> OutputBuffer:
+    """Returns a buffer sized by FOUNDRY_MCP_MAX_OUTPUT_BYTES (a quarter head, the rest tail)."""
+    limit = env_int("FOUNDRY_MCP_MAX_OUTPUT_BYTES", 1024 * 1024)
+    head = limit // 4
+    return OutputBuffer(head, limit - head)
+
+
+@dataclass
+class CommandResult:
+    """Outcome of a finished child process."""
+
+    args: list[str]
+    returncode: int
+    stdout: str
+    stderr: str
+    cached: bool = False  # True when replayed from the result cache instead of run.
+    timed_out_after: float | None = None  # The timeout, in seconds, when the child was killed for exceeding it.
+
+    @property
+    def output(self) -> str:
+        return self.stdout or self.stderr
+
+    def format(self) -> str:
+        """Renders the exit code followed by every non-empty stream."""
+        status = f"exit code: {self.returncode}" + (" (cached)" if self.cached else "")
+        if self.timed_out_after is not None:
+            status += f" (killed after exceeding the {self.timed_out_after:g}s timeout)"
+        sections = [status]
+        if self.stdout:
+            sections.append(f"stdout:\n{self.stdout.rstrip()}")
+        if self.stderr:
+            sections.append(f"stderr:\n{self.stderr.rstrip()}")
+        return "\n\n".join(sections)
+
+
+class Scheduler:
+    """
+    Bounded, fair admission of child processes per tool class.
+
+    Each class has its own limit, so a queue of long builds never delays a cheap
+    cast call. Within a class, waiters queue per client (`current_client`) and a
+    freed slot goes to the next client in turn, first-come first-served within
+    that client. Waiters are plain futures created on the running loop, which
+    keeps the scheduler usable across event loops.
+    """
+
+    def __init__(self, limits: dict[str, int]):
+        self.limits = dict(limits)
+        self._running = dict.fromkeys(self.limits, 0)
+        self._waiters: dict[str, OrderedDict[str, deque[asyncio.Future]]] = {
+            name: OrderedDict() for name in self.limits
+        }
+
+    def running(self, tool_class: str) -> int:
+        return self._running[tool_class]
+
+    def queued(self, tool_class: str) -> int:
+        return sum(1 for queue in self._waiters[tool_class].values() for fut in queue if not fut.done())
+
+    @asynccontextmanager
+    async def slot(self, tool_class: str):
+        await self._acquire(tool_class)
+        try:
+            yield
+        finally:
+            self._release(tool_class)
+
+    async def _acquire(self, tool_class: str) -> None:
+        if self._running[tool_class] < self.limits[tool_class] and not self.queued(tool_class):
+            self._running[tool_class] += 1
+            return
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters[tool_class].setdefault(current_client.get(), deque()).append(fut)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # The slot was handed to us just before cancellation; pass it on.
+                self._release(tool_class)
+            else:
+                fut.cancel()
+            raise
+
+    def _release(self, tool_class: str) -> None:
+        clients = self._waiters[tool_class]
+        while clients:
+            client, queue = next(iter(clients.items()))
+            fut = queue.popleft()
+            if not queue:
+                del clients[client]
+            if fut.done():
+                continue
+            if queue:
+                clients.move_to_end(client)  # Its next call waits for every other client's turn.
+            # Hand the slot straight to the next waiter; the running count is unchanged.
+            fut.set_result(None)
+            return
+        self._running[tool_class] -= 1
+
+
+scheduler = Scheduler({
+    HEAVY: env_int("FOUNDRY_MCP_HEAVY_JOBS", 2),
+    LIGHT: env_int("FOUNDRY_MCP_LIGHT_JOBS", 16),
+})
+
+
+# Optional limits for heavy children; 0 leaves the limit unset.
+CHILD_MEMORY_BYTES = env_int("FOUNDRY_MCP_CHILD_MEMORY_MB", 0, minimum=0) * 1024 * 1024
+CHILD_CPU_SECONDS = env_int("FOUNDRY_MCP_CHILD_CPU_SECONDS", 0, minimum=0)
+
+
+def command_timeout(tool_class: str) -> float | None:
+    """
+    Seconds a child of the current tool may run before it is killed, or None for no limit.
+
+    FOUNDRY_MCP_TIMEOUT_<TOOL> (e.g. FOUNDRY_MCP_TIMEOUT_TEST_PROJECT) overrides the class default,
+    FOUNDRY_MCP_HEAVY_TIMEOUT or FOUNDRY_MCP_LIGHT_TIMEOUT; 0 disables the timeout.
+    """
+    default = env_int(f"FOUNDRY_MCP_{tool_class.upper()}_TIMEOUT", 1800 if tool_class == HEAVY else 120, minimum=0)
+    return env_int(f"FOUNDRY_MCP_TIMEOUT_{current_tool.get().upper()}", default, minimum=0) or None
+
+
+def _limit_resources() -> None:
+    """Runs in the forked child before exec; keep it to plain system calls."""
+    if CHILD_MEMORY_BYTES:
+        resource.setrlimit(resource.RLIMIT_AS, (CHILD_MEMORY_BYTES, CHILD_MEMORY_BYTES))
+    if CHILD_CPU_SECONDS:
+        # The soft limit sends SIGXCPU, which a child may catch; SIGKILL follows five seconds later.
+        resource.setrlimit(resource.RLIMIT_CPU, (CHILD_CPU_SECONDS, CHILD_CPU_SECONDS + 5))
+
+
+def signal_group(process: asyncio.subprocess.Process, sig: int = signal.SIGKILL) -> None:
+    """Sends `sig` to the process group led by a child, reaching everything it started."""
+    try:
+        os.killpg(process.pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+async def pump_lines(
+    stream: asyncio.StreamReader,
+    name: str,
+    buffer: OutputBuffer,
+    on_line: LineCallback | None = None,
+) -> None:
+    """Reads a child stream until EOF, retaining each line in `buffer` and passing it to `on_line`."""
+    pending = b""
+    while True:
+        chunk = await stream.read(_READ_CHUNK)
+        if chunk:
+            pending += chunk
+            *lines, pending = pending.split(b"\n")
+            if len(pending) >= MAX_LINE_BYTES:
+                lines.append(pending)
+                pending = b""
+        else:
+            lines = [pending] if pending else []
+        for raw in lines:
+            line = raw.decode(errors="replace").rstrip("\r")
+            buffer.append(line)
+            if on_line is not None:
+                await on_line(name, line)
+        if not chunk:
+            return
+
+
+def max_json_bytes() -> int:
+    """Returns the largest stdout kept whole for machine-readable output (FOUNDRY_MCP_MAX_JSON_BYTES)."""
+    return env_int("FOUNDRY_MCP_MAX_JSON_BYTES", 128 * 1024 * 1024)
+
+
+async def read_all(stream: asyncio.StreamReader, limit: int) -> str | None:
+    """Reads a child stream until EOF and returns it whole, or None as soon as it exceeds `limit` bytes."""
+    chunks = []
+    size = 0
+    while chunk := await stream.read(_READ_CHUNK):
+        size += len(chunk)
+        if size > limit:
+            return None
+        chunks.append(chunk)
+    return b"".join(chunks).decode(errors="replace")
+
+
+async def run_command(
+    args: list[str],
+    tool_class: str = HEAVY,
+    cwd: str | None = None,
+    on_line: LineCallback | None = None,
+    full_stdout: bool = False,
+    timeout: float | None = None,
+) -> CommandResult:
+    """
+    Runs a command without blocking the event loop.
+
+    Parameters:
+    - args (list[str]): The command and its arguments.
+    - tool_class (str): The scheduler class the command is admitted under (HEAVY or LIGHT).
+    - cwd (str | None): Working directory for the child process.
+    - on_line (LineCallback | None): Awaited with ("stdout" | "stderr", line) for every output line.
+    - full_stdout (bool): Keep stdout whole instead of its head and tail, and do not pass it to `on_line`.
+      Use it for machine-readable output such as `--json`. A child whose stdout exceeds `max_json_bytes()` is
+      killed; its result has empty stdout and says so in stderr.
+    - timeout (float | None): Seconds the child may run once admitted; `command_timeout(tool_class)` by default.
+
+    Returns:
+    - CommandResult: The exit code and the retained (possibly truncated) output streams. A child killed for
+      exceeding its timeout has `timed_out_after` set and keeps the output it wrote until then.
+    """
+    stdout, stderr = new_output_buffer(), new_output_buffer()
+    whole_stdout = None
+    json_limit = max_json_bytes() if full_stdout else 0
+    overflowed = False
+    timed_out_after = None
+    if timeout is None:
+        timeout = command_timeout(tool_class)
+    limited = resource is not None and tool_class == HEAVY and bool(CHILD_MEMORY_BYTES or CHILD_CPU_SECONDS)
+    queued_at = time.perf_counter()
+    async with scheduler.slot(tool_class):
+        admitted_at = time.perf_counter()
+        proc = await asyncio.create_subprocess_exec(
+            *args,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=cwd,
+            start_new_session=True,
+            preexec_fn=_limit_resources if limited else None,
+        )
+        spawned_at = time.perf_counter()
+
+        async def read_stdout() -> str | None:
+            nonlocal overflowed
+            text = await read_all(proc.stdout, json_limit)
+            if text is None:
+                # Nothing useful can come of the rest of a document that will not be parsed.
+                overflowed = True
+                signal_group(proc)
+            return text
+
+        try:
+            async with asyncio.timeout(timeout):
+                if full_stdout:
+                    whole_stdout, _ = await asyncio.gather(
+                        read_stdout(),
+                        pump_lines(proc.stderr, "stderr", stderr, on_line),
+                    )
+                else:
+                    await asyncio.gather(
+                        pump_lines(proc.stdout, "stdout", stdout, on_line),
+                        pump_lines(proc.stderr, "stderr", stderr, on_line),
+                    )
+                await proc.wait()
+        except TimeoutError:
+            signal_group(proc)
+            await proc.wait()
+            timed_out_after = timeout
+        except BaseException:
+            # Cancelled (e.g. the MCP request was): kill without awaiting, since the
+            # event loop reaps the child by itself and a cancelled task cannot wait.
+            signal_group(proc)
+            raise
+        exited_at = time.perf_counter()
+
+    registry.record_command(
+        tool_class,
+        queue_seconds=admitted_at - queued_at,
+        spawn_seconds=spawned_at - admitted_at,
+        run_seconds=exited_at - spawned_at,
+        output_bytes=stdout.total_bytes + stderr.total_bytes + len(whole_stdout or "") + (json_limit if overflowed else 0),
+        returncode=proc.returncode,
+        args=args,
+    )
+    stderr_text = stderr.text()
+    if overflowed:
+        stderr_text += (f"Killed: stdout exceeded FOUNDRY_MCP_MAX_JSON_BYTES ({json_limit} bytes). "
+                        "Narrow the run with filters, use raw output, or raise the limit.\n")
+    return CommandResult(
+        args=list(args),
+        returncode=proc.returncode,
+        stdout=(whole_stdout or "") if full_stdout else stdout.text(),
+        stderr=stderr_text,
+        timed_out_after=timed_out_after,
+    )
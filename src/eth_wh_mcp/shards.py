@@ -0,0 +1,183 @@
+"""
+Sharded `forge test` runs.
+
+`run_sharded` lists the suite once with `forge test --list --json` (which also
+compiles the project, so every shard starts from the same up-to-date build),
+groups the tests by contract, and spreads the contracts over N shards with a
+longest-processing-time-first partition weighted by each suite's recorded
+duration ("path:Contract", as forge reports suites). The shards run concurrently as separate `forge test --json` processes,
+each restricted to its contracts with an anchored `--match-contract` pattern,
+and their JSON reports are merged into one.
+
+Suite durations from every sharded run are folded into a per-project history
+in the persistent cache directory, so the partition improves over time.
+"""
+import asyncio
+import hashlib
+import heapq
+import json
+import os
+import re
+import time
+
+from eth_wh_mcp.cache import cache_dir
+from eth_wh_mcp.results import TestReport, duration_seconds, parse_json_output
+from eth_wh_mcp.runner import CommandResult, LineCallback, run_command
+
+# Options the sharded run sets itself; user-supplied copies are dropped from the shard commands.
+_SHARD_OWNED = {"--match-contract", "--mc", "--list", "-l", "--json", "-j"}
+_VALUELESS = {"--list", "-l", "--json", "-j"}
+_DEFAULT_TEST_SECONDS = 0.1
+
+
+class DurationHistory:
+    """Recorded suite durations for one project, keyed by "path:Contract"."""
+
+    def __init__(self, root: str):
+        name = hashlib.sha256(os.path.abspath(root).encode()).hexdigest()[:16] + ".json"
+        self.path = os.path.join(cache_dir("durations"), name)
+        try:
+            with open(self.path) as f:
+                self.seconds: dict[str, float] = json.load(f)
+        except (OSError, ValueError):
+            self.seconds = {}
+
+    def estimate(self, suite: str, test_count: int) -> float:
+        if suite in self.seconds:
+            return self.seconds[suite]
+        return test_count * _DEFAULT_TEST_SECONDS
+
+    def record(self, durations: dict[str, float]) -> None:
+        """Blends new observations into the history (half old, half new) and saves it."""
+        for suite, seconds in durations.items():
+            previous = self.seconds.get(suite)
+            self.seconds[suite] = seconds if previous is None else (previous + seconds) / 2
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(self.seconds, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+
+def partition(weights: dict[str, float], shards: int) -> list[list[str]]:
+    """Greedy LPT: assigns the heaviest remaining item to the currently lightest shard."""
+    heap = [(0.0, i, []) for i in range(shards)]
+    for name in sorted(weights, key=lambda name: (-weights[name], name)):
+        load, index, members = heapq.heappop(heap)
+        members.append(name)
+        heapq.heappush(heap, (load + weights[name], index, members))
+    return [members for _, _, members in sorted(heap, key=lambda entry: entry[1]) if members]
+
+
+def weigh_suites(listed: dict, history: DurationHistory) -> tuple[dict[str, float], dict[str, list[str]]]:
+    """
+    Weighs the contracts of a `forge test --list --json` listing by their recorded "path:Contract" durations.
+
+    Returns:
+    - tuple: The weight and the "path:Contract" suites per contract name. Same-named contracts in different files
+      are weighed separately but add up to one unit, since `--match-contract` cannot send them to different shards.
+    """
+    weights: dict[str, float] = {}
+    suites: dict[str, list[str]] = {}
+    for path, contracts in listed.items():
+        for contract, tests in contracts.items():
+            suite = f"{path}:{contract}"
+            suites.setdefault(contract, []).append(suite)
+            weights[contract] = weights.get(contract, 0.0) + history.estimate(suite, len(tests))
+    return weights, suites
+
+
+def strip_options(options: list[str], owned: set[str] = _SHARD_OWNED) -> list[str]:
+    """Removes `owned` flags (and their values) from an option list."""
+    kept = []
+    skip = False
+    for option in options:
+        if skip:
+            skip = False
+            continue
+        flag = option.split("=", 1)[0]
+        if flag in owned:
+            skip = flag == option and flag not in _VALUELESS
+            continue
+        kept.append(option)
+    return kept
+
+
+def contract_pattern(contracts: list[str]) -> str:
+    return "^(" + "|".join(re.escape(name) for name in sorted(contracts)) + ")$"
+
+
+async def run_sharded(
+    options: list[str], shards: int, on_line: LineCallback | None = None
+) -> TestReport | CommandResult:
+    """
+    Runs `forge test` split across concurrent shards and merges the results.
+
+    Parameters:
+    - options (list[str]): `forge test` options; filters also narrow the listing.
+    - shards (int): Maximum number of shards; no more than FOUNDRY_MCP_HEAVY_JOBS of them run at once.
+    - on_line (LineCallback | None): Receives compiler output from the listing step and one line per finished shard.
+
+    Returns:
+    - TestReport | CommandResult: The merged report, with per-shard timings and the total wall time in `extra`, or the
+      listing result if the suite could not be listed (e.g. a compile error).
+    """
+    started = time.monotonic()
+    listing = await run_command(
+        ["forge", "test", "--list", "--json"] + strip_options(options, _VALUELESS),
+        on_line=on_line,
+        full_stdout=True,
+    )
+    listed = parse_json_output(listing.stdout) if listing.returncode == 0 else None
+    if not isinstance(listed, dict):
+        return listing
+
+    history = DurationHistory(os.getcwd())
+    weights, listed_suites = weigh_suites(listed, history)
+    if not weights:
+        return TestReport(exit_code=0, cases=[], suites=0, extra={"shards": [], "wall_seconds": 0.0})
+
+    groups = partition(weights, min(shards, len(weights)))
+    shard_options = strip_options(options)
+
+    async def run_shard(index: int, contracts: list[str]) -> tuple[CommandResult, float]:
+        shard_started = time.monotonic()
+        result = await run_command(
+            ["forge", "test", "--json", "--match-contract", contract_pattern(contracts)] + shard_options,
+            full_stdout=True,
+        )
+        elapsed = time.monotonic() - shard_started
+        if on_line is not None:
+            await on_line("stdout", f"shard {index + 1}/{len(groups)} finished in {elapsed:.2f}s "
+                                    f"(exit code {result.returncode})")
+        return result, elapsed
+
+    outcomes = await asyncio.gather(*(run_shard(i, contracts) for i, contracts in enumerate(groups)))
+
+    merged: dict = {}
+    shard_reports = []
+    observed: dict[str, float] = {}
+    for contracts, (result, elapsed) in zip(groups, outcomes):
+        suites = parse_json_output(result.stdout)
+        report = {
+            "contracts": contracts,
+            "suites": sorted(suite for contract in contracts for suite in listed_suites[contract]),
+            "exit_code": result.returncode,
+            "seconds": round(elapsed, 3),
+        }
+        if isinstance(suites, dict):
+            merged.update(suites)
+            for suite, data in suites.items():
+                observed[suite] = duration_seconds(data.get("duration"))
+        else:
+            report["error"] = result.stderr or result.stdout
+        shard_reports.append(report)
+    history.record(observed)
+
+    exit_code = max((result.returncode for result, _ in outcomes), key=abs, default=0)
+    report = TestReport.from_json(merged, exit_code)
+    report.extra["shards"] = shard_reports
+    report.extra["wall_seconds"] = round(time.monotonic() - started, 3)
+    return report
@@ -0,0 +1,54 @@
+"""
+The installed Foundry toolchain, probed once per server.
+
+`toolchain.start()` runs `forge --version`, `cast --version`, `anvil --version`
+and `chisel --version` concurrently when the server starts, and every later
+`probe()` returns the same answer without spawning anything. The versions are
+served as the `foundry://versions` resource and the forge version is part of
+every result-cache key, so a Foundry upgrade never replays output recorded by
+the previous release.
+"""
+import asyncio
+import time
+
+from eth_wh_mcp.runner import LIGHT, run_command
+
+TOOLS = ("forge", "cast", "anvil", "chisel")
+
+
+class Toolchain:
+    """The versions of the Foundry binaries on PATH, probed at most once."""
+
+    def __init__(self):
+        self.versions: dict[str, str | None] | None = None
+        self.probed_at: float | None = None
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """Begins probing in the background on the running loop, unless already done or under way."""
+        if self.versions is None and (self._task is None or self._task.get_loop() is not asyncio.get_running_loop()):
+            self._task = asyncio.ensure_future(self._probe())
+
+    async def probe(self) -> dict[str, str | None]:
+        """Returns the first line of `<tool> --version` for each tool, or None where it is missing or fails."""
+        if self.versions is None:
+            self.start()
+            self.versions = await asyncio.shield(self._task)
+            self.probed_at = time.time()
+        return self.versions
+
+    async def _probe(self) -> dict[str, str | None]:
+        versions = await asyncio.gather(*(_version(tool) for tool in TOOLS))
+        return dict(zip(TOOLS, versions))
+
+
+async def _version(tool: str) -> str | None:
+    try:
+        result = await run_command([tool, "--version"], LIGHT)
+    except OSError:
+        return None
+    lines = result.stdout.strip().splitlines()
+    return lines[0].strip() if result.returncode == 0 and lines else None
+
+
+toolchain = Toolchain()
@@ -0,0 +1,94 @@
+"""
+Shared test setup.
+
+The server's caches are module-level singletons created at import time, so the
+cache directory is pointed at a scratch directory before any test module
+imports `eth_wh_mcp`.
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+_STUB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "stubs",
+                     "foundry_stub.py")
+_CACHE_DIR = tempfile.mkdtemp(prefix="eth-wh-mcp-tests-")
+os.environ["FOUNDRY_MCP_CACHE_DIR"] = _CACHE_DIR
+
+
+def pytest_sessionfinish(session, exitstatus) -> None:
+    shutil.rmtree(_CACHE_DIR, ignore_errors=True)
+
+
+class RpcStandIn:
+    """A threaded JSON-RPC endpoint on 127.0.0.1 that answers through `answer(method, params)` and logs bodies."""
+
+    def __init__(self, answer, batches: bool = True):
+        self.answer = answer
+        self.batches = batches
+        self.bodies: list = []
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stand_in.bodies.append(body)
+                if isinstance(body, list):
+                    reply = [stand_in.reply(item) for item in body] if stand_in.batches else stand_in.reply({})
+                else:
+                    reply = stand_in.reply(body)
+                data = json.dumps(reply).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def reply(self, request: dict) -> dict:
+        try:
+            result = self.answer(request.get("method"), request.get("params", []))
+        except LookupError as exc:
+            return {"jsonrpc": "2.0", "id": request.get("id"), "error": {"code": -32601, "message": str(exc)}}
+        return {"jsonrpc": "2.0", "id": request.get("id"), "result": result}
+
+
+@pytest.fixture
+def rpc_stand_in():
+    """Starts `RpcStandIn`s for a test and shuts them down afterwards."""
+    started = []
+
+    def start(answer, batches: bool = True) -> RpcStandIn:
+        started.append(RpcStandIn(answer, batches))
+        return started[-1]
+
+    yield start
+    for stand_in in started:
+        stand_in.server.shutdown()
+        stand_in.server.server_close()
+
+
+@pytest.fixture
+def foundry_stubs(tmp_path, monkeypatch):
+    """Puts the benchmark stand-ins for forge, cast, anvil and chisel first on PATH; returns the monkeypatch."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    for tool in ("forge", "cast", "anvil", "chisel"):
+        path = bin_dir / tool
+        path.write_text(f'#!/bin/sh\nexec "{sys.executable}" -S "{_STUB}" {tool} "$@"\n')
+        path.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}")
+    return monkeypatch
@@ -0,0 +1,98 @@
+import pytest
+
+from eth_wh_mcp import abi
+from eth_wh_mcp.keccak import keccak256
+
+
+@pytest.mark.parametrize("data, digest", [
+    (b"", "c5d2460186f7233c927e7db2dcc703c0e500b653ca82273b7bfad8045d85a470"),
+    (b"abc", "4e03657aea45a94fc7d47ba826c8d667c0d1e6e33a64a036ec44f58fa12d6c45"),
+    (b"hello world", "47173285a8d7341e5e972fc677286384f802f8ef42a5ec5f03bbfa254cb01fad"),
+])
+def test_keccak256_vectors(data, digest):
+    assert keccak256(data).hex() == digest
+
+
+def test_keccak256_spans_several_blocks():
+    # 136 bytes is the rate; inputs at and around it exercise padding into a second block.
+    digests = {keccak256(b"a" * n) for n in (135, 136, 137, 272)}
+    assert len(digests) == 4
+
+
+@pytest.mark.parametrize("checksummed", [
+    "0x5aAeb6053F3E94C9b9A09f33669435E7Ef1BeAed",
+    "0xfB6916095ca1df60bB79Ce92cE3Ea74c37c5d359",
+    "0xdbF03B407c01E7cD3CBea99509d93f8DDDC8C6FB",
+    "0xD1220A0cf47c7B9Be7A2E6BA89F429762e7b9aDb",
+])
+def test_eip55_checksum(checksummed):
+    assert abi.to_checksum_address(bytes.fromhex(checksummed[2:])) == checksummed
+
+
+def test_selector_and_topic():
+    assert abi.parse_signature("transfer(address to, uint amount)").selector.hex() == "a9059cbb"
+    event = abi.parse_signature("event Transfer(address indexed from, address indexed to, uint256 value)")
+    assert event.topic.hex() == "ddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+    assert event.indexed == (True, True, False)
+    assert event.names == ("from", "to", "value")
+
+
+def test_parse_signature_forms():
+    parsed = abi.parse_signature("function swap((address,uint24)[] calldata path, bytes memory data) returns (uint256)")
+    assert parsed.canonical == "swap((address,uint24)[],bytes)"
+    assert parsed.outputs == (abi.AbiType("uint", size=256),)
+    with pytest.raises(abi.AbiError):
+        abi.parse_signature("transfer(address")
+    with pytest.raises(abi.AbiError):
+        abi.parse_type("uint7")
+
+
+def test_encode_static_and_dynamic():
+    encoded = abi.encode_arguments(abi.parse_signature("f(uint256,string)"), ["1", "hi"])
+    assert encoded.hex() == (
+        f"{1:064x}" + f"{0x40:064x}" + f"{2:064x}" + "6869".ljust(64, "0")
+    )
+
+
+def test_coerce_rejects_out_of_range():
+    with pytest.raises(abi.AbiError):
+        abi.coerce(abi.parse_type("uint8"), "256")
+    with pytest.raises(abi.AbiError):
+        abi.coerce(abi.parse_type("address"), "0x1234")
+
+
+@pytest.mark.parametrize("types, values", [
+    ("(uint256,int8,bool,address)", ["7", "-3", "true", "0x" + "ab" * 20]),
+    ("(string,bytes,bytes4)", ['"héllo"', "0xdeadbeef", "0x01020304"]),
+    ("(uint16[],(uint8,string)[2],bytes[])", ["[1,2,3]", '[(1,"a"),(2,"bc")]', "[0x01,0x]"]),
+])
+def test_decode_inverts_encode(types, values):
+    parsed = list(abi.parse_type(types).components)
+    coerced = [abi.coerce(t, v) for t, v in zip(parsed, values)]
+    decoded = abi.decode(parsed, abi.encode(parsed, coerced))
+    expected = [
+        abi.to_checksum_address(value) if t.kind == "address" else value for t, value in zip(parsed, coerced)
+    ]
+    assert _plain(decoded) == _plain(expected)
+
+
+def _plain(value):
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    return value
+
+
+def test_decode_rejects_truncated_data():
+    with pytest.raises(abi.AbiError):
+        abi.decode([abi.parse_type("string")], (32).to_bytes(32, "big") + (100).to_bytes(32, "big"))
+
+
+def test_decode_event_takes_indexed_values_from_topics():
+    event = abi.parse_signature("event Note(address indexed who, string indexed tag, uint256 amount, string memo)")
+    who = bytes.fromhex("ab" * 20)
+    tag_hash = keccak256(b"tag")
+    data = abi.encode([abi.parse_type("uint256"), abi.parse_type("string")], [5, "memo"])
+    values = abi.decode_event(event, [event.topic, who.rjust(32, b"\0"), tag_hash], data)
+    assert values == [abi.to_checksum_address(who), tag_hash, 5, "memo"]
+    with pytest.raises(abi.AbiError):
+        abi.decode_event(event, [event.topic], data)
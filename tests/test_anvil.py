@@ -0,0 +1,100 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+from eth_wh_mcp import rpc
+from eth_wh_mcp.anvil import AnvilError, AnvilManager
+from eth_wh_mcp.reaper import children
+
+
+@pytest.mark.parametrize("port", ["abc", "0", "70000", "-1"])
+def test_invalid_port_is_a_tool_error(port):
+    manager = AnvilManager(pool_size=0, ready_timeout=1)
+    with pytest.raises(AnvilError, match="Invalid --port"):
+        asyncio.run(manager.start(["--port", port]))
+    assert manager.nodes == {}
+
+
+
+def _alive(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] not in ("Z", "X")
+    except OSError:
+        return False
+
+
+def test_pooled_node_is_reset_and_reused(foundry_stubs):
+    manager = AnvilManager(pool_size=1, ready_timeout=10)
+
+    async def scenario() -> None:
+        try:
+            manager.prewarm()
+            await manager._refill
+            [pooled] = manager._pool
+            first_base = pooled.base_snapshot
+
+            node = await manager.start([])
+            assert node is pooled and manager._pool == []
+            assert await manager.stop(node.node_id) == "recycled"  # Before the refill has a node ready.
+            assert manager._pool == [node] and node.base_snapshot != first_base
+
+            await manager._refill  # Its node found the slot taken by the recycled one and was stopped.
+            assert manager._pool == [node]
+            assert set(children._children) >= {node.process.pid}
+            assert len([pid for pid, (_, kind) in children._children.items() if kind == "anvil"]) == 1
+
+            again = await manager.start([])
+            assert again is node
+            # Reverting consumed the previous base snapshot; only the fresh one lets it be recycled again.
+            assert await manager.stop(again.node_id) == "recycled"
+            await manager._refill
+        finally:
+            for leftover in manager._all_nodes():
+                await manager._terminate(leftover)
+            await rpc.get_client().aclose()
+
+    asyncio.run(scenario())
+
+
+def test_exited_pooled_node_is_dropped_and_replaced(foundry_stubs):
+    manager = AnvilManager(pool_size=1, ready_timeout=10)
+
+    async def scenario() -> None:
+        try:
+            manager.prewarm()
+            await manager._refill
+            [dead] = manager._pool
+            dead.process.kill()
+            await dead.process.wait()
+            assert await manager.reap_exited() == 1
+            await manager._refill
+            assert len(manager._pool) == 1 and manager._pool[0] is not dead and manager._pool[0].running
+        finally:
+            for leftover in manager._all_nodes():
+                await manager._terminate(leftover)
+            await rpc.get_client().aclose()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self"), reason="process states are read from /proc")
+def test_node_that_never_gets_ready_is_killed(foundry_stubs, tmp_path):
+    pid_file = tmp_path / "anvil.pid"
+    silent = tmp_path / "bin" / "anvil"
+    silent.write_text(f'#!/bin/sh\necho $$ > "{pid_file}"\nexec "{sys.executable}" -c "import time; time.sleep(60)"\n')
+    manager = AnvilManager(pool_size=0, ready_timeout=0.5)
+
+    async def scenario() -> None:
+        try:
+            await manager.start(["--chain-id", "5"])
+        finally:
+            await rpc.get_client().aclose()
+
+    with pytest.raises(AnvilError, match="did not become ready within 0.5s"):
+        asyncio.run(scenario())
+    pid = int(pid_file.read_text())
+    assert not _alive(pid)
+    assert pid not in children._children and manager.nodes == {}
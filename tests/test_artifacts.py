@@ -0,0 +1,103 @@
+import json
+import os
+
+import pytest
+
+from eth_wh_mcp.artifacts import ArtifactIndex
+
+ABI = [{"type": "function", "name": "set", "inputs": [{"type": "uint256"}], "outputs": []},
+       {"type": "event", "name": "Set", "inputs": [{"type": "uint256", "indexed": False}]}]
+
+
+@pytest.fixture
+def project(tmp_path):
+    """A compiled project: src/Store.sol importing src/Base.sol, with one artifact and forge's cache file."""
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "Store.sol").write_text("import './Base.sol'; contract Store {}")
+    (tmp_path / "src" / "Base.sol").write_text("contract Base {}")
+    (tmp_path / "foundry.toml").write_text("[profile.default]\n")
+    (tmp_path / "out" / "Store.sol").mkdir(parents=True)
+    artifact = {"abi": ABI, "bytecode": {"object": "0x6080"}, "methodIdentifiers": {"set(uint256)": "60fe47b1"}}
+    (tmp_path / "out" / "Store.sol" / "Store.json").write_text(json.dumps(artifact))
+
+    compiled_ms = max(os.stat(tmp_path / "src" / name).st_mtime_ns for name in ("Store.sol", "Base.sol"))
+    compiled_ms = compiled_ms // 1_000_000 + 1
+    cache = {"files": {
+        "src/Store.sol": {"lastModificationDate": compiled_ms, "imports": ["src/Base.sol"],
+                          "artifacts": {"Store": {"0.8.24": "Store.sol/Store.json"}}},
+        "src/Base.sol": {"lastModificationDate": compiled_ms, "imports": [], "artifacts": {}},
+    }}
+    (tmp_path / "cache").mkdir()
+    (tmp_path / "cache" / "solidity-files-cache.json").write_text(json.dumps(cache))
+    return tmp_path
+
+
+def touch_later(path) -> None:
+    """Moves a file's mtime well past everything written by the fixture."""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10_000_000_000))
+
+
+def test_fresh_artifact_is_served(project):
+    index = ArtifactIndex(str(project))
+    assert index.inspect("Store", "bytecode") == "0x6080"
+    assert json.loads(index.inspect("src/Store.sol:Store", "mi")) == {"set(uint256)": "60fe47b1"}
+    events = json.loads(index.inspect("Store", "events"))
+    assert list(events) == ["Set(uint256)"]
+
+
+def test_missing_field_and_unknown_contract_fall_back(project):
+    index = ArtifactIndex(str(project))
+    assert index.inspect("Store", "storageLayout") is None
+    assert index.inspect("Missing", "abi") is None
+    assert index.inspect("Store", "not-a-field") is None
+
+
+@pytest.mark.parametrize("edited", ["src/Store.sol", "src/Base.sol"])
+def test_edited_source_or_import_is_stale(project, edited):
+    index = ArtifactIndex(str(project))
+    assert index.inspect("Store", "abi") is not None
+    touch_later(project / edited)
+    assert index.inspect("Store", "abi") is None
+
+
+@pytest.mark.parametrize("config", ["foundry.toml", "remappings.txt"])
+def test_edited_config_is_stale(project, config):
+    (project / config).write_text("[profile.default]\n" if config == "foundry.toml" else "@oz/=lib/oz/\n")
+    touch_later(project / config)
+    assert ArtifactIndex(str(project)).inspect("Store", "abi") is None
+
+
+def test_rewritten_artifact_is_reindexed(project):
+    index = ArtifactIndex(str(project))
+    assert index.inspect("Store", "bytecode") == "0x6080"
+    path = project / "out" / "Store.sol" / "Store.json"
+    path.write_text(json.dumps({"abi": ABI, "bytecode": {"object": "0x60806040"}}))
+    touch_later(path)
+    assert index.inspect("Store", "bytecode") == "0x60806040"
+
+
+@pytest.mark.parametrize("content, field", [
+    ("", "abi"),
+    ('{"abi": [{"type": "function", "na', "events"),
+    ('{"abi": [], "bytecode": {"object": "0x6080"', "bytecode"),
+])
+def test_empty_or_truncated_artifact_falls_back(project, content, field):
+    (project / "out" / "Store.sol" / "Store.json").write_text(content)
+    assert ArtifactIndex(str(project)).inspect("Store", field) is None
+
+
+def test_truncated_cache_file_falls_back(project):
+    cache = project / "cache" / "solidity-files-cache.json"
+    text = cache.read_text()
+    cache.write_text(text[:len(text) // 2])
+    index = ArtifactIndex(str(project))
+    assert index.inspect("Store", "abi") is None
+    cache.write_text(text)  # Once forge has finished writing it, it is read again.
+    assert index.inspect("Store", "abi") is not None
+
+
+def test_malformed_metadata_falls_back(project):
+    path = project / "out" / "Store.sol" / "Store.json"
+    path.write_text(json.dumps({"abi": ABI, "metadata": "{not json"}))
+    assert ArtifactIndex(str(project)).inspect("Store", "devdoc") is None
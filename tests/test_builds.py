@@ -0,0 +1,77 @@
+import asyncio
+import os
+
+import pytest
+
+from eth_wh_mcp import builds
+from eth_wh_mcp.builds import BuildSession, source_stamp, strip_watch_options
+
+
+@pytest.fixture
+def project(tmp_path):
+    root = tmp_path / "project"
+    for directory in ("src", "test", "script", "lib/dep", "out"):
+        (root / directory).mkdir(parents=True)
+    (root / "src" / "A.sol").write_text("contract A {}")
+    (root / "lib" / "dep" / "B.sol").write_text("contract B {}")
+    (root / "foundry.toml").write_text("[profile.default]\n")
+    return root
+
+
+def test_strip_watch_options():
+    assert strip_watch_options(["--watch", "src", "test", "--sizes", "--delay", "2", "--no-restart"]) == ["--sizes"]
+    assert strip_watch_options(["-w", "--via-ir", "--delay=1"]) == ["--via-ir"]
+
+
+def test_source_stamp_follows_sources_not_libraries_or_output(project):
+    stamp = source_stamp(str(project))
+    assert [entry[0] for entry in stamp] == ["foundry.toml", os.path.join("src", "A.sol")]
+
+    (project / "out" / "A.json").write_text("{}")
+    (project / "lib" / "dep" / "B.sol").write_text("contract B { uint x; }")
+    assert source_stamp(str(project)) == stamp
+
+    (project / "test" / "A.t.sol").write_text("contract ATest {}")
+    assert source_stamp(str(project)) != stamp
+
+
+def test_source_stamp_sees_in_place_edits(project):
+    stamp = source_stamp(str(project))
+    path = project / "src" / "A.sol"
+    path.write_text("contract A { uint y; }")
+    assert source_stamp(str(project)) != stamp
+
+
+def test_session_rebuilds_after_an_edit_and_backs_off_while_idle(foundry_stubs, project, monkeypatch):
+    foundry_stubs.chdir(project)
+    sleeps = []
+    real_sleep = asyncio.sleep
+
+    async def recorded_sleep(seconds):
+        sleeps.append(seconds)
+        await real_sleep(0.01)
+
+    monkeypatch.setattr(builds.asyncio, "sleep", recorded_sleep)
+
+    async def scenario() -> BuildSession:
+        session = BuildSession(str(project), [], interval=0.05, debounce=0, idle_timeout=60, max_interval=0.4)
+        monkeypatch.setattr(builds, "manager", builds.BuildSessionManager(0.05, 0, 60))
+        session.start()
+        await session.latest()
+        assert session.compiles == 1
+        sleeps.clear()
+        while len(sleeps) < 10:
+            await real_sleep(0.01)
+        assert session.compiles == 1
+        assert max(sleeps) == 0.4 and sleeps[-3:] == [0.4, 0.4, 0.4]
+
+        sleeps.clear()
+        (project / "src" / "A.sol").write_text("contract A { uint z; }")
+        while session.compiles < 2:
+            await real_sleep(0.01)
+        assert 0.05 in sleeps  # Back to the short interval once the edit was seen.
+        session.close()
+        return session
+
+    session = asyncio.run(scenario())
+    assert session.compiles == 2 and session.report is not None
@@ -0,0 +1,111 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+from eth_wh_mcp.cache import (
+    TreeHasher,
+    cache_key,
+    is_cacheable,
+    normalize_options,
+    run_cached,
+)
+
+
+@pytest.fixture
+def project(tmp_path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "A.sol").write_text("contract A {}")
+    (tmp_path / "lib" / "dep").mkdir(parents=True)
+    (tmp_path / "lib" / "dep" / "B.sol").write_text("contract B {}")
+    (tmp_path / "foundry.toml").write_text("[profile.default]\n")
+    return tmp_path
+
+
+def test_option_spellings_share_a_key():
+    assert normalize_options(["--match-test=testFoo", "-vv"]) == ["--match-test", "testFoo", "-vv"]
+    key = cache_key(["forge", "test", "--match-test=testFoo"], "/p", "digest")
+    assert key == cache_key(["forge", "test", "--match-test", "testFoo"], "/p", "digest")
+    assert key != cache_key(["forge", "test", "--match-test", "testBar"], "/p", "digest")
+    assert key != cache_key(["forge", "test", "--match-test", "testFoo"], "/p", "other")
+    assert key != cache_key(["forge", "test", "--match-test", "testFoo"], "/p", "digest", "forge 1.0.0")
+
+
+def test_foundry_environment_is_part_of_the_key(monkeypatch):
+    monkeypatch.delenv("FOUNDRY_FUZZ_RUNS", raising=False)
+    key = cache_key(["forge", "test"], "/p", "digest")
+    monkeypatch.setenv("FOUNDRY_MCP_HEAVY_JOBS", "7")
+    assert cache_key(["forge", "test"], "/p", "digest") == key
+    monkeypatch.setenv("FOUNDRY_FUZZ_RUNS", "10000")
+    assert cache_key(["forge", "test"], "/p", "digest") != key
+
+
+def test_uncacheable_options():
+    assert is_cacheable(["forge", "test", "-vvv"])
+    assert not is_cacheable(["forge", "test", "--fork-url", "http://localhost:8545"])
+    assert not is_cacheable(["forge", "test", "--fork-url=http://localhost:8545"])
+    assert not is_cacheable(["forge", "build", "--force"])
+
+
+def test_unchanged_tree_keeps_its_digest(project):
+    hasher = TreeHasher()
+    assert hasher.project_digest(str(project)) == hasher.project_digest(str(project))
+    assert hasher.project_digest(str(project)) == TreeHasher().project_digest(str(project))
+
+
+@pytest.mark.parametrize("path, content", [
+    ("src/A.sol", "contract A { uint x; }"),
+    ("src/New.sol", "contract New {}"),
+    ("lib/dep/B.sol", "contract B { uint y; }"),
+    ("foundry.toml", "[profile.default]\noptimizer = true\n"),
+    ("remappings.txt", "dep/=lib/dep/\n"),
+    (".env", "PRIVATE_KEY=0x01\n"),
+])
+def test_edits_change_the_digest(project, path, content):
+    hasher = TreeHasher()
+    before = hasher.project_digest(str(project))
+    (project / path).write_text(content)
+    assert hasher.project_digest(str(project)) != before
+
+
+def test_build_output_is_ignored(project):
+    hasher = TreeHasher()
+    before = hasher.project_digest(str(project))
+    (project / "src" / "out").mkdir()
+    (project / "src" / "out" / "A.json").write_text("{}")
+    assert hasher.project_digest(str(project)) == before
+
+
+def test_only_successful_runs_are_cached(project, monkeypatch):
+    monkeypatch.chdir(project)
+    counter = project / "runs"
+
+    def command(code: int) -> list[str]:
+        script = f"import sys; f = open({str(counter)!r}, 'a'); f.write('x'); f.close(); sys.exit({code})"
+        return [sys.executable, "-c", script]
+
+    async def scenario() -> list[bool]:
+        return [
+            (await run_cached(command(1))).cached,
+            (await run_cached(command(1))).cached,
+            (await run_cached(command(0))).cached,
+            (await run_cached(command(0))).cached,
+        ]
+
+    assert asyncio.run(scenario()) == [False, False, False, True]
+    assert os.path.getsize(counter) == 3
+
+
+def test_the_named_root_is_hashed(project, tmp_path_factory, monkeypatch):
+    monkeypatch.chdir(tmp_path_factory.mktemp("elsewhere"))
+    command = [sys.executable, "-c", "pass", "--root", str(project)]
+
+    async def scenario() -> list[bool]:
+        first = await run_cached(command)
+        second = await run_cached(command)
+        (project / "src" / "A.sol").write_text("contract A { uint x; }")
+        third = await run_cached(command)
+        return [first.cached, second.cached, third.cached]
+
+    assert asyncio.run(scenario()) == [False, True, False]
@@ -0,0 +1,43 @@
+import pytest
+
+from eth_wh_mcp.cast_native import run_offline
+
+
+@pytest.mark.parametrize("args, output", [
+    (["keccak", "hello world"], "0x47173285a8d7341e5e972fc677286384f802f8ef42a5ec5f03bbfa254cb01fad"),
+    (["keccak", "0x"], "0xc5d2460186f7233c927e7db2dcc703c0e500b653ca82273b7bfad8045d85a470"),
+    (["sig", "transfer(address,uint256)"], "0xa9059cbb"),
+    (["sig-event", "Transfer(address indexed,address indexed,uint256)"],
+     "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"),
+    (["to-wei", "1.5"], "1500000000000000000"),
+    (["to-wei", "2", "gwei"], "2000000000"),
+    (["from-wei", "1500000000000000000"], "1.500000000000000000"),
+    (["from-wei", "1", "gwei"], "0.000000001"),
+    (["to-hex", "255"], "0xff"),
+    (["abi-encode", "f(uint256)", "0x10"], "0x" + f"{16:064x}"),
+    (["calldata", "transfer(address,uint256)", "0x" + "00" * 19 + "01", "2"],
+     "0xa9059cbb" + f"{1:064x}" + f"{2:064x}"),
+])
+def test_offline_vectors(args, output):
+    assert run_offline(args) == output + "\n"
+
+
+@pytest.mark.parametrize("nonce, address", [
+    ("0", "0xcd234a471b72ba2f1ccf0a70fcaba648a5eecd8d"),
+    ("1", "0x343c43a37d37dff08ae8c4a11544c718abb4fcf8"),
+])
+def test_compute_address(nonce, address):
+    output = run_offline(["compute-address", "0x6ac7ea33f8831ea9dcc53393aaa88b25a785dbf0", "--nonce", nonce])
+    assert output.lower() == f"computed address: {address}\n"
+
+
+@pytest.mark.parametrize("args", [
+    ["keccak"],
+    ["to-wei", "1.5", "bogus"],
+    ["to-wei", "0.0000000001", "gwei"],
+    ["abi-encode", "f(uint8)", "300"],
+    ["calldata", "f(uint256)", "1", "--some-flag"],
+    ["balance", "0x" + "ab" * 20],
+])
+def test_unsupported_falls_back_to_cast(args):
+    assert run_offline(args) is None
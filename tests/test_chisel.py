@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from eth_wh_mcp.chisel import ChiselManager, split_inputs
+
+
+@pytest.mark.parametrize("code, inputs", [
+    ("uint a = 1; // set a\nuint b = a + 1;", ["uint a = 1;", "uint b = a + 1;"]),
+    ("a /* first */ + b", ["a   + b"]),
+    ("/* spans\nlines */ x\ny", ["x", "y"]),
+    ('string s = "no // comment"; // but this is', ['string s = "no // comment";']),
+    ("string s = 'it\\'s'; s", ["string s = 'it\\'s'; s"]),
+    ("function f() public {\n    // body\n    x = 1;\n}\nf()", ["function f() public { x = 1; }", "f()"]),
+    ("!clear\n!fetch Token 0x01 // kept", ["!clear", "!fetch Token 0x01 // kept"]),
+    ("\n   \n// only a comment\n", []),
+])
+def test_split_inputs(code, inputs):
+    assert split_inputs(code) == inputs
+
+
+def test_statement_after_a_comment_is_evaluated(foundry_stubs):
+    manager = ChiselManager(pool_size=0, max_sessions=2, idle_timeout=60, eval_timeout=10)
+
+    async def scenario() -> list[str]:
+        session = await manager.start([])
+        try:
+            return [
+                await manager.evaluate("uint a = 1; // set a\n42", session.session_id),
+                await manager.evaluate("// nothing to run\n7 /* seven */", session.session_id),
+            ]
+        finally:
+            await manager.stop(session.session_id)
+
+    first, second = asyncio.run(scenario())
+    assert "Decimal: 42" in first
+    assert "Decimal: 7" in second
+
+
+def test_prewarm_fills_the_pool(foundry_stubs):
+    manager = ChiselManager(pool_size=2, max_sessions=2, idle_timeout=60, eval_timeout=10)
+
+    async def scenario() -> tuple[int, str]:
+        manager.prewarm()
+        await manager._refill
+        pooled = len(manager._pool)
+        output = await manager.evaluate("5")
+        for session in list(manager._pool):
+            await manager._terminate(session)
+        return pooled, output
+
+    pooled, output = asyncio.run(scenario())
+    assert pooled == 2
+    assert "Decimal: 5" in output
@@ -0,0 +1,150 @@
+import os
+
+import pytest
+
+from eth_wh_mcp.coverage import CoverageIndex, ImportGraph, parse_lcov
+
+LCOV = """TN:
+SF:src/Counter.sol
+FN:5,Counter.increment
+FNDA:3,Counter.increment
+DA:5,3
+DA:6,3
+DA:9,0
+BRDA:6,0,0,2
+BRDA:6,0,1,-
+end_of_record
+TN:
+SF:src/Counter.sol
+FNDA:1,Counter.increment
+DA:5,1
+DA:9,4
+BRDA:6,0,1,1
+end_of_record
+"""
+
+
+def test_parse_lcov_merges_records_of_one_file():
+    coverage = parse_lcov(LCOV)["src/Counter.sol"]
+    assert list(coverage.lines) == [5, 6, 9] and list(coverage.line_hits) == [4, 3, 4]
+    assert list(coverage.branch_taken) == [2, 1]
+    assert coverage.functions == [("Counter.increment", 5, 4)]
+    assert coverage.summary()["lines"] == [3, 3]
+
+
+def test_parse_lcov_makes_absolute_paths_relative(tmp_path):
+    report = LCOV.replace("SF:src/", f"SF:{tmp_path}/src/")
+    assert list(parse_lcov(report, str(tmp_path))) == ["src/Counter.sol"]
+
+
+def test_query_and_lcov_round_trip():
+    coverage = parse_lcov("SF:src/A.sol\nDA:1,1\nDA:2,0\nDA:7,0\nBRDA:2,0,0,-\nend_of_record\n")["src/A.sol"]
+    result = coverage.query(2, 7, uncovered_only=True)
+    assert result["line_hits"] == [[2, 0], [7, 0]]
+    assert result["branch_hits"] == [{"line": 2, "branch": "0:0", "taken": 0}]
+    assert coverage.query(3, 6)["line_hits"] == []
+    again = parse_lcov(coverage.to_lcov())["src/A.sol"]
+    assert list(again.line_hits) == list(coverage.line_hits) and list(again.branch_taken) == [-1]
+
+
+SOURCES = {
+    "foundry.toml": "[profile.default]\n",
+    "remappings.txt": "dep/=lib/dep/src/\n",
+    "src/Counter.sol": 'import {Math} from "dep/Math.sol";\ncontract Counter {}',
+    "src/Other.sol": "contract Other {}",
+    "test/Counter.t.sol": 'import "forge-std/Test.sol";\nimport "../src/Counter.sol";\ncontract CounterTest {}',
+    "test/Other.t.sol": 'import "forge-std/Test.sol";\nimport {Other} from "src/Other.sol";\ncontract OtherTest {}',
+    "lib/forge-std/src/Test.sol": 'import "./Vm.sol";\ncontract Test {}',
+    "lib/forge-std/src/Vm.sol": "interface Vm {}",
+    "lib/dep/src/Math.sol": "library Math {}",
+    "lib/unused/src/Unused.sol": "library Unused {}",
+}
+
+
+@pytest.fixture
+def project(tmp_path):
+    for path, text in SOURCES.items():
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text(text)
+    (tmp_path / "lcov.info").write_text("SF:src/Counter.sol\nDA:1,1\nend_of_record\n")
+    return tmp_path
+
+
+def edit(project, path: str, text: str = "// edited\n") -> None:
+    full = project / path
+    full.write_text(full.read_text() + "\n" + text)
+    stat = os.stat(full)
+    os.utime(full, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10_000_000_000))
+
+
+def indexed(project) -> CoverageIndex:
+    index = CoverageIndex(str(project))
+    index.load_report("lcov.info", [])
+    return index
+
+
+def test_graph_follows_imports_into_libraries(project):
+    graph = ImportGraph(str(project))
+    assert graph.tests == ["test/Counter.t.sol", "test/Other.t.sol"]
+    assert graph.dependencies("test/Counter.t.sol") == {
+        "src/Counter.sol", "lib/dep/src/Math.sol", "lib/forge-std/src/Test.sol", "lib/forge-std/src/Vm.sol",
+    }
+    assert "lib/unused/src/Unused.sol" not in graph.files
+    assert graph.unresolved == set()
+
+
+def test_plan_is_current_for_an_unchanged_tree(project):
+    plan, _ = indexed(project).plan([])
+    assert plan.mode == "current"
+
+
+def test_plan_reruns_only_affected_tests(project):
+    index = indexed(project)
+    edit(project, "src/Other.sol")
+    plan, _ = index.plan([])
+    assert plan.mode == "incremental"
+    assert plan.tests == ["test/Other.t.sol"] and plan.patch == ["src/Other.sol"]
+
+
+def test_plan_reruns_tests_importing_a_changed_library(project):
+    index = indexed(project)
+    edit(project, "lib/dep/src/Math.sol")
+    plan, _ = index.plan([])
+    assert plan.mode == "incremental"
+    assert plan.changed == ["lib/dep/src/Math.sol"]
+    assert plan.tests == ["test/Counter.t.sol"]
+    assert plan.patch == ["lib/dep/src/Math.sol", "src/Counter.sol"]
+
+
+def test_library_shared_by_every_test_runs_everything(project):
+    index = indexed(project)
+    edit(project, "lib/forge-std/src/Vm.sol")
+    plan, _ = index.plan([])
+    assert plan.mode == "full" and plan.reason == "every test is affected"
+
+
+def test_unreached_library_changes_nothing(project):
+    index = indexed(project)
+    edit(project, "lib/unused/src/Unused.sol")
+    assert index.plan([])[0].mode == "current"
+
+
+def test_unresolved_import_makes_any_library_change_a_full_run(project):
+    edit(project, "src/Other.sol", 'import "missing/Thing.sol";')
+    index = indexed(project)
+    assert index.plan([])[0].mode == "current"
+    edit(project, "lib/unused/src/Unused.sol")
+    plan, graph = index.plan([])
+    assert graph.unresolved == {"missing/Thing.sol"}
+    assert plan.mode == "full" and "could not be resolved" in plan.reason
+
+
+@pytest.mark.parametrize("path", ["foundry.toml", "remappings.txt"])
+def test_config_change_runs_everything(project, path):
+    index = indexed(project)
+    edit(project, path, "# edited")
+    assert index.plan([])[0].mode == "full"
+
+
+def test_option_change_runs_everything(project):
+    assert indexed(project).plan(["--ir-minimum"])[0].reason == "coverage options changed"
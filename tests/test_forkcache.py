@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+from eth_wh_mcp import forkcache, rpc
+from eth_wh_mcp.forkcache import (
+    ForkProxy,
+    ForkProxyManager,
+    ResponseStore,
+    is_cacheable,
+    route_fork_urls,
+)
+
+BLOCK_HASH = "0x" + "ab" * 32
+
+
+@pytest.mark.parametrize("method, params, cacheable", [
+    ("eth_getStorageAt", ["0x01", "0x0", "0x10"], True),
+    ("eth_getStorageAt", ["0x01", "0x0", "latest"], False),
+    ("eth_getBalance", ["0x01", {"blockHash": BLOCK_HASH}], True),
+    ("eth_getBalance", ["0x01"], False),
+    ("eth_call", [{"to": "0x01"}, "pending"], False),
+    ("eth_getBlockByNumber", ["0x10", False], True),
+    ("eth_getBlockByNumber", ["finalized", False], False),
+    ("eth_getTransactionReceipt", [BLOCK_HASH], True),
+    ("eth_blockNumber", [], False),
+    ("eth_sendRawTransaction", ["0x00"], False),
+])
+def test_is_cacheable(method, params, cacheable):
+    assert is_cacheable(method, params) is cacheable
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResponseStore(str(tmp_path / "responses.sqlite3"), max_bytes=1000, touch_batch=3)
+
+
+def used_at(store: ResponseStore) -> dict[str, float]:
+    return dict(store.db.execute("SELECT key, used_at FROM responses"))
+
+
+def test_hits_are_written_in_batches(store, monkeypatch):
+    for key in "abc":
+        store.put(key, key.encode())
+    monkeypatch.setattr(forkcache.time, "time", lambda: 1e10)
+    assert store.get("a") == b"a" and store.get("a") == b"a" and store.get("missing") is None
+    store.get("b")
+    assert 1e10 not in used_at(store).values()  # Two distinct keys are pending.
+    store.get("c")
+    assert used_at(store) == {"a": 1e10, "b": 1e10, "c": 1e10}
+
+
+def test_eviction_sees_pending_hits(store):
+    store.put("old", b"x" * 400)
+    store.put("new", b"y" * 400)
+    store.get("old")  # Pending, yet it makes "new" the least recently used.
+    store.put("third", b"z" * 400)
+    assert store.get("old") is not None and store.get("new") is None
+    assert store.size == 800 and store.entries() == 2
+
+
+def test_oversized_responses_are_not_stored(store):
+    store.put("big", b"x" * 1001)
+    assert store.entries() == 0
+
+
+def _answer(method, params):
+    if method == "eth_chainId":
+        return "0x1"
+    if method == "eth_getBalance":
+        return "0x64"
+    raise LookupError(f"no method {method}")
+
+
+def test_proxy_answers_pinned_reads_from_the_store(rpc_stand_in, store):
+    endpoint = rpc_stand_in(_answer)
+
+    async def scenario() -> tuple[list[dict], dict]:
+        proxy = ForkProxy(endpoint.url, store)
+        try:
+            replies = [await proxy.handle({"jsonrpc": "2.0", "id": i, "method": "eth_getBalance",
+                                           "params": [address, "0x10"]})
+                       for i, address in enumerate(("0xAbC", "0xabc"))]
+            replies.append(await proxy.handle({"jsonrpc": "2.0", "id": 2, "method": "eth_getBalance",
+                                               "params": ["0xabc", "latest"]}))
+            return replies, proxy.stats
+        finally:
+            await rpc.get_client().aclose()
+
+    replies, stats = asyncio.run(scenario())
+    assert [reply["result"] for reply in replies] == ["0x64"] * 3
+    assert (stats["hits"], stats["misses"], stats["forwarded"]) == (1, 1, 1)
+    balance_requests = [body for body in endpoint.bodies if "eth_getBalance" in str(body)]
+    assert len(balance_requests) == 2
+
+
+def test_route_fork_urls_points_http_endpoints_at_the_proxy(rpc_stand_in, store, monkeypatch):
+    endpoint = rpc_stand_in(_answer)
+    monkeypatch.setattr(forkcache, "manager", ForkProxyManager(store, enabled=True))
+
+    async def scenario() -> tuple[list[str], list[str], str]:
+        try:
+            spaced = await route_fork_urls(["test", "--fork-url", endpoint.url, "-vv"])
+            inline = await route_fork_urls([f"-f={endpoint.url}"])
+            unchanged = await route_fork_urls(["--fork-url", "mainnet", "--fork-url=ws://127.0.0.1:8546"])
+            return spaced, inline + unchanged, forkcache.manager.proxies[endpoint.url].url
+        finally:
+            for proxy in forkcache.manager.proxies.values():
+                await proxy.stop()
+
+    spaced, rest, proxy_url = asyncio.run(scenario())
+    assert spaced == ["test", "--fork-url", proxy_url, "-vv"]
+    assert rest == [f"-f={proxy_url}", "--fork-url", "mainnet", "--fork-url=ws://127.0.0.1:8546"]
+
+
+def test_route_fork_urls_is_a_no_op_when_disabled(store, monkeypatch):
+    monkeypatch.setattr(forkcache, "manager", ForkProxyManager(store, enabled=False))
+    options = ["--fork-url", "http://127.0.0.1:1"]
+    assert asyncio.run(route_fork_urls(options)) == options
+
+
+@pytest.mark.parametrize("length, status", [("abc", 400), ("-5", 400), ("1_0", 400), ("", 400), ("2", 200)])
+def test_proxy_validates_content_length(store, length, status):
+    async def scenario() -> bytes:
+        proxy = ForkProxy("http://127.0.0.1:1", store)
+        await proxy.start()
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", proxy.port)
+            writer.write(f"POST / HTTP/1.1\r\nContent-Length: {length}\r\n\r\n[]".encode())
+            await writer.drain()
+            response = await reader.readuntil(b"\r\n")
+            writer.close()
+            return response
+        finally:
+            await proxy.stop()
+
+    assert asyncio.run(scenario()).startswith(f"HTTP/1.1 {status} ".encode())
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import sqlite3
+
+import pytest
+
+from eth_wh_mcp import gas, main
+from eth_wh_mcp.gas import GasEntry, GasHistory, parse_snapshot, record_snapshot
+
+SNAPSHOT = """CounterTest:test_Increment() (gas: 31303)
+CounterTest:testFuzz_SetNumber(uint256) (runs: 256, μ: 30899, ~: 31288)
+CounterTest:invariant_Bounded() (runs: 256, calls: 3840, reverts: 0)
+not a snapshot line
+"""
+
+
+def test_parse_snapshot():
+    assert parse_snapshot(SNAPSHOT) == {
+        "CounterTest:test_Increment()": GasEntry(31303, None, "unit"),
+        "CounterTest:testFuzz_SetNumber(uint256)": GasEntry(30899, 31288, "fuzz"),
+        "CounterTest:invariant_Bounded()": GasEntry(None, None, "invariant"),
+    }
+
+
+@pytest.fixture
+def history(tmp_path):
+    return GasHistory(str(tmp_path / "history.sqlite3"), max_runs=3)
+
+
+def unit(**gas: int) -> dict[str, GasEntry]:
+    return {f"T:{name}()": GasEntry(value, None, "unit") for name, value in gas.items()}
+
+
+def test_diff_counts_changes_beyond_the_tolerance(history):
+    history.record("/p", "base", unit(a=1000, b=1000, c=1000, gone=5))
+    history.record("/p", "head", unit(a=1100, b=995, c=1000, new=7))
+    diff = history.diff("/p", tolerance=1)
+    assert (diff["base"], diff["head"]) == ("base", "head")
+    assert (diff["regressions"], diff["improvements"], diff["unchanged"]) == (1, 0, 2)
+    assert diff["added"] == ["T:new()"] and diff["removed"] == ["T:gone()"]
+    assert diff["total_delta"] == 95 and not diff["check_passed"]
+    assert diff["top_regressions"] == [{"test": "T:a()", "base": 1000, "head": 1100, "delta": 100, "percent": 10.0}]
+
+
+def test_diff_from_zero_gas_is_valid_json(history):
+    history.record("/p", "base", unit(a=0))
+    history.record("/p", "head", unit(a=21000))
+    diff = history.diff("/p", tolerance=1000)
+    assert diff["regressions"] == 1 and diff["top_regressions"][0]["percent"] is None
+    assert "Infinity" not in json.dumps(diff)
+    json.loads(json.dumps(diff), parse_constant=lambda name: pytest.fail(f"non-standard JSON constant {name}"))
+
+
+def test_runs_are_resolved_by_prefix_and_pruned(history):
+    for run_id in ("abc123", "abd456", "r3", "r4"):
+        history.record("/p", run_id, unit(a=1))
+    assert [run["run_id"] for run in history.runs("/p")] == ["r4", "r3", "abd456"]
+    assert history.resolve("/p", "abd")[1] == "abd456"
+    assert history.resolve("/p", "", offset=1)[1] == "r3"
+    with pytest.raises(ValueError, match="No gas snapshot run"):
+        history.resolve("/p", "abc")
+
+
+def test_trend(history):
+    for run_id, used in (("r1", 100), ("r2", 90), ("r3", 120)):
+        history.record("/p", run_id, unit(test_a=used, other=1))
+    trend = history.trend("/p", "test_a")
+    assert trend == {"T:test_a()": {"points": [["r1", 100], ["r2", 90], ["r3", 120]], "min": 90, "max": 120,
+                                    "change": 20}}
+
+
+def test_record_snapshot_outside_git(tmp_path, monkeypatch):
+    (tmp_path / ".gas-snapshot").write_text(SNAPSHOT)
+    monkeypatch.setattr("eth_wh_mcp.gas.history", GasHistory(str(tmp_path / "h.sqlite3"), max_runs=5))
+    recorded = asyncio.run(record_snapshot(".gas-snapshot", "manual", str(tmp_path)))
+    assert recorded == {"run_id": "manual", "commit": None, "tests": 3}
+
+
+def test_snapshot_succeeds_when_the_history_fails(foundry_stubs, tmp_path):
+    (tmp_path / ".gas-snapshot").write_text(SNAPSHOT)
+    foundry_stubs.chdir(tmp_path)
+
+    def locked(*args) -> None:
+        raise sqlite3.OperationalError("database is locked")
+
+    foundry_stubs.setattr(gas.history, "record", locked)
+    output = asyncio.run(main.snapshot_project(use_cache=False))
+    assert output.startswith("exit code: 0") and "Recorded" not in output
+
+
+def test_history_tools_answer_off_the_event_loop(tmp_path, monkeypatch):
+    history = GasHistory(str(tmp_path / "h.sqlite3"), max_runs=5)
+    monkeypatch.setattr(main, "gas_history", history)
+    monkeypatch.chdir(tmp_path)
+    history.record(str(tmp_path), "r1", unit(a=100))
+    history.record(str(tmp_path), "r2", unit(a=90))
+
+    async def scenario() -> tuple[dict, dict, list]:
+        return (json.loads(await main.diff_gas_snapshots()), json.loads(await main.gas_trend("a")),
+                json.loads(await main.list_gas_runs()))
+
+    diff, trend, runs = asyncio.run(scenario())
+    assert (diff["base"], diff["head"], diff["improvements"]) == ("r1", "r2", 1)
+    assert trend["T:a()"]["change"] == -10
+    assert [run["run_id"] for run in runs] == ["r2", "r1"]
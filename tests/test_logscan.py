@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from eth_wh_mcp import abi, logscan, rpc
+from eth_wh_mcp.logscan import ChunkSizer, Cursor
+
+
+def test_sizer_steers_towards_the_target():
+    sizer = ChunkSizer(1000, target_logs=100)
+    sizer.observe(1000, 0)
+    assert sizer.size == 2000  # At most doubles.
+    sizer.observe(2000, 400)
+    assert sizer.size == 500
+    sizer.observe(10, 0)
+    assert sizer.size == 500  # A short remainder cannot grow it.
+
+
+def test_sizer_shrinks_on_refusal_and_keeps_a_stated_limit():
+    sizer = ChunkSizer(4000, target_logs=100)
+    sizer.refused(4000)
+    assert sizer.size == 2000
+    sizer.refused(2000, suggested=300)
+    assert sizer.size == 300
+    sizer.refused(300, limit=250)
+    sizer.observe(250, 0)
+    assert (sizer.ceiling, sizer.size) == (250, 250)
+
+
+QUERY = {"rpc_url": "http://127.0.0.1:1", "event": "", "address": [], "topics": [], "from_block": 10,
+         "to_block": 100}
+
+
+def test_cursor_merges_ranges_and_lists_the_gaps():
+    cursor = Cursor("scan-000000000000", dict(QUERY))
+    for low, high in ((50, 59), (10, 19), (20, 29), (60, 60), (90, 100)):
+        cursor.mark_done(low, high)
+    assert cursor.done == [[10, 29], [50, 60], [90, 100]]
+    assert cursor.remaining() == [[30, 49], [61, 89]]
+    cursor.mark_done(25, 95)
+    assert cursor.done == [[10, 100]] and cursor.remaining() == []
+
+
+def test_cursor_resumes_from_disk():
+    cursor = Cursor.create(dict(QUERY))
+    cursor.mark_done(10, 40)
+    cursor.chunk, cursor.ceiling = 16, 500
+    cursor.save()
+    loaded = Cursor.load(cursor.cursor_id)
+    assert (loaded.query, loaded.done, loaded.chunk, loaded.ceiling) == (QUERY, [[10, 40]], 16, 500)
+    loaded.forget()
+    with pytest.raises(ValueError, match="Unknown cursor"):
+        Cursor.load(cursor.cursor_id)
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        Cursor.load("../etc/passwd")
+
+
+TRANSFER_EVENT = "event Transfer(address indexed from, address indexed to, uint256 value)"
+TRANSFER = abi.parse_signature(TRANSFER_EVENT)
+
+
+def _logs(method, params):
+    """One Transfer per block, refusing ranges wider than 20 blocks."""
+    low, high = int(params[0]["fromBlock"], 16), int(params[0]["toBlock"], 16)
+    if high - low + 1 > 20:
+        raise LookupError("block range is too wide, maximum 20")
+    return [{
+        "blockNumber": hex(block), "logIndex": "0x0", "transactionHash": "0x" + f"{block:064x}",
+        "address": "0x" + "11" * 20,
+        "topics": ["0x" + TRANSFER.topic.hex(), "0x" + "00" * 32, "0x" + "00" * 12 + "22" * 20],
+        "data": "0x" + f"{block:064x}",
+    } for block in range(low, high + 1)]
+
+
+def test_scan_recuts_refused_chunks_and_streams_events(rpc_stand_in):
+    endpoint = rpc_stand_in(_logs)
+    query = {**QUERY, "rpc_url": endpoint.url, "event": TRANSFER_EVENT}
+    streamed = []
+
+    async def on_chunk(low, high, events):
+        streamed.extend(events)
+
+    async def scenario(keep_events: bool) -> dict:
+        try:
+            return await logscan.scan(Cursor.create(dict(query)), on_chunk, max_events=0, jobs=3,
+                                      sizer=ChunkSizer(64, target_logs=1000), keep_events=keep_events)
+        finally:
+            await rpc.get_client().aclose()
+
+    kept = asyncio.run(scenario(True))
+    assert kept["done"] and kept["error"] is None and kept["refused"] >= 1
+    assert kept["event_count"] == 91 and [event["block"] for event in kept["events"]] == list(range(10, 101))
+    assert kept["events"][0]["args"] == {"from": "0x" + "00" * 20, "to": abi.to_checksum_address(b"\x22" * 20),
+                                         "value": "10"}
+    assert sorted(event["block"] for event in streamed) == list(range(10, 101))
+
+    streamed.clear()
+    bounded = asyncio.run(scenario(False))
+    assert "events" not in bounded and bounded["event_count"] == 91 and len(streamed) == 91
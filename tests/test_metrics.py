@@ -0,0 +1,115 @@
+import asyncio
+import json
+import re
+import sys
+
+import pytest
+
+from eth_wh_mcp import metrics, runner
+from eth_wh_mcp.metrics import Counter, Histogram, Registry, current_tool, instrumented
+from eth_wh_mcp.runner import LIGHT, run_command
+
+# A sample line of the Prometheus text format: name{label="value",...} number, values escaped.
+_SAMPLE = re.compile(r'^[a-z_]+(\{[a-z_]+="(?:[^"\\\n]|\\[\\"n])*"(?:,[a-z_]+="(?:[^"\\\n]|\\[\\"n])*")*\})? \S+$')
+
+
+def test_label_values_are_escaped():
+    counter = Counter("calls_total", "Calls.", ("tool", "args"))
+    counter.inc("run", 'forge test --match-test "a\\b"\n--json')
+    _, _, line = counter.render()
+    assert line == 'calls_total{tool="run",args="forge test --match-test \\"a\\\\b\\"\\n--json"} 1'
+    assert _SAMPLE.match(line)
+
+
+def test_histogram_lines_are_well_formed():
+    histogram = Histogram("seconds", "Durations.", ("tool",), (0.1, 1.0))
+    histogram.observe(0.05, 'quote"d')
+    histogram.observe(5.0, 'quote"d')
+    lines = histogram.render()[2:]
+    assert lines[0] == 'seconds_bucket{tool="quote\\"d",le="0.1"} 1'
+    assert lines[2] == 'seconds_bucket{tool="quote\\"d",le="+Inf"} 2'
+    assert all(_SAMPLE.match(line) for line in lines)
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive():
+    histogram = Histogram("seconds", "Durations.", ("tool",), (0.001, 0.005, 1.0))
+    for value in (0.0005, 0.003, 0.005, 2.0):
+        histogram.observe(value, "t")
+    assert histogram.render()[2:] == [
+        'seconds_bucket{tool="t",le="0.001"} 1',
+        'seconds_bucket{tool="t",le="0.005"} 3',
+        'seconds_bucket{tool="t",le="1"} 3',
+        'seconds_bucket{tool="t",le="+Inf"} 4',
+        'seconds_sum{tool="t"} 2.008500',
+        'seconds_count{tool="t"} 4',
+    ]
+
+
+@pytest.fixture
+def fresh_registry(tmp_path, monkeypatch):
+    """A registry with a metrics file and a trace log in place of the server's."""
+    fresh = Registry(str(tmp_path / "metrics.prom"), str(tmp_path / "trace.jsonl"), write_interval=60)
+    monkeypatch.setattr(metrics, "registry", fresh)
+    monkeypatch.setattr(runner, "registry", fresh)
+    return fresh
+
+
+def test_sync_and_async_tools_are_timed_with_their_outcome(fresh_registry):
+    seen = []
+
+    @instrumented
+    def sync_tool(fail: bool = False) -> str:
+        seen.append(current_tool.get())
+        if fail:
+            raise ValueError("bad options")
+        return "done"
+
+    @instrumented
+    async def async_tool() -> str:
+        seen.append(current_tool.get())
+        return "done"
+
+    assert sync_tool() == "done" and asyncio.run(async_tool()) == "done"
+    with pytest.raises(ValueError):
+        sync_tool(fail=True)
+    assert seen == ["sync_tool", "async_tool", "sync_tool"] and current_tool.get() == "-"
+    assert fresh_registry.tool_calls._series == {
+        ("sync_tool", "ok"): 1, ("async_tool", "ok"): 1, ("sync_tool", "ValueError"): 1,
+    }
+    assert fresh_registry.tool_seconds.snapshot()["sync_tool"]["count"] == 2
+    assert fresh_registry.tool_seconds.snapshot()["async_tool"]["count"] == 1
+
+
+def test_child_processes_are_attributed_to_their_tool(fresh_registry, tmp_path):
+    @instrumented
+    async def spawning_tool() -> int:
+        result = await run_command([sys.executable, "-c", "print('x' * 10)"], LIGHT)
+        return result.returncode
+
+    assert asyncio.run(spawning_tool()) == 0
+    assert fresh_registry.exit_codes._series == {("spawning_tool", "0"): 1}
+    assert fresh_registry.spawn_seconds.snapshot()["spawning_tool"]["count"] == 1
+    assert fresh_registry.output_bytes.snapshot()["spawning_tool"]["sum"] == 11
+    assert fresh_registry.queue_seconds.snapshot()["spawning_tool,light"]["count"] == 1
+
+    [trace] = [json.loads(line) for line in (tmp_path / "trace.jsonl").read_text().splitlines()]
+    assert trace["tool"] == "spawning_tool" and trace["error"] is None
+    assert [(span["class"], span["exit_code"], span["output_bytes"]) for span in trace["spans"]] == [("light", 0, 11)]
+
+
+def test_metrics_file_writes_are_throttled(fresh_registry, tmp_path):
+    metrics_file = tmp_path / "metrics.prom"
+
+    @instrumented
+    def tool() -> None:
+        pass
+
+    fresh_registry._last_write = float("-inf")  # Never written yet.
+    tool()
+    assert 'foundry_mcp_tool_calls_total{tool="tool",outcome="ok"} 1' in metrics_file.read_text()
+    metrics_file.unlink()
+    tool()
+    assert not metrics_file.exists()  # Within the write interval of the last write.
+    fresh_registry._last_write -= 60
+    tool()
+    assert 'foundry_mcp_tool_calls_total{tool="tool",outcome="ok"} 3' in metrics_file.read_text()
@@ -0,0 +1,89 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from eth_wh_mcp import reaper
+from eth_wh_mcp.reaper import ChildRegistry, reap_periodically, start_time
+
+pytestmark = pytest.mark.skipif(not os.path.isdir("/proc/self"), reason="orphans are only reaped through /proc")
+
+
+@pytest.fixture
+def sleepers():
+    """Starts sleeping processes that each lead their own group; kills what is left afterwards."""
+    started = []
+
+    def start() -> subprocess.Popen:
+        started.append(subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"],
+                                        start_new_session=True))
+        return started[-1]
+
+    yield start
+    for process in started:
+        process.kill()
+        process.wait()
+
+
+def test_registry_file_follows_its_children(tmp_path, sleepers):
+    registry = ChildRegistry(str(tmp_path))
+    child = sleepers()
+    registry.add(child.pid, "anvil")
+    with open(registry.path) as f:
+        record = json.load(f)
+    assert record["server"] == [os.getpid(), start_time(os.getpid())]
+    assert record["children"] == {str(child.pid): [start_time(child.pid), "anvil"]}
+    registry.discard(child.pid)
+    assert not os.path.exists(registry.path)
+
+
+def test_reap_orphans_kills_only_the_recorded_process(tmp_path, sleepers):
+    orphan, reused = sleepers(), sleepers()
+    record = {
+        "server": [os.getpid(), start_time(os.getpid()) + 1],  # A server that has exited.
+        "children": {
+            str(orphan.pid): [start_time(orphan.pid), "anvil"],
+            str(reused.pid): [start_time(reused.pid) - 1, "chisel"],  # The pid now belongs to another process.
+        },
+    }
+    (tmp_path / "1.json").write_text(json.dumps(record))
+    assert ChildRegistry(str(tmp_path)).reap_orphans() == 1
+    assert orphan.wait(timeout=5) == -9
+    assert reused.poll() is None
+    assert not (tmp_path / "1.json").exists()
+
+
+def test_reap_orphans_leaves_a_running_server_alone(tmp_path, sleepers):
+    child = sleepers()
+    record = {"server": [os.getpid(), start_time(os.getpid())],
+              "children": {str(child.pid): [start_time(child.pid), "anvil"]}}
+    (tmp_path / "1.json").write_text(json.dumps(record))
+    assert ChildRegistry(str(tmp_path)).reap_orphans() == 0
+    assert child.poll() is None and (tmp_path / "1.json").exists()
+
+
+def test_reap_periodically_reaps_and_asks_managers(tmp_path, monkeypatch):
+    monkeypatch.setattr(reaper, "children", ChildRegistry(str(tmp_path)))
+
+    class Manager:
+        passes = 0
+
+        async def reap_exited(self) -> int:
+            self.passes += 1
+            return 0
+
+    manager = Manager()
+
+    async def scenario() -> None:
+        task = asyncio.create_task(reap_periodically([manager], interval=0.01))
+        while manager.passes < 3:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert manager.passes >= 3
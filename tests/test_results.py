@@ -0,0 +1,134 @@
+import json
+
+import pytest
+
+from eth_wh_mcp import results
+from eth_wh_mcp.results import (
+    TEXT_TEST_OPTIONS,
+    BuildReport,
+    ResultStore,
+    duration_seconds,
+    json_mode,
+    parse_json_output,
+    summarize,
+)
+
+SUITES = {
+    "test/Counter.t.sol:CounterTest": {
+        "duration": "1s 250ms",
+        "test_results": {
+            "test_Increment()": {
+                "status": "Success", "reason": None, "counterexample": None,
+                "kind": {"Unit": {"gas": 31000}}, "duration": {"secs": 0, "nanos": 2_000_000},
+            },
+            "testFuzz_SetNumber(uint256)": {
+                "status": "Failure", "reason": "assertion failed", "counterexample": {"args": "7"},
+                "kind": {"Fuzz": {"runs": 256, "mean_gas": 40000, "median_gas": 39000}},
+                "duration": {"secs": 1, "nanos": 0},
+            },
+            "test_Skip()": {"status": "Skipped", "kind": {"Unit": {"gas": 0}}, "duration": "3ms"},
+        },
+    },
+}
+
+
+@pytest.mark.parametrize("value, seconds", [
+    ({"secs": 2, "nanos": 500_000_000}, 2.5),
+    ("1s 20ms", 1.02),
+    ("750µs", 0.00075),
+    ("2m", 120.0),
+    (3, 3.0),
+    (None, 0.0),
+])
+def test_duration_seconds(value, seconds):
+    assert duration_seconds(value) == pytest.approx(seconds)
+
+
+def test_parse_json_output_skips_stray_lines():
+    assert parse_json_output('{"a": 1}') == {"a": 1}
+    assert parse_json_output('Compiling 3 files\nCompiler run successful!\n{"a": 1}\n') == {"a": 1}
+    assert parse_json_output("Error: compilation failed\n") is None
+
+
+def test_json_mode_rejects_text_only_options():
+    assert json_mode(["-vvv", "--match-test", "testX"], TEXT_TEST_OPTIONS)
+    assert not json_mode(["--gas-report"], TEXT_TEST_OPTIONS)
+    assert not json_mode(["--watch=src"], TEXT_TEST_OPTIONS)
+
+
+def test_test_report_from_json():
+    report = results.TestReport.from_json(SUITES, 1)
+    assert report.suites == 1 and report.suite_seconds == pytest.approx(1.25)
+    assert report.counts() == {"passed": 1, "failed": 1, "skipped": 1}
+    fuzz = next(case for case in report.cases if case.kind == "Fuzz")
+    assert fuzz.gas == 40000 and fuzz.status == "failed" and fuzz.seconds == 1.0
+
+    summary = report.summary(top=1)
+    assert summary["exit_code"] == 1
+    assert summary["failures"] == [{"test": "test/Counter.t.sol:CounterTest::testFuzz_SetNumber(uint256)",
+                                     "reason": "assertion failed", "counterexample": {"args": "7"}}]
+    assert [entry["test"].rsplit("::", 1)[1] for entry in summary["slowest"]] == ["testFuzz_SetNumber(uint256)"]
+    assert summary["most_gas"] == [{"test": fuzz.test_id, "gas": 40000}]
+    assert report.records()[0]["test"] == "test/Counter.t.sol:CounterTest::test_Increment()"
+
+
+def test_failures_beyond_the_limit_are_counted():
+    failing = {f"test_{i}()": {"status": "Failure", "reason": "boom"} for i in range(5)}
+    summary = results.TestReport.from_json({"S": {"test_results": failing}}, 1).summary(max_failures=2)
+    assert len(summary["failures"]) == 2 and summary["more_failures"] == 3
+
+
+def test_build_report_from_json():
+    output = {
+        "errors": [
+            {"severity": "error", "message": "Undeclared identifier.", "errorCode": "7576",
+             "sourceLocation": {"file": "src/A.sol", "start": 10, "end": 12},
+             "formattedMessage": "DeclarationError: Undeclared identifier.\n --> src/A.sol:4:9:\n"},
+            {"severity": "warning", "message": "Unused local variable.", "errorCode": "2072"},
+        ],
+        "contracts": {"src/A.sol": {"A": []}, "src/B.sol": {"B": [], "Helper": []}},
+    }
+    report = BuildReport.from_json(output, 1)
+    assert report.contracts == ["src/A.sol:A", "src/B.sol:B", "src/B.sol:Helper"]
+    error = report.diagnostics[0]
+    assert (error.file, error.line, error.column, error.code) == ("src/A.sol", 4, 9, "7576")
+    summary = report.summary()
+    assert (summary["errors"], summary["warnings"], summary["contracts"]) == (1, 1, 3)
+    assert "formatted" not in summary["diagnostics"][0]
+    assert summary["diagnostics"][1] == {"severity": "warning", "message": "Unused local variable.", "code": "2072"}
+
+
+def test_store_pages_records():
+    store = ResultStore(max_results=4, page_size=3)
+    reference = store.add([{"n": i} for i in range(7)])
+    assert reference["records"] == 7 and reference["pages"] == 3
+    assert reference["uri"] == f"foundry://results/{reference['result_id']}/{{page}}"
+
+    pages = [json.loads(store.page(reference["result_id"], page)) for page in range(3)]
+    assert [record["n"] for page in pages for record in page["records"]] == list(range(7))
+    assert pages[2]["records"] == [{"n": 6}] and pages[2]["pages"] == 3
+    with pytest.raises(ValueError, match="out of range"):
+        store.page(reference["result_id"], 3)
+
+
+def test_store_keeps_an_empty_result_as_one_page():
+    store = ResultStore(max_results=4, page_size=3)
+    reference = store.add([])
+    assert reference["pages"] == 1
+    assert json.loads(store.page(reference["result_id"], 0))["records"] == []
+
+
+def test_store_expires_the_oldest_results():
+    store = ResultStore(max_results=2, page_size=10)
+    first, second, third = (store.add([{"n": i}])["result_id"] for i in range(3))
+    with pytest.raises(ValueError, match="Unknown or expired"):
+        store.page(first, 0)
+    assert json.loads(store.page(second, 0))["records"] == [{"n": 1}]
+    assert json.loads(store.page(third, 0))["records"] == [{"n": 2}]
+
+
+def test_summarize_stores_the_full_records():
+    summary = json.loads(summarize(results.TestReport.from_json(SUITES, 1)))
+    assert summary["detail"]["records"] == 3
+    page = json.loads(results.store.page(summary["detail"]["result_id"], 0))
+    assert len(page["records"]) == 3
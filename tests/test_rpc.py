@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from eth_wh_mcp import rpc
+
+
+def _answer(method, params):
+    if method == "echo":
+        return params[0]
+    raise LookupError(f"no method {method}")
+
+
+def test_concurrent_calls_share_one_batch(rpc_stand_in):
+    endpoint = rpc_stand_in(_answer)
+
+    async def scenario():
+        client = rpc.RpcClient(batch_window=0.01)
+        try:
+            return await asyncio.gather(*(client.call(endpoint.url, "echo", [i]) for i in range(5)))
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(scenario()) == [0, 1, 2, 3, 4]
+    assert len(endpoint.bodies) == 1 and len(endpoint.bodies[0]) == 5
+
+
+def test_error_object_fails_only_its_own_call(rpc_stand_in):
+    endpoint = rpc_stand_in(_answer)
+
+    async def scenario():
+        client = rpc.RpcClient(batch_window=0.01)
+        try:
+            return await client.batch(endpoint.url, [("echo", ["a"]), ("missing", []), ("echo", ["b"])])
+        finally:
+            await client.aclose()
+
+    first, error, last = asyncio.run(scenario())
+    assert (first, last) == ("a", "b")
+    assert isinstance(error, rpc.JsonRpcError) and error.code == -32601
+
+
+def test_endpoint_without_batches_is_served_one_by_one(rpc_stand_in):
+    endpoint = rpc_stand_in(_answer, batches=False)
+
+    async def scenario():
+        client = rpc.RpcClient(batch_window=0.01)
+        try:
+            first = await asyncio.gather(*(client.call(endpoint.url, "echo", [i]) for i in range(3)))
+            later = await client.call(endpoint.url, "echo", ["x"])
+            return first, later
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(scenario()) == ([0, 1, 2], "x")
+    assert not any(isinstance(body, list) for body in endpoint.bodies[1:])
+
+
+def test_unbatched_call_raises_json_rpc_error(rpc_stand_in):
+    endpoint = rpc_stand_in(_answer)
+
+    async def scenario():
+        client = rpc.RpcClient(batch_window=0.01)
+        try:
+            await client.call(endpoint.url, "missing", batch=False)
+        finally:
+            await client.aclose()
+
+    with pytest.raises(rpc.JsonRpcError, match="no method missing"):
+        asyncio.run(scenario())
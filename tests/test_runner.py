@@ -0,0 +1,269 @@
+import asyncio
+import os
+import signal
+import sys
+import time
+
+import pytest
+
+from eth_wh_mcp import runner
+from eth_wh_mcp.metrics import current_client, current_tool
+from eth_wh_mcp.runner import (
+    HEAVY,
+    LIGHT,
+    OutputBuffer,
+    Scheduler,
+    command_timeout,
+    option_value,
+    run_command,
+    scheduler,
+)
+
+
+def test_output_buffer_keeps_everything_within_budget():
+    buffer = OutputBuffer(head_bytes=100, tail_bytes=100)
+    for i in range(5):
+        buffer.append(f"line {i}")
+    assert not buffer.truncated
+    assert buffer.text() == "".join(f"line {i}\n" for i in range(5))
+
+
+def test_output_buffer_keeps_head_and_tail():
+    buffer = OutputBuffer(head_bytes=20, tail_bytes=20)
+    for i in range(100):
+        buffer.append(f"line {i:02}")  # 8 bytes each, plus the newline.
+    lines = buffer.text().splitlines()
+    assert lines[:2] == ["line 00", "line 01"]
+    assert lines[-2:] == ["line 98", "line 99"]
+    assert buffer.truncated
+    assert buffer.dropped_lines == 100 - 4
+    assert buffer.total_bytes == 100 * 8
+    assert f"[{buffer.dropped_lines} lines ({buffer.dropped_bytes} bytes) truncated]" in lines[2]
+
+
+def test_output_buffer_shortens_oversized_line_to_its_end():
+    buffer = OutputBuffer(head_bytes=4, tail_bytes=10)
+    buffer.append("x" * 50 + "END")
+    assert buffer.text().splitlines()[-1].endswith("END")
+    assert len(buffer.text().splitlines()[-1]) == 9
+
+
+def test_output_buffer_counts_utf8_bytes():
+    buffer = OutputBuffer(head_bytes=8, tail_bytes=8)
+    buffer.append("ééé")  # 6 bytes plus the newline, though only 3 characters.
+    buffer.append("€")
+    assert buffer.total_bytes == 7 + 4
+    assert buffer.text().splitlines() == ["ééé", "€"] and not buffer.truncated
+    buffer.append("x" + "€" * 3)  # 10 bytes plus the newline: the first "€" is split by the cut.
+    assert buffer.text().splitlines()[-1] == "€€"
+    assert buffer.dropped_bytes == 11 - 7 + 4 and buffer.dropped_lines == 1
+
+
+def test_option_value_forms():
+    options = ["--fork-url", "http://a", "--match-test=foo", "-v"]
+    assert option_value(options, "--fork-url", "-f") == "http://a"
+    assert option_value(options, "--match-test") == "foo"
+    assert option_value(["-f", "http://b"], "--fork-url", "-f") == "http://b"
+    assert option_value(options, "--missing") is None
+
+
+def test_scheduler_limits_concurrency_per_class():
+    async def scenario():
+        scheduler = Scheduler({"heavy": 2, "light": 1})
+        running = peak = 0
+
+        async def job():
+            nonlocal running, peak
+            async with scheduler.slot("heavy"):
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        async def light():
+            async with scheduler.slot("light"):
+                return scheduler.running("heavy")
+
+        heavy = [asyncio.create_task(job()) for _ in range(6)]
+        await asyncio.sleep(0)
+        assert scheduler.queued("heavy") == 4
+        # A light job is admitted while heavy jobs are queued.
+        assert await light() == 2
+        await asyncio.gather(*heavy)
+        assert peak == 2
+        assert scheduler.running("heavy") == 0
+
+    asyncio.run(scenario())
+
+
+def test_scheduler_admits_clients_round_robin():
+    async def scenario():
+        scheduler = Scheduler({"heavy": 1})
+        order = []
+        hold = asyncio.Event()
+
+        async def call(client: str, name: str, wait: asyncio.Event | None = None):
+            current_client.set(client)
+            async with scheduler.slot("heavy"):
+                order.append(name)
+                if wait is not None:
+                    await wait.wait()
+
+        first = asyncio.create_task(call("a", "a0", hold))
+        await asyncio.sleep(0)
+        queued = [asyncio.create_task(call("a", f"a{i}")) for i in range(1, 4)]
+        await asyncio.sleep(0)
+        queued.append(asyncio.create_task(call("b", "b1")))
+        await asyncio.sleep(0)
+        hold.set()
+        await asyncio.gather(first, *queued)
+        # Client b's only call is served after one of a's queued calls, not after all of them.
+        assert order == ["a0", "a1", "b1", "a2", "a3"]
+
+    asyncio.run(scenario())
+
+
+def test_scheduler_passes_on_slot_of_cancelled_waiter():
+    async def scenario():
+        scheduler = Scheduler({"heavy": 1})
+        done = []
+
+        async def call(name: str, seconds: float = 0):
+            async with scheduler.slot("heavy"):
+                await asyncio.sleep(seconds)
+                done.append(name)
+
+        first = asyncio.create_task(call("first", 0.01))
+        await asyncio.sleep(0)
+        cancelled = asyncio.create_task(call("cancelled"))
+        last = asyncio.create_task(call("last"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.gather(first, last)
+        assert done == ["first", "last"]
+        assert scheduler.running("heavy") == 0 and scheduler.queued("heavy") == 0
+
+    asyncio.run(scenario())
+
+
+# Writes "<its pid> <grandchild pid>" to argv[1] once both run, then sleeps; the grandchild sleeps too.
+_FORKING_CHILD = """
+import os, sys, time
+grandchild = os.fork()
+if grandchild == 0:
+    time.sleep(60)
+    os._exit(0)
+with open(sys.argv[1] + ".tmp", "w") as f:
+    f.write(f"{os.getpid()} {grandchild}")
+os.replace(sys.argv[1] + ".tmp", sys.argv[1])
+print("started", flush=True)
+time.sleep(60)
+"""
+
+
+def _alive(pid: int) -> bool:
+    """Whether a process exists and is not a zombie waiting for an absent reaper."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] not in ("Z", "X")
+    except OSError:
+        return False
+
+
+def _gone(pids: list[int]) -> bool:
+    for _ in range(200):
+        if not any(_alive(pid) for pid in pids):
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self"), reason="process states are read from /proc")
+def test_timeout_kills_the_whole_group(tmp_path):
+    pid_file = tmp_path / "pids"
+    result = asyncio.run(run_command([sys.executable, "-c", _FORKING_CHILD, str(pid_file)], LIGHT, timeout=1))
+    assert result.timed_out_after == 1 and result.returncode == -signal.SIGKILL
+    assert "started" in result.stdout and "killed after exceeding the 1s timeout" in result.format()
+    assert _gone([int(pid) for pid in pid_file.read_text().split()])
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self"), reason="process states are read from /proc")
+def test_cancellation_kills_the_whole_group(tmp_path):
+    pid_file = tmp_path / "pids"
+
+    async def scenario() -> None:
+        task = asyncio.create_task(run_command([sys.executable, "-c", _FORKING_CHILD, str(pid_file)], LIGHT))
+        while not pid_file.exists():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # The loop reaps the killed child by itself; let it before the loop closes.
+        pids = [int(pid) for pid in pid_file.read_text().split()]
+        for _ in range(200):
+            if not any(_alive(pid) for pid in pids):
+                break
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+
+    asyncio.run(scenario())
+    assert _gone([int(pid) for pid in pid_file.read_text().split()])
+    assert scheduler.running(LIGHT) == 0
+
+
+@pytest.mark.parametrize("environment, tool, tool_class, expected", [
+    ({}, "test_project", HEAVY, 1800),
+    ({}, "run_cast_command", LIGHT, 120),
+    ({"FOUNDRY_MCP_HEAVY_TIMEOUT": "60"}, "build_project", HEAVY, 60),
+    ({"FOUNDRY_MCP_HEAVY_TIMEOUT": "60", "FOUNDRY_MCP_TIMEOUT_TEST_PROJECT": "5"}, "test_project", HEAVY, 5),
+    ({"FOUNDRY_MCP_TIMEOUT_TEST_PROJECT": "5"}, "build_project", HEAVY, 1800),
+    ({"FOUNDRY_MCP_TIMEOUT_TEST_PROJECT": "0"}, "test_project", HEAVY, None),
+])
+def test_command_timeout_overrides(monkeypatch, environment, tool, tool_class, expected):
+    for name in ("FOUNDRY_MCP_HEAVY_TIMEOUT", "FOUNDRY_MCP_LIGHT_TIMEOUT", "FOUNDRY_MCP_TIMEOUT_TEST_PROJECT"):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in environment.items():
+        monkeypatch.setenv(name, value)
+    token = current_tool.set(tool)
+    try:
+        assert command_timeout(tool_class) == expected
+    finally:
+        current_tool.reset(token)
+
+
+@pytest.mark.skipif(runner.resource is None, reason="rlimits need the resource module")
+def test_heavy_children_get_rlimits(monkeypatch):
+    monkeypatch.setattr(runner, "CHILD_MEMORY_BYTES", 2048 * 1024 * 1024)
+    monkeypatch.setattr(runner, "CHILD_CPU_SECONDS", 30)
+    show = "import resource; print(resource.getrlimit(resource.RLIMIT_AS), resource.getrlimit(resource.RLIMIT_CPU))"
+
+    async def scenario() -> tuple[str, str]:
+        heavy = await run_command([sys.executable, "-c", show], HEAVY)
+        light = await run_command([sys.executable, "-c", show], LIGHT)
+        return heavy.stdout.strip(), light.stdout.strip()
+
+    heavy, light = asyncio.run(scenario())
+    assert heavy == f"{(2048 * 1024 * 1024,) * 2} (30, 35)"
+    assert light != heavy  # Light children are not limited.
+
+
+def test_heavy_commands_are_capped_while_light_ones_proceed(monkeypatch):
+    monkeypatch.setattr(runner, "scheduler", Scheduler({HEAVY: 2, LIGHT: 4}))
+    heavy_child = "import time; start = time.time(); time.sleep(0.3); print(start, time.time())"
+
+    async def scenario() -> tuple[list[str], float]:
+        heavy = [asyncio.create_task(run_command([sys.executable, "-c", heavy_child], HEAVY)) for _ in range(5)]
+        while runner.scheduler.running(HEAVY) < 2:
+            await asyncio.sleep(0.01)
+        assert runner.scheduler.queued(HEAVY) == 3
+        light = await run_command([sys.executable, "-c", "print('light')"], LIGHT)
+        assert light.stdout == "light\n"
+        light_done = time.time()
+        results = await asyncio.gather(*heavy)
+        return [result.stdout for result in results], light_done
+
+    outputs, light_done = asyncio.run(scenario())
+    spans = [tuple(map(float, output.split())) for output in outputs]
+    overlaps = [sum(start <= moment < end for start, end in spans) for moment, _ in spans]
+    assert max(overlaps) <= 2
+    assert light_done < max(end for _, end in spans)  # Done before the heavy queue drained.
@@ -0,0 +1,91 @@
+import asyncio
+import re
+
+import pytest
+
+from eth_wh_mcp import results
+from eth_wh_mcp.runner import run_command
+from eth_wh_mcp.shards import (
+    DurationHistory,
+    contract_pattern,
+    partition,
+    run_sharded,
+    strip_options,
+    weigh_suites,
+)
+
+
+def test_partition_balances_by_weight():
+    weights = {"A": 7.0, "B": 5.0, "C": 4.0, "D": 3.0, "E": 1.0}
+    groups = partition(weights, 2)
+    assert groups == [["A", "D"], ["B", "C", "E"]]
+    assert [sum(weights[name] for name in group) for group in groups] == [10.0, 10.0]
+
+
+def test_partition_never_returns_empty_shards():
+    assert partition({"A": 1.0, "B": 1.0}, 4) == [["A"], ["B"]]
+    assert partition({}, 3) == []
+
+
+def test_partition_is_deterministic_for_equal_weights():
+    weights = dict.fromkeys("DCBA", 1.0)
+    assert partition(weights, 2) == partition(dict(reversed(weights.items())), 2) == [["A", "C"], ["B", "D"]]
+
+
+def test_same_named_contracts_are_weighed_by_path(tmp_path, monkeypatch):
+    monkeypatch.setenv("FOUNDRY_MCP_CACHE_DIR", str(tmp_path / "cache"))
+    history = DurationHistory(str(tmp_path))
+    history.seconds = {"test/a/Vault.t.sol:VaultTest": 8.0, "test/b/Vault.t.sol:VaultTest": 1.0}
+    listed = {
+        "test/a/Vault.t.sol": {"VaultTest": ["test_a"]},
+        "test/b/Vault.t.sol": {"VaultTest": ["test_b"]},
+        "test/Token.t.sol": {"TokenTest": ["test_t"]},
+    }
+    weights, suites = weigh_suites(listed, history)
+    assert weights["VaultTest"] == 9.0
+    assert suites["VaultTest"] == ["test/a/Vault.t.sol:VaultTest", "test/b/Vault.t.sol:VaultTest"]
+    assert suites["TokenTest"] == ["test/Token.t.sol:TokenTest"]
+
+
+def test_strip_options_drops_owned_flags_and_their_values():
+    options = ["--match-contract", "Foo", "--json", "-vvv", "--mc=Bar", "--match-test", "testX", "-l"]
+    assert strip_options(options) == ["-vvv", "--match-test", "testX"]
+
+
+def test_contract_pattern_is_anchored():
+    pattern = re.compile(contract_pattern(["FooTest", "Bar.Test"]))
+    assert pattern.search("FooTest") and pattern.search("Bar.Test")
+    assert not pattern.search("FooTestExtra") and not pattern.search("BarxTest")
+
+
+def test_sharded_run_merges_every_suite(foundry_stubs, tmp_path):
+    foundry_stubs.chdir(tmp_path)
+    foundry_stubs.setenv("BENCH_STUB_SUITES", "5")
+    foundry_stubs.setenv("BENCH_STUB_TESTS", "3")
+    lines = []
+
+    async def on_line(stream: str, line: str) -> None:
+        lines.append(line)
+
+    report = asyncio.run(run_sharded(["--json", "-vv"], 3, on_line))
+    assert isinstance(report, results.TestReport)
+    assert report.exit_code == 0 and report.suites == 5
+    assert len(report.cases) == 15 and report.counts()["passed"] == 15
+    shards = report.extra["shards"]
+    assert len(shards) == 3
+    assert sorted(name for shard in shards for name in shard["contracts"]) == [f"C{i}Test" for i in range(5)]
+    assert all(sorted(suite.rpartition(":")[2] for suite in shard["suites"]) == sorted(shard["contracts"])
+               for shard in shards)
+    assert sum("finished" in line for line in lines) == 3
+
+
+@pytest.mark.parametrize("limit, overflows", [(1 << 20, False), (4096, True)])
+def test_json_capture_is_bounded(foundry_stubs, limit, overflows):
+    foundry_stubs.setenv("BENCH_STUB_SUITES", "50")
+    foundry_stubs.setenv("FOUNDRY_MCP_MAX_JSON_BYTES", str(limit))
+    result = asyncio.run(run_command(["forge", "test", "--json"], full_stdout=True))
+    if overflows:
+        assert result.returncode != 0 and result.stdout == ""
+        assert "FOUNDRY_MCP_MAX_JSON_BYTES (4096 bytes)" in result.stderr
+    else:
+        assert result.returncode == 0 and len(result.stdout) > 4096
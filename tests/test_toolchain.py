@@ -0,0 +1,66 @@
+import asyncio
+import sys
+
+import pytest
+
+from eth_wh_mcp import main, toolchain
+from eth_wh_mcp.toolchain import Toolchain
+
+
+def test_probes_once_and_caches(foundry_stubs):
+    spawned = []
+    run_command = toolchain.run_command
+
+    async def counted(args, *rest, **kwargs):
+        spawned.append(args[0])
+        return await run_command(args, *rest, **kwargs)
+
+    foundry_stubs.setattr(toolchain, "run_command", counted)
+    probe = Toolchain()
+
+    async def scenario() -> list[dict]:
+        probe.start()
+        return [await probe.probe(), await probe.probe()]
+
+    first, second = asyncio.run(scenario())
+    assert first == second == {tool: f"{tool} Version: 1.0.0-stub" for tool in toolchain.TOOLS}
+    assert sorted(spawned) == sorted(toolchain.TOOLS)
+    assert asyncio.run(probe.probe()) is first  # Also from another event loop.
+    assert len(spawned) == 4
+
+
+def test_missing_binary_is_none(tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", str(tmp_path))
+    assert asyncio.run(Toolchain().probe()) == dict.fromkeys(toolchain.TOOLS)
+
+
+@pytest.fixture
+def served(monkeypatch):
+    """Replaces `main.serve` with a recorder and keeps the server settings `cli()` changes."""
+    transports = []
+
+    async def serve(transport: str) -> None:
+        transports.append(transport)
+
+    monkeypatch.setattr(main, "serve", serve)
+    monkeypatch.setattr(main.mcp.settings, "host", main.mcp.settings.host)
+    monkeypatch.setattr(main.mcp.settings, "port", main.mcp.settings.port)
+    for name in ("FOUNDRY_MCP_TRANSPORT", "FOUNDRY_MCP_HOST", "FOUNDRY_MCP_PORT"):
+        monkeypatch.delenv(name, raising=False)
+    return monkeypatch, transports
+
+
+def test_cli_defaults_to_stdio(served):
+    monkeypatch, transports = served
+    monkeypatch.setattr(sys, "argv", ["eth-wh-mcp"])
+    main.cli()
+    assert transports == ["stdio"]
+    assert (main.mcp.settings.host, main.mcp.settings.port) == ("127.0.0.1", 8000)
+
+
+def test_cli_parses_sse_options(served):
+    monkeypatch, transports = served
+    monkeypatch.setattr(sys, "argv", ["eth-wh-mcp", "--transport", "sse", "--host", "0.0.0.0", "--port", "9123"])
+    main.cli()
+    assert transports == ["sse"]
+    assert (main.mcp.settings.host, main.mcp.settings.port) == ("0.0.0.0", 9123)